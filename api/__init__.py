@@ -1,30 +1,43 @@
 from __future__ import print_function
-import time
-import random
+import threading
 
-from six import integer_types  # type: ignore
 from pgoapi.exceptions import ServerSideRequestThrottlingException, ServerSideAccessForbiddenException, \
     UnexpectedResponseException  # type: ignore
 
 from app import kernel
+from app.clock import get_clock
 from .state_manager import StateManager
+from .auth import TokenRefresher
 from .exceptions import AccountBannedException
+from .coalescing import CallFuture, Envelope
+from .pacing import Pacer, THROTTLED, HTTP_ERROR, OFFLINE, EMPTY, BAD_STATUS, FORBIDDEN
 
-@kernel.container.register('api_wrapper', ['@pgoapi', '@logger'], {'provider': '%pogoapi.provider%', 'username': '%pogoapi.username%', 'password': '%pogoapi.password%', 'shared_lib': '%pogoapi.shared_lib%'})
+@kernel.container.register('api_wrapper', ['@pgoapi', '@logger'], {'provider': '%pogoapi.provider%', 'username': '%pogoapi.username%', 'password': '%pogoapi.password%', 'shared_lib': '%pogoapi.shared_lib%', 'pacer': '@pacer', 'recorder': '@rpc_recorder', 'token_refresh': '%pogoapi.token_refresh%', 'world_map_max_age': '%pogoapi.world_map_max_age%', 'world_map_max_distance': '%pogoapi.world_map_max_distance%'})
 class PoGoApi(object):
-    def __init__(self, api, logger, provider="google", username="", password="", shared_lib="encrypt.dll"):
+    def __init__(self, api, logger, provider="google", username="", password="", shared_lib="encrypt.dll", pacer=None,
+                 recorder=None, token_refresh=600, world_map_max_age=1800, world_map_max_distance=3000):
         self._api = api
         self.logger = logger.getLogger('API')
+        self.pacer = pacer or Pacer({}, logger)
+        self.recorder = recorder
         self.provider = provider
         self.username = username
         self.password = password
 
         self.current_position = (0, 0, 0)
 
-        self.state = StateManager()
+        self.state = StateManager(world_map_max_age, world_map_max_distance)
+
+        # pylint: disable=protected-access
+        self.auth = TokenRefresher(self._login, lambda: self._api._auth_provider.get_ticket(), self.logger,
+                                   token_refresh)
+        # Logging in again in the background must not interleave with a request
+        self._request_lock = threading.RLock()
 
         self._pending_calls = {}
         self._pending_calls_keys = []
+        self._envelopes = []
+        self._response_listeners = []
 
         self._api.activate_signature(shared_lib)
 
@@ -32,18 +45,31 @@ class PoGoApi(object):
         return self._api
 
     def login(self):
+        return self.auth.login()
+
+    def _login(self):
         try:
             provider, username, password = self.provider, self.username, self.password
-            return self._api.login(provider, username, password, app_simulation=True)
+            with self._request_lock:
+                return self._api.login(provider, username, password, app_simulation=True)
         except TypeError:
             return False
 
     def set_position(self, lat, lng, alt):
         self._api.set_position(lat, lng, alt)
+        self.state.set_position(lat, lng)
 
     def get_position(self):
         return self._api.get_position()
 
+    def add_response_listener(self, listener):
+        # type: (Callable[[Dict[str, Tuple], List[str], Dict[str, Any]], None]) -> None
+        """
+            Calls listener(methods, method_keys, responses) after every successful request, once its responses are
+            in the state.
+        """
+        self._response_listeners.append(listener)
+
     def get_queued_methods(self):
         return self._api.list_curr_methods()
 
@@ -58,36 +84,65 @@ class PoGoApi(object):
         return function
 
     def get_expiration_time(self):
-        # pylint: disable=protected-access
-        ticket = self._api._auth_provider.get_ticket()
-        if ticket is False or ticket is None:
-            return 0
-        for field in ticket:
-            if isinstance(field, integer_types):
-                return int(field / 1000 - time.time())
-        return 0
+        return self.auth.get_expiration_time()
 
     # Wrapper for new PGoApi create_request() function
     def create_request(self):
         return self._api.create_request()
 
-    def call(self, ignore_expiration=False, ignore_cache=False):
+    def call(self, ignore_expiration=False, ignore_cache=False, max_age=None):
+        future = self.defer(ignore_cache=ignore_cache, max_age=max_age)
+        self.flush(ignore_expiration=ignore_expiration)
+        return future.result()
+
+    def defer(self, ignore_cache=False, max_age=None):
+        # type: (bool, Optional[float]) -> CallFuture
+        """
+            Holds back the queued methods until the next call() or flush(), which sends them together with the
+            methods of every other caller in as few requests as possible. With max_age, cached states older than
+            max_age seconds are requested again.
+        """
         methods, method_keys, self._pending_calls, self._pending_calls_keys = self._pending_calls, self._pending_calls_keys, {}, []
 
-        # Check for ticket expiration before continuing
-        if self.get_expiration_time() < 60 and ignore_expiration is False:
+        future = CallFuture(self)
+        # Joining an earlier envelope would send the methods before those of a later one
+        if not len(self._envelopes) or not self._envelopes[-1].accepts(methods, method_keys, ignore_cache, max_age):
+            self._envelopes.append(Envelope(self.state, ignore_cache, max_age))
+        self._envelopes[-1].add(methods, method_keys, future)
+        return future
+
+    def flush(self, ignore_expiration=False):
+        # type: (bool) -> None
+        envelopes, self._envelopes = self._envelopes, []
+        if not len(envelopes):
+            return
+
+        # Check for ticket expiration before continuing, it is usually renewed in the background long before
+        expires_in = self.get_expiration_time()
+        if ignore_expiration is False:
+            self.auth.refresh_ahead(expires_in)
+        if expires_in < 60 and ignore_expiration is False:
             self.logger.warning('Token has expired, attempting to log back in...')
             for _ in range(10):
-                if self.login() is False:
-                    self.logger.error('Failed to login. Waiting 15 seconds...')
-                    time.sleep(15)
+                if self.login() is not False:
+                    break
+                self.logger.error('Failed to login. Waiting 15 seconds...')
+                get_clock().sleep(15)
             if self.get_expiration_time() < 60 and ignore_expiration is False:
                 self.logger.critical('Failed to login after 10 tries, exiting.')
                 exit(1)
 
+        for envelope in envelopes:
+            envelope.resolve(self._send(envelope.methods, envelope.method_keys, envelope.ignore_cache,
+                                        envelope.max_age))
+
+    def _send(self, methods, method_keys, ignore_cache=False, max_age=None):
         # See which methods are uncached
         # If all methods are cached and do not invalidate any states, we can just return current state
-        uncached_method_keys = self.state.filter_cached_methods(method_keys) if ignore_cache is False else method_keys
+        if ignore_cache is False:
+            uncached_method_keys = self.state.filter_cached_methods(method_keys, max_age)
+        else:
+            uncached_method_keys = method_keys
         if len(uncached_method_keys) == 0:
             return self.state.get_state()
 
@@ -97,53 +152,63 @@ class PoGoApi(object):
 
             # build the request
             for method in uncached_method_keys:
-                my_args, my_kwargs = methods[method]
+                my_args, my_kwargs = self.state.get_request_arguments(method, *methods[method])
                 getattr(request, method)(*my_args, **my_kwargs)
 
-            # random request delay to prevent status code 52: too many requests
-            time.sleep(random.uniform(0.5, 1.5))
+            # wait our turn to prevent status code 52: too many requests
+            self.pacer.wait()
+            started = get_clock().time()
 
             try:
-                results = request.call()
+                with self._request_lock:
+                    results = request.call()
             except ServerSideRequestThrottlingException:
                 # status code 52: too many requests
-                self.logger.warning('Requesting too fast. Retrying in 10 seconds...')
-                time.sleep(10)
+                self._record(methods, uncached_method_keys, failure=THROTTLED)
+                self.pacer.failed(THROTTLED, 'Requesting too fast.', get_clock().time() - started)
                 continue
             except ServerSideAccessForbiddenException:
                 # 403 Forbidden
+                self._record(methods, uncached_method_keys, failure=FORBIDDEN)
                 self.logger.critical('Your IP address is most likely banned. Try on a different IP/machine.')
                 exit(1)
             except UnexpectedResponseException:
-                self.logger.warning('Got a non-200 HTTP response from API. Retrying in 10 seconds...')
-                time.sleep(10)
+                self._record(methods, uncached_method_keys, failure=HTTP_ERROR)
+                self.pacer.failed(HTTP_ERROR, 'Got a non-200 HTTP response from API.', get_clock().time() - started)
                 continue
             except TypeError:
-                self.logger.warning('Failed to perform API call (servers might be offline). Retrying in 10 seconds...')
-                time.sleep(10)
+                self._record(methods, uncached_method_keys, failure=OFFLINE)
+                self.pacer.failed(OFFLINE, 'Failed to perform API call (servers might be offline).',
+                                  get_clock().time() - started)
                 continue
 
+            self._record(methods, uncached_method_keys, results)
+
             if results is False or results is None:
-                self.logger.warning('API call failed (empty response). Retrying in 10 seconds...')
-                time.sleep(10)
+                self.pacer.failed(EMPTY, 'API call failed (empty response).', get_clock().time() - started)
             else:
                 status_code = results.get('status_code', None)
                 if status_code == 3:
                     raise AccountBannedException()
                 elif status_code != 1:
-                    self.logger.warning('API call failed (status code {}). Retrying in 10 seconds...'.format(status_code))
-                    time.sleep(10)
+                    self.pacer.failed(BAD_STATUS, 'API call failed (status code {}).'.format(status_code),
+                                      get_clock().time() - started)
                     continue
 
-                # status code 1: success
-                with open('api-test.txt', 'w') as outfile:
-                    outfile.write(str(results))
+                self.pacer.succeeded(get_clock().time() - started)
 
+                # status code 1: success
                 self.state.mark_stale(uncached_method_keys)
 
                 # Transform our responses and return our current state
                 responses = results.get("responses", {})
                 for key in responses:
                     self.state.update_with_response(key, responses[key])
+                for listener in self._response_listeners:
+                    listener(methods, uncached_method_keys, responses)
                 return self.state.get_state()
         return None
+
+    def _record(self, methods, method_keys, results=None, failure=None):
+        if self.recorder is not None:
+            self.recorder.record(methods, method_keys, results, failure)
@@ -0,0 +1,121 @@
+import threading
+
+from six import integer_types  # type: ignore
+
+from app.clock import get_clock
+from .pacing import Backoff
+
+# Uncomment to enable type annotations for Python 3
+# from typing import Any, Callable, Dict, Optional
+
+
+class TokenRefresher(object):
+    """
+        Remembers when the auth ticket runs out instead of reading the ticket for every request, and logs in again
+        on a background thread once the ticket gets within margin seconds of expiring. The bot keeps walking while
+        that happens, it only has to log in on its own if the ticket ran out anyway.
+    """
+
+    def __init__(self, login, get_ticket, logger, margin=600.0):
+        # type: (Callable[[], bool], Callable[[], Any], Logger, float) -> None
+        self._login = login
+        self._get_ticket = get_ticket
+        self.logger = logger
+        self.margin = margin
+
+        self._expires_at = None
+        self._refreshing = False
+        self._retry_at = 0.0
+        self._backoff = Backoff(15.0, 300.0)
+        self._lock = threading.Lock()
+
+        self.logins = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency = None
+
+    def get_expiration_time(self):
+        # type: () -> int
+        """
+            Seconds until the ticket runs out.
+        """
+        if self._expires_at is None:
+            self._expires_at = self._read_ticket()
+        return int(self._expires_at - get_clock().time())
+
+    def _read_ticket(self):
+        # type: () -> float
+        ticket = self._get_ticket()
+        if ticket is False or ticket is None:
+            return 0.0
+        for field in ticket:
+            if isinstance(field, integer_types):
+                return field / 1000.0
+        return 0.0
+
+    def login(self):
+        # type: () -> bool
+        started = get_clock().time()
+        logged_in = self._login()
+        latency = get_clock().time() - started
+
+        with self._lock:
+            self._expires_at = None
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self.total_latency += latency
+            if logged_in is False:
+                self.failures += 1
+            else:
+                self.logins += 1
+        return logged_in
+
+    def refresh_ahead(self, expires_in):
+        # type: (int) -> None
+        """
+            Starts logging in again in the background if the ticket expires within the margin.
+        """
+        if expires_in > self.margin:
+            return
+        with self._lock:
+            if self._refreshing or get_clock().time() < self._retry_at:
+                return
+            self._refreshing = True
+
+        thread = threading.Thread(target=self._refresh, name='TokenRefresher')
+        thread.daemon = True
+        thread.start()
+
+    def _refresh(self):
+        # type: () -> None
+        try:
+            logged_in = self.login()
+        except Exception as error:  # pylint: disable=broad-except
+            self.logger.warning('Renewing the auth token failed: {}'.format(error))
+            logged_in = False
+
+        with self._lock:
+            self._refreshing = False
+            if logged_in is False:
+                self._retry_at = get_clock().time() + self._backoff.next_delay()
+            else:
+                self._backoff.reset()
+
+        if logged_in is False:
+            self.logger.warning('Could not renew the auth token, trying again in the background.')
+        else:
+            self.logger.debug('Renewed the auth token in {:.1f} seconds.'.format(self.last_latency))
+
+    def get_metrics(self):
+        # type: () -> Dict[str, Any]
+        with self._lock:
+            attempts = self.logins + self.failures
+            return {
+                'logins': self.logins,
+                'failures': self.failures,
+                'refreshing': self._refreshing,
+                'last_latency': self.last_latency,
+                'mean_latency': self.total_latency / attempts if attempts else None,
+                'max_latency': self.max_latency
+            }
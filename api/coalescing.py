@@ -0,0 +1,97 @@
+# Uncomment to enable type annotations for Python 3
+# from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class CallFuture(object):
+    """
+        Result of methods that were queued with PoGoApi.defer(). Resolves to the state once the request carrying
+        them was sent, or None if that request failed. Asking for the result early sends every deferred request.
+    """
+
+    def __init__(self, api_wrapper):
+        # type: (PoGoApi) -> None
+        self._api_wrapper = api_wrapper
+        self._done = False
+        self._result = None
+        self._callbacks = []
+
+    def done(self):
+        # type: () -> bool
+        return self._done
+
+    def result(self):
+        # type: () -> Optional[Dict[str, Any]]
+        if not self._done:
+            self._api_wrapper.flush()
+        return self._result
+
+    def add_done_callback(self, callback):
+        # type: (Callable[[Optional[Dict[str, Any]]], None]) -> CallFuture
+        if self._done:
+            callback(self._result)
+        else:
+            self._callbacks.append(callback)
+        return self
+
+    def set_result(self, result):
+        # type: (Optional[Dict[str, Any]]) -> None
+        self._done = True
+        self._result = result
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(result)
+
+
+class Envelope(object):
+    """
+        Methods of one or more callers that are sent as a single request. A caller's methods only join an envelope
+        if sending them together gives every caller the same state as sending them one after another.
+    """
+
+    def __init__(self, state, ignore_cache=False, max_age=None):
+        # type: (StateManager, bool, Optional[float]) -> None
+        self.state = state
+        self.ignore_cache = ignore_cache
+        self.max_age = max_age
+        self.methods = {}
+        self.method_keys = []
+        self.futures = []
+
+        self._returns = set()
+        self._mutates = set()
+
+    def accepts(self, methods, method_keys, ignore_cache, max_age=None):
+        # type: (Dict[str, Tuple], List[str], bool, Optional[float]) -> bool
+        if ignore_cache != self.ignore_cache or max_age != self.max_age:
+            return False
+
+        for method in method_keys:
+            mutates = self.state.method_mutates_states.get(method, [])
+            # It would invalidate a state that an earlier caller reads from this request
+            if self._returns.intersection(mutates):
+                return False
+
+            if method in self.methods:
+                # A request holds every method once, so only identical reads can be shared
+                if len(mutates) or self.methods[method] != methods[method]:
+                    return False
+                # The earlier read happens before something in this request changes the state
+                if self._mutates.intersection(self.state.method_returns_states.get(method, [])):
+                    return False
+        return True
+
+    def add(self, methods, method_keys, future):
+        # type: (Dict[str, Tuple], List[str], CallFuture) -> None
+        for method in method_keys:
+            if method in self.methods:
+                continue
+            self.methods[method] = methods[method]
+            self.method_keys.append(method)
+            self._returns.update(self.state.method_returns_states.get(method, []))
+            self._mutates.update(self.state.method_mutates_states.get(method, []))
+        self.futures.append(future)
+
+    def resolve(self, result):
+        # type: (Optional[Dict[str, Any]]) -> None
+        for future in self.futures:
+            future.set_result(result)
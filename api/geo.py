@@ -0,0 +1,13 @@
+from math import cos, hypot, radians
+
+# Mean earth radius (IUGG), used by the spherical approximations
+EARTH_RADIUS_METRES = 6371008.8
+
+
+def equirectangular_distance(lat1, lng1, lat2, lng2):
+    # type: (float, float, float, float) -> float
+    """
+        Distance in metres, accurate to a few centimetres over the distances the bot deals with (a cell radius).
+    """
+    d_lambda = radians(lng2 - lng1) * cos(radians((lat1 + lat2) / 2))
+    return EARTH_RADIUS_METRES * hypot(d_lambda, radians(lat2 - lat1))
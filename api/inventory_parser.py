@@ -1,14 +1,20 @@
+from collections import OrderedDict
+
 from .json_encodable import JSONEncodable
 from .pokemon import Egg, Pokemon
 from .item import Incubator
 
 
 class InventoryParser(JSONEncodable):
-    def __init__(self, data):
-        data = data.get("inventory_delta", {})
-        self.last_updated = data.get("new_timestamp_ms", 0)
+    """
+        The inventory, kept up to date by applying the inventory_delta of every GET_INVENTORY response. Items are
+        indexed by item_id, candy by family_id and pokemon, eggs and incubators by their unique id, so only entries
+        that changed are parsed again. The lists are only rebuilt when an entry was added, changed or removed.
+    """
+
+    def __init__(self, data=None):
+        self.last_updated = 0
 
-        items = data.get("inventory_items", [])
         self.items = {"count": 0}
         self.candy = {}
         self.pokedex_entries = {}
@@ -17,42 +23,102 @@ class InventoryParser(JSONEncodable):
         self.eggs = []
         self.egg_incubators = []
 
-        for item in items:
+        # unique id -> (response data, parsed object), in the order they were first seen
+        self._pokemon = OrderedDict()
+        self._incubators = OrderedDict()
+
+        if data is not None:
+            self.apply(data)
+
+    def apply(self, data):
+        data = data.get("inventory_delta", {})
+        # The server answers with everything when we did not send the timestamp of an earlier inventory
+        full = not data.get("original_timestamp_ms", 0)
+        self.last_updated = data.get("new_timestamp_ms", self.last_updated)
+
+        pokemon_seen = set()
+        items_seen = set()
+        candy_seen = set()
+        incubators_seen = False
+        changed = False
+
+        for item in data.get("inventory_items", []):
+            deleted = item.get("deleted_item_key", None)
+            if deleted is not None:
+                changed = self._pokemon.pop(deleted, None) is not None or changed
+                continue
+
             item = item.get("inventory_item_data", {})
 
             if "candy" in item:
                 num_candy = item["candy"].get("candy", 0)
                 family_id = item["candy"].get("family_id", 0)
-                if num_candy == 0 or family_id == 0:
+                if family_id == 0:
                     continue
-                if family_id not in self.candy:
-                    self.candy[family_id] = num_candy
+                candy_seen.add(family_id)
+                if num_candy == 0:
+                    self.candy.pop(family_id, None)
                 else:
-                    self.candy[family_id] += num_candy
+                    self.candy[family_id] = num_candy
 
             elif "egg_incubators" in item:
                 incubators = item['egg_incubators'].get('egg_incubator', [])
                 if isinstance(incubators, dict):
                     incubators = [incubators]
-                for incu in incubators:
-                    self.egg_incubators.append(Incubator(incu))
+                changed = self._apply_incubators(incubators) or changed
+                incubators_seen = True
 
             elif "item" in item:
                 num_item = item["item"].get("count", 0)
                 item_id = item["item"].get("item_id", 0)
-                if num_item == 0 or item_id == 0:
+                if item_id == 0:
                     continue
-
-                if item_id not in self.items:
-                    self.items[item_id] = num_item
+                items_seen.add(item_id)
+                if num_item == 0:
+                    self.items.pop(item_id, None)
                 else:
-                    self.items[item_id] += num_item
-
-                self.items["count"] += num_item
+                    self.items[item_id] = num_item
 
             elif "pokemon_data" in item:
                 current_data = item["pokemon_data"]
-                if current_data.get("is_egg", False):
-                    self.eggs.append(Egg(current_data))
-                else:
-                    self.pokemon.append(Pokemon(current_data))
+                unique_id = current_data.get("id", 0)
+                pokemon_seen.add(unique_id)
+                known = self._pokemon.get(unique_id, None)
+                if known is None or known[0] != current_data:
+                    parsed = Egg(current_data) if current_data.get("is_egg", False) else Pokemon(current_data)
+                    self._pokemon[unique_id] = (current_data, parsed)
+                    changed = True
+
+        if full:
+            # Whatever the full inventory does not mention is gone
+            for unique_id in [unique_id for unique_id in self._pokemon if unique_id not in pokemon_seen]:
+                del self._pokemon[unique_id]
+                changed = True
+            for item_id in [item_id for item_id in self.items if item_id != "count" and item_id not in items_seen]:
+                del self.items[item_id]
+            for family_id in [family_id for family_id in self.candy if family_id not in candy_seen]:
+                del self.candy[family_id]
+            if not incubators_seen and len(self._incubators):
+                changed = self._apply_incubators([]) or changed
+
+        self.items["count"] = sum(count for item_id, count in self.items.items() if item_id != "count")
+
+        if changed:
+            self.pokemon = [parsed for _, parsed in self._pokemon.values() if isinstance(parsed, Pokemon)]
+            self.eggs = [parsed for _, parsed in self._pokemon.values() if isinstance(parsed, Egg)]
+            self.egg_incubators = [parsed for _, parsed in self._incubators.values()]
+
+    def _apply_incubators(self, incubators):
+        # The incubators always come as a whole
+        known = self._incubators
+        self._incubators = OrderedDict()
+        changed = len(known) != len(incubators)
+        for data in incubators:
+            unique_id = data.get("id", 0)
+            previous = known.get(unique_id, None)
+            if previous is not None and previous[0] == data:
+                self._incubators[unique_id] = previous
+            else:
+                self._incubators[unique_id] = (data, Incubator(data))
+                changed = True
+        return changed
@@ -0,0 +1,115 @@
+from app.clock import get_clock
+from api.offline.world import SyntheticWorld
+
+# Uncomment to enable type annotations for Python 3
+# from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+class OfflineAuthProvider(object):
+    def get_ticket(self):
+        # type: () -> Tuple[int, str, str]
+        # Tickets never run out, they are always valid for another hour
+        return int((get_clock().time() + 3600) * 1000), "offline", "offline"
+
+
+class OfflineRequest(object):
+    """
+        Collects RPCs like a pgoapi request and answers them from the synthetic world when called.
+    """
+
+    def __init__(self, api):
+        # type: (OfflinePGoApi) -> None
+        self._api = api
+        self._methods = []
+
+    def __getattr__(self, method):
+        def queue(*args, **kwargs):  # pylint: disable=unused-argument
+            self._methods.append((method.upper(), kwargs))
+            return self
+
+        return queue
+
+    def call(self):
+        # type: () -> Dict[str, Any]
+        self._api.rpc_count += 1
+
+        responses = {}
+        for method, kwargs in self._methods:
+            self._api.method_counts[method] = self._api.method_counts.get(method, 0) + 1
+            response = self._api.world.handle(method, kwargs)
+            if response is not None:
+                responses[method] = response
+        self._methods = []
+
+        return {"status_code": 1, "responses": responses}
+
+
+class OfflinePGoApi(object):
+    """
+        Stand-in for pgoapi.PGoApi that never leaves the process. Every request is answered by a
+        SyntheticWorld, so the whole bot can run without an account, network access or the signature library.
+    """
+
+    def __init__(self, world=None):
+        # type: (Optional[SyntheticWorld]) -> None
+        self.world = world or SyntheticWorld()
+        self._auth_provider = OfflineAuthProvider()
+        self.rpc_count = 0
+        self.method_counts = {}
+
+    def activate_signature(self, shared_lib):  # pylint: disable=unused-argument
+        pass
+
+    def login(self, provider, username, password, app_simulation=True):  # pylint: disable=unused-argument
+        # type: (str, str, str, bool) -> bool
+        self.world.username = username
+        return True
+
+    def set_position(self, lat, lng, alt):
+        # type: (float, float, float) -> None
+        self.world.move_to(lat, lng, alt)
+
+    def get_position(self):
+        # type: () -> Tuple[float, float, float]
+        return self.world.position
+
+    @staticmethod
+    def list_curr_methods():
+        # type: () -> List[str]
+        return []
+
+    def create_request(self):
+        # type: () -> OfflineRequest
+        return OfflineRequest(self)
+
+
+class OfflineMaps(object):
+    """
+        Stand-in for the google maps client. Elevations come from the synthetic world and there are no
+        walking directions, so the google path finder falls back to walking straight to each destination.
+    """
+
+    def __init__(self, world):
+        # type: (SyntheticWorld) -> None
+        self.world = world
+
+    def elevation(self, locations):
+        # type: (Union[Tuple[float, float], List[Tuple[float, float]]]) -> List[Dict[str, Any]]
+        # Like the google client, takes a single location or a list of them
+        if len(locations) == 2 and not isinstance(locations[0], (list, tuple)):
+            locations = [locations]
+        return [{
+            "elevation": self.world.elevation(lat, lng),
+            "location": {"lat": lat, "lng": lng},
+            "resolution": 1.0
+        } for lat, lng in locations]
+
+    @staticmethod
+    def geocode(location):
+        # type: (str) -> None
+        raise ValueError('Cannot look up "{}" offline, set mapping.location to "<lat>,<lng>"'.format(location))
+
+    @staticmethod
+    def directions(origin, destination, **kwargs):  # pylint: disable=unused-argument
+        # type: (str, str, **Any) -> List[Dict[str, Any]]
+        return []
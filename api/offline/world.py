@@ -0,0 +1,813 @@
+import copy
+import json
+import os
+import random
+from math import cos, radians
+
+from s2sphere import Cell, CellId, LatLng  # type: ignore
+
+from app.clock import get_clock
+from api.geo import equirectangular_distance as _distance
+
+# Uncomment to enable type annotations for Python 3
+# from typing import Any, Dict, List, Optional, Tuple
+
+# Total experience needed for each level, index 0 is level 1
+LEVEL_XP = (0, 1000, 3000, 6000, 10000, 15000, 21000, 28000, 36000, 45000, 55000, 65000, 75000, 85000, 100000,
+            120000, 140000, 160000, 185000, 210000, 260000, 335000, 435000, 560000, 710000, 900000, 1100000,
+            1350000, 1650000, 2000000, 2500000, 3000000, 3750000, 4750000, 6000000, 7500000, 9500000, 12000000,
+            15000000, 20000000)
+
+# Pokemon that never show up in the wild
+UNCATCHABLE = (132, 144, 145, 146, 150, 151)
+
+# (item id, weight) of what a pokestop hands out
+POKESTOP_LOOT = ((1, 60), (2, 10), (101, 15), (201, 5), (701, 10))
+
+BALL_CATCH_RATE = {1: 0.5, 2: 0.65, 3: 0.8, 4: 1.0}
+FLEE_RATE = 0.1
+
+CATCHABLE_RANGE = 70
+FORT_RANGE = 40
+POKESTOP_COOLDOWN = 300
+SPAWN_DURATION = 900
+LURE_DURATION = 1800
+
+
+class SyntheticWorld(object):
+    """
+        Seeded game world for the offline API. Cells are generated on first sight from the seed and the S2 cell
+        id, so the same seed always produces the same forts, spawn points and pokemon wherever the bot walks.
+        Player state (inventory, pokemon, candy, eggs, cooldowns) lives here too and follows the game rules
+        closely enough for the bot to run against it: storage limits, pokestop cooldowns, catch and flee
+        rates, egg hatching by distance walked and candy costs for evolving.
+    """
+
+    def __init__(self, seed=1337, pokestops_per_cell=1.5, gyms_per_cell=0.25, spawn_points_per_cell=6.0,
+                 lure_chance=0.05, max_pokemon_storage=250, max_item_storage=350, pokemon_file='data/pokemon.json'):
+        # type: (int, float, float, float, float, int, int, str) -> None
+        self.seed = seed
+        self.pokestops_per_cell = pokestops_per_cell
+        self.gyms_per_cell = gyms_per_cell
+        self.spawn_points_per_cell = spawn_points_per_cell
+        self.lure_chance = lure_chance
+
+        self._rng = random.Random(seed)
+        self._next_id = 1
+
+        self.cells = {}
+        self.forts = {}
+        self.spawn_points = {}
+        self.encounters = {}
+        self._finished_encounters = set()
+
+        self.position = (0.0, 0.0, 0.0)
+
+        self.username = "offline"
+        self.max_pokemon_storage = max_pokemon_storage
+        self.max_item_storage = max_item_storage
+        self.creation_timestamp_ms = self._now_ms()
+        self.stats = {
+            "experience": 0,
+            "level": 1,
+            "km_walked": 0.0,
+            "pokeballs_thrown": 0,
+            "pokemons_captured": 0,
+            "pokemons_encountered": 0,
+            "poke_stop_visits": 0,
+            "unique_pokedex_entries": 0
+        }
+        self.stardust = 0
+        self.pokedex = set()
+        self.items = {1: 50, 2: 10, 101: 10}
+        self.pokemon = {}
+        self.candy = {}
+        self.incubators = [{
+            "id": "EggIncubatorProto-offline",
+            "item_id": 901,
+            "incubator_type": 1,
+            "uses_remaining": 0,
+            "pokemon_id": 0,
+            "start_km_walked": 0.0,
+            "target_km_walked": 0.0
+        }]
+        self.awarded_levels = set()
+
+        # What the client was last told about every inventory entry and when that changed, for inventory deltas
+        self._inventory_sent = {}
+        self._inventory_deleted = {}
+
+        self.families, self.evolutions = self._load_pokemon(pokemon_file)
+
+        self._handlers = {
+            "GET_PLAYER": self.get_player,
+            "GET_INVENTORY": self.get_inventory,
+            "GET_MAP_OBJECTS": self.get_map_objects,
+            "ENCOUNTER": self.encounter,
+            "DISK_ENCOUNTER": self.disk_encounter,
+            "RELEASE_POKEMON": self.release_pokemon,
+            "CATCH_POKEMON": self.catch_pokemon,
+            "PLAYER_UPDATE": self.player_update,
+            "FORT_DETAILS": self.fort_details,
+            "FORT_SEARCH": self.fort_search,
+            "RECYCLE_INVENTORY_ITEM": self.recycle_inventory_item,
+            "USE_ITEM_EGG_INCUBATOR": self.use_item_egg_incubator,
+            "GET_HATCHED_EGGS": self.get_hatched_eggs,
+            "EVOLVE_POKEMON": self.evolve_pokemon,
+            "DOWNLOAD_ITEM_TEMPLATES": self.download_item_templates,
+            "SET_FAVORITE_POKEMON": self.set_favorite_pokemon,
+            "LEVEL_UP_REWARDS": self.level_up_rewards
+        }
+
+    @staticmethod
+    def _load_pokemon(pokemon_file):
+        # type: (str) -> Tuple[Dict[int, int], Dict[int, Tuple[int, int]]]
+        # Family (candy) id and (evolves into, candy cost) per pokemon, from the same data file the bot uses
+        families = {}
+        evolutions = {}
+        if pokemon_file is None or not os.path.isfile(pokemon_file):
+            return families, evolutions
+
+        with open(pokemon_file) as data_file:
+            pokemon_list = json.load(data_file)
+        for pokemon in pokemon_list:
+            number = int(pokemon["Number"])
+            previous = pokemon.get("Previous evolution(s)", [])
+            families[number] = int(previous[0]["Number"]) if len(previous) else number
+            requirements = pokemon.get("Next Evolution Requirements", None)
+            next_evolutions = pokemon.get("Next evolution(s)", [])
+            if requirements is not None and len(next_evolutions):
+                evolutions[number] = (int(next_evolutions[0]["Number"]), int(requirements["Amount"]))
+        return families, evolutions
+
+    @staticmethod
+    def _now_ms():
+        # type: () -> int
+        return int(get_clock().time() * 1000)
+
+    def _new_id(self):
+        # type: () -> int
+        self._next_id += 1
+        return self._next_id
+
+    def handle(self, method, kwargs):
+        # type: (str, Dict[str, Any]) -> Optional[Dict[str, Any]]
+        """
+            Response data for one RPC, or None for methods that return nothing.
+        """
+        handler = self._handlers.get(method, None)
+        if handler is None:
+            return None
+        return handler(**kwargs)
+
+    def move_to(self, lat, lng, alt):
+        # type: (float, float, float) -> None
+        if self.position[0] != 0.0 or self.position[1] != 0.0:
+            self.stats["km_walked"] += _distance(self.position[0], self.position[1], lat, lng) / 1000.0
+        self.position = (lat, lng, alt)
+
+    def elevation(self, lat, lng):
+        # type: (float, float) -> float
+        # Gentle rolling terrain so that altitudes are not all the same
+        return 20.0 + 5.0 * (cos(radians(lat * 1000)) + cos(radians(lng * 1000)))
+
+    # World generation
+
+    def _get_cell(self, cell_id):
+        # type: (int) -> Dict[str, Any]
+        cell = self.cells.get(cell_id, None)
+        if cell is None:
+            cell = self._generate_cell(cell_id)
+            self.cells[cell_id] = cell
+        return cell
+
+    def _generate_cell(self, cell_id):
+        # type: (int) -> Dict[str, Any]
+        rng = random.Random("{}:{}".format(self.seed, cell_id))
+        s2_cell_id = CellId(cell_id)
+        s2_cell = Cell(s2_cell_id)
+        vertices = [LatLng.from_point(s2_cell.get_vertex(i)) for i in range(4)]
+        lats = [vertex.lat().degrees for vertex in vertices]
+        lngs = [vertex.lng().degrees for vertex in vertices]
+
+        def random_point():
+            for _ in range(10):
+                lat = rng.uniform(min(lats), max(lats))
+                lng = rng.uniform(min(lngs), max(lngs))
+                if CellId.from_lat_lng(LatLng.from_degrees(lat, lng)).parent(s2_cell_id.level()) == s2_cell_id:
+                    break
+            return lat, lng
+
+        def count(mean):
+            return int(mean) + (1 if rng.random() < mean - int(mean) else 0)
+
+        token = s2_cell_id.to_token()
+        cell = {"forts": [], "spawn_points": []}
+        for index in range(count(self.pokestops_per_cell)):
+            lat, lng = random_point()
+            fort_id = "{}.{}".format(token, index)
+            self.forts[fort_id] = {
+                "id": fort_id,
+                "name": "Synthetic Stop {}-{}".format(token, index),
+                "latitude": lat,
+                "longitude": lng,
+                "type": 1,
+                "enabled": True,
+                "last_modified_timestamp_ms": 1,
+                "cooldown_complete_timestamp_ms": 0,
+                "lured": rng.random() < self.lure_chance,
+                "lure_offset": rng.uniform(0, 2 * LURE_DURATION)
+            }
+            cell["forts"].append(fort_id)
+
+        for index in range(count(self.gyms_per_cell)):
+            lat, lng = random_point()
+            fort_id = "{}.g{}".format(token, index)
+            self.forts[fort_id] = {
+                "id": fort_id,
+                "name": "Synthetic Gym {}-{}".format(token, index),
+                "latitude": lat,
+                "longitude": lng,
+                "type": 2,
+                "enabled": True,
+                "last_modified_timestamp_ms": 1,
+                "owned_by_team": rng.randint(0, 3),
+                "guard_pokemon_id": rng.randint(1, 149),
+                "gym_points": rng.randint(0, 50000)
+            }
+            cell["forts"].append(fort_id)
+
+        for index in range(count(self.spawn_points_per_cell)):
+            lat, lng = random_point()
+            spawn_id = "{}.s{}".format(token, index)
+            self.spawn_points[spawn_id] = {
+                "id": spawn_id,
+                "latitude": lat,
+                "longitude": lng,
+                "offset": rng.uniform(0, 3600)
+            }
+            cell["spawn_points"].append(spawn_id)
+
+        return cell
+
+    def _generate_pokemon(self, key, pokemon_id=None):
+        # type: (str, Optional[int]) -> Dict[str, Any]
+        rng = random.Random("{}:{}".format(self.seed, key))
+        if pokemon_id is None:
+            pokemon_id = rng.choice([number for number in range(1, 152) if number not in UNCATCHABLE])
+        attack = rng.randint(0, 15)
+        defense = rng.randint(0, 15)
+        stamina = rng.randint(0, 15)
+        return {
+            "pokemon_id": pokemon_id,
+            "cp": rng.randint(10, 10 + 40 * (self.stats["level"] + 5)),
+            "stamina_max": rng.randint(10, 150),
+            "individual_attack": attack,
+            "individual_defense": defense,
+            "individual_stamina": stamina,
+            "cp_multiplier": 0.094 + 0.02 * self.stats["level"],
+            "move_1": rng.randint(200, 250),
+            "move_2": rng.randint(13, 140),
+            "height_m": rng.uniform(0.3, 2.0),
+            "weight_kg": rng.uniform(1.0, 100.0)
+        }
+
+    def _active_spawn(self, spawn_point, now):
+        # type: (Dict[str, Any], float) -> Optional[Dict[str, Any]]
+        # Every spawn point is active for SPAWN_DURATION seconds once an hour, at its own offset
+        for hour in (int(now // 3600), int(now // 3600) - 1):
+            start = hour * 3600 + spawn_point["offset"]
+            if start <= now < start + SPAWN_DURATION:
+                key = "{}:{}".format(spawn_point["id"], hour)
+                encounter_id = random.Random("{}:{}".format(self.seed, key)).getrandbits(62)
+                if encounter_id not in self.encounters:
+                    self.encounters[encounter_id] = {
+                        "encounter_id": encounter_id,
+                        "spawn_point_id": spawn_point["id"],
+                        "latitude": spawn_point["latitude"],
+                        "longitude": spawn_point["longitude"],
+                        "expiration_timestamp_ms": int((start + SPAWN_DURATION) * 1000),
+                        "pokemon_data": self._generate_pokemon(key),
+                        "active": False
+                    }
+                return self.encounters[encounter_id]
+        return None
+
+    def _active_lure(self, fort, now):
+        # type: (Dict[str, Any], float) -> Optional[Tuple[float, Dict[str, Any]]]
+        # Lured stops are lured for LURE_DURATION seconds out of every two lure durations
+        if not fort.get("lured", False):
+            return None
+        period = 2 * LURE_DURATION
+        cycle = int((now - fort["lure_offset"]) // period)
+        start = cycle * period + fort["lure_offset"]
+        if now >= start + LURE_DURATION:
+            return None
+
+        key = "{}:lure:{}".format(fort["id"], cycle)
+        encounter_id = random.Random("{}:{}".format(self.seed, key)).getrandbits(62)
+        if encounter_id not in self.encounters:
+            self.encounters[encounter_id] = {
+                "encounter_id": encounter_id,
+                "fort_id": fort["id"],
+                "latitude": fort["latitude"],
+                "longitude": fort["longitude"],
+                "expiration_timestamp_ms": int((start + LURE_DURATION) * 1000),
+                "pokemon_data": self._generate_pokemon(key),
+                "active": False
+            }
+        return start, self.encounters[encounter_id]
+
+    def _fort_modified_ms(self, fort, now):
+        # type: (Dict[str, Any], float) -> int
+        modified = fort["last_modified_timestamp_ms"]
+        if fort.get("lured", False):
+            # Lures starting or running out change the fort as well
+            period = 2 * LURE_DURATION
+            start = (now - fort["lure_offset"]) // period * period + fort["lure_offset"]
+            transition = start + LURE_DURATION if now >= start + LURE_DURATION else start
+            modified = max(modified, int(transition * 1000))
+        return modified
+
+    def _fort_data(self, fort, now):
+        # type: (Dict[str, Any], float) -> Dict[str, Any]
+        data = {
+            "id": fort["id"],
+            "latitude": fort["latitude"],
+            "longitude": fort["longitude"],
+            "enabled": fort["enabled"],
+            "last_modified_timestamp_ms": self._fort_modified_ms(fort, now),
+            "type": fort["type"]
+        }
+        if fort["type"] == 1:
+            data["cooldown_complete_timestamp_ms"] = fort["cooldown_complete_timestamp_ms"]
+            lure = self._active_lure(fort, now)
+            if lure is not None:
+                _, encounter = lure
+                data["active_fort_modifier"] = [501]
+                data["lure_info"] = {
+                    "fort_id": fort["id"],
+                    "encounter_id": encounter["encounter_id"],
+                    "active_pokemon_id": encounter["pokemon_data"]["pokemon_id"],
+                    "lure_expires_timestamp_ms": encounter["expiration_timestamp_ms"]
+                }
+        else:
+            data["owned_by_team"] = fort["owned_by_team"]
+            data["guard_pokemon_id"] = fort["guard_pokemon_id"]
+            data["gym_points"] = fort["gym_points"]
+        return data
+
+    # Player bookkeeping
+
+    def _add_experience(self, experience):
+        # type: (int) -> None
+        self.stats["experience"] += experience
+        while self.stats["level"] < len(LEVEL_XP) and self.stats["experience"] >= LEVEL_XP[self.stats["level"]]:
+            self.stats["level"] += 1
+
+    def _item_count(self):
+        # type: () -> int
+        return sum(self.items.values())
+
+    def _pokemon_count(self):
+        # type: () -> int
+        return len(self.pokemon)
+
+    def _add_pokemon(self, data, pokeball=1):
+        # type: (Dict[str, Any], int) -> Dict[str, Any]
+        pokemon = dict(data)
+        pokemon["id"] = self._new_id()
+        pokemon["pokeball"] = pokeball
+        pokemon["creation_time_ms"] = self._now_ms()
+        self.pokemon[pokemon["id"]] = pokemon
+
+        if pokemon["pokemon_id"] not in self.pokedex:
+            self.pokedex.add(pokemon["pokemon_id"])
+            self.stats["unique_pokedex_entries"] = len(self.pokedex)
+        return pokemon
+
+    def _family(self, pokemon_id):
+        # type: (int) -> int
+        return self.families.get(pokemon_id, pokemon_id)
+
+    # RPC handlers, named after the methods they implement
+
+    def get_player(self, **kwargs):  # pylint: disable=unused-argument
+        return {
+            "success": True,
+            "player_data": {
+                "username": self.username,
+                "creation_timestamp_ms": self.creation_timestamp_ms,
+                "max_pokemon_storage": self.max_pokemon_storage,
+                "max_item_storage": self.max_item_storage,
+                "currencies": [
+                    {"name": "POKECOIN", "amount": 0},
+                    {"name": "STARDUST", "amount": self.stardust}
+                ]
+            }
+        }
+
+    def get_inventory(self, last_timestamp_ms=0, **kwargs):  # pylint: disable=unused-argument
+        level = self.stats["level"]
+        player_stats = dict(self.stats)
+        player_stats["prev_level_xp"] = LEVEL_XP[level - 1]
+        player_stats["next_level_xp"] = LEVEL_XP[level] if level < len(LEVEL_XP) else LEVEL_XP[-1]
+
+        entries = [(("player_stats", 0), {"player_stats": player_stats})]
+        for item_id, count in self.items.items():
+            entries.append((("item", item_id), {"item": {"item_id": item_id, "count": count}}))
+        for pokemon in self.pokemon.values():
+            entries.append((("pokemon", pokemon["id"]), {"pokemon_data": pokemon}))
+        for family_id, candy in self.candy.items():
+            entries.append((("candy", family_id), {"candy": {"family_id": family_id, "candy": candy}}))
+        entries.append((("egg_incubators", 0), {"egg_incubators": {"egg_incubator": list(self.incubators)}}))
+
+        # Like the real servers, only send what changed since the timestamp the client sent
+        now_ms = self._now_ms()
+        current = set()
+        for key, data in entries:
+            current.add(key)
+            sent = self._inventory_sent.get(key, None)
+            if sent is None or sent[0] != data:
+                self._inventory_sent[key] = (copy.deepcopy(data), now_ms)
+                self._inventory_deleted.pop(key, None)
+        for key in [key for key in self._inventory_sent if key not in current]:
+            del self._inventory_sent[key]
+            self._inventory_deleted[key] = now_ms
+
+        inventory_items = []
+        for key, data in entries:
+            if self._inventory_sent[key][1] >= last_timestamp_ms:
+                inventory_items.append({"inventory_item_data": data})
+        if last_timestamp_ms:
+            for (kind, key), deleted_ms in self._inventory_deleted.items():
+                if deleted_ms < last_timestamp_ms:
+                    continue
+                if kind == "pokemon":
+                    inventory_items.append({"deleted_item_key": key})
+                elif kind == "item":
+                    inventory_items.append({"inventory_item_data": {"item": {"item_id": key, "count": 0}}})
+                elif kind == "candy":
+                    inventory_items.append({"inventory_item_data": {"candy": {"family_id": key, "candy": 0}}})
+
+        return {
+            "success": True,
+            "inventory_delta": {
+                "original_timestamp_ms": last_timestamp_ms,
+                "new_timestamp_ms": now_ms,
+                "inventory_items": inventory_items
+            }
+        }
+
+    def get_map_objects(self, latitude=None, longitude=None, since_timestamp_ms=None, cell_id=None, **kwargs):  # pylint: disable=unused-argument
+        now = get_clock().time()
+        now_ms = int(now * 1000)
+        latitude = self.position[0] if latitude is None else latitude
+        longitude = self.position[1] if longitude is None else longitude
+        cell_ids = cell_id or []
+        since_timestamp_ms = since_timestamp_ms or [0] * len(cell_ids)
+
+        map_cells = []
+        for s2_cell_id, since in zip(cell_ids, since_timestamp_ms):
+            cell = self._get_cell(s2_cell_id)
+
+            forts = []
+            for fort_id in cell["forts"]:
+                fort = self.forts[fort_id]
+                if self._fort_modified_ms(fort, now) > since:
+                    forts.append(self._fort_data(fort, now))
+
+            spawn_points = []
+            catchable_pokemons = []
+            for spawn_id in cell["spawn_points"]:
+                spawn_point = self.spawn_points[spawn_id]
+                spawn_points.append({"latitude": spawn_point["latitude"], "longitude": spawn_point["longitude"]})
+
+                encounter = self._active_spawn(spawn_point, now)
+                if encounter is None or encounter["encounter_id"] in self._finished_encounters:
+                    continue
+                if _distance(latitude, longitude, spawn_point["latitude"], spawn_point["longitude"]) > CATCHABLE_RANGE:
+                    continue
+                catchable_pokemons.append({
+                    "encounter_id": encounter["encounter_id"],
+                    "spawn_point_id": encounter["spawn_point_id"],
+                    "latitude": encounter["latitude"],
+                    "longitude": encounter["longitude"],
+                    "pokemon_id": encounter["pokemon_data"]["pokemon_id"],
+                    "expiration_timestamp_ms": encounter["expiration_timestamp_ms"]
+                })
+
+            map_cells.append({
+                "s2_cell_id": s2_cell_id,
+                "current_timestamp_ms": now_ms,
+                "forts": forts,
+                "spawn_points": spawn_points,
+                "catchable_pokemons": catchable_pokemons,
+                "nearby_pokemons": [],
+                "wild_pokemons": []
+            })
+
+        return {"status": 1, "map_cells": map_cells}
+
+    def _start_encounter(self, encounter_id, player_latitude, player_longitude):
+        # type: (int, Optional[float], Optional[float]) -> Tuple[str, Optional[Dict[str, Any]]]
+        encounter = self.encounters.get(encounter_id, None)
+        if encounter is None or encounter["expiration_timestamp_ms"] < self._now_ms():
+            return "not_found", None
+        if encounter_id in self._finished_encounters:
+            return "finished", None
+        if self._pokemon_count() >= self.max_pokemon_storage:
+            return "full", None
+        player_latitude = self.position[0] if player_latitude is None else player_latitude
+        player_longitude = self.position[1] if player_longitude is None else player_longitude
+        if _distance(player_latitude, player_longitude, encounter["latitude"], encounter["longitude"]) > CATCHABLE_RANGE:
+            return "out_of_range", None
+
+        if not encounter["active"]:
+            encounter["active"] = True
+            self.stats["pokemons_encountered"] += 1
+        return "success", encounter
+
+    def _capture_probability(self):
+        # type: () -> Dict[str, List[Any]]
+        return {
+            "pokeball_type": [1, 2, 3],
+            "capture_probability": [BALL_CATCH_RATE[1], BALL_CATCH_RATE[2], BALL_CATCH_RATE[3]]
+        }
+
+    def encounter(self, encounter_id=None, spawn_point_id=None, player_latitude=None, player_longitude=None, **kwargs):  # pylint: disable=unused-argument
+        result, encounter = self._start_encounter(encounter_id, player_latitude, player_longitude)
+        status = {"success": 1, "not_found": 2, "out_of_range": 5, "finished": 6, "full": 7}[result]
+        if encounter is None:
+            return {"status": status}
+
+        expires_in = encounter["expiration_timestamp_ms"] - self._now_ms()
+        return {
+            "status": status,
+            "wild_pokemon": {
+                "encounter_id": encounter["encounter_id"],
+                "spawn_point_id": encounter["spawn_point_id"],
+                "latitude": encounter["latitude"],
+                "longitude": encounter["longitude"],
+                "last_modified_timestamp_ms": self._now_ms(),
+                "time_until_hidden_ms": expires_in,
+                "pokemon_data": encounter["pokemon_data"]
+            },
+            "capture_probability": self._capture_probability()
+        }
+
+    def disk_encounter(self, encounter_id=None, fort_id=None, player_latitude=None, player_longitude=None, **kwargs):  # pylint: disable=unused-argument
+        result, encounter = self._start_encounter(encounter_id, player_latitude, player_longitude)
+        status = {"success": 1, "not_found": 2, "out_of_range": 3, "finished": 4, "full": 5}[result]
+        if encounter is None:
+            return {"result": status}
+
+        return {
+            "result": status,
+            "pokemon_data": encounter["pokemon_data"],
+            "capture_probability": self._capture_probability()
+        }
+
+    def catch_pokemon(self, encounter_id=None, pokeball=1, **kwargs):  # pylint: disable=unused-argument
+        encounter = self.encounters.get(encounter_id, None)
+        if encounter is None or not encounter["active"] or encounter_id in self._finished_encounters:
+            return {"status": 0}
+        if self.items.get(pokeball, 0) <= 0:
+            return {"status": 0}
+
+        self.items[pokeball] -= 1
+        if self.items[pokeball] == 0:
+            del self.items[pokeball]
+        self.stats["pokeballs_thrown"] += 1
+
+        roll = self._rng.random()
+        catch_rate = BALL_CATCH_RATE.get(pokeball, BALL_CATCH_RATE[1])
+        if roll >= catch_rate + FLEE_RATE:
+            return {"status": 2}
+        if roll >= catch_rate:
+            self._finished_encounters.add(encounter_id)
+            return {"status": 3}
+
+        self._finished_encounters.add(encounter_id)
+        pokemon = self._add_pokemon(encounter["pokemon_data"], pokeball)
+        family_id = self._family(pokemon["pokemon_id"])
+        self.candy[family_id] = self.candy.get(family_id, 0) + 3
+        self.stardust += 100
+        self.stats["pokemons_captured"] += 1
+        self._add_experience(100)
+
+        return {
+            "status": 1,
+            "captured_pokemon_id": pokemon["id"],
+            "capture_award": {
+                "activity_type": [1],
+                "xp": [100],
+                "candy": [3],
+                "stardust": [100]
+            }
+        }
+
+    def release_pokemon(self, pokemon_id=None, **kwargs):  # pylint: disable=unused-argument
+        pokemon = self.pokemon.get(pokemon_id, None)
+        if pokemon is None:
+            return {"result": 3}
+        if pokemon.get("is_egg", False):
+            return {"result": 4}
+
+        del self.pokemon[pokemon_id]
+        family_id = self._family(pokemon["pokemon_id"])
+        self.candy[family_id] = self.candy.get(family_id, 0) + 1
+        return {"result": 1, "candy_awarded": 1}
+
+    def player_update(self, latitude=None, longitude=None, **kwargs):  # pylint: disable=unused-argument
+        if latitude is not None and longitude is not None:
+            self.move_to(latitude, longitude, self.position[2])
+        return {}
+
+    def fort_details(self, fort_id=None, **kwargs):  # pylint: disable=unused-argument
+        fort = self.forts.get(fort_id, None)
+        if fort is None:
+            return None
+        return {
+            "fort_id": fort["id"],
+            "name": fort["name"],
+            "description": "",
+            "image_urls": [],
+            "latitude": fort["latitude"],
+            "longitude": fort["longitude"],
+            "type": fort["type"]
+        }
+
+    def fort_search(self, fort_id=None, player_latitude=None, player_longitude=None, **kwargs):  # pylint: disable=unused-argument
+        fort = self.forts.get(fort_id, None)
+        if fort is None or fort["type"] != 1:
+            return {"result": 0}
+
+        now_ms = self._now_ms()
+        player_latitude = self.position[0] if player_latitude is None else player_latitude
+        player_longitude = self.position[1] if player_longitude is None else player_longitude
+        if _distance(player_latitude, player_longitude, fort["latitude"], fort["longitude"]) > FORT_RANGE:
+            return {"result": 2}
+        if fort["cooldown_complete_timestamp_ms"] > now_ms:
+            return {"result": 3, "cooldown_complete_timestamp_ms": fort["cooldown_complete_timestamp_ms"]}
+
+        fort["cooldown_complete_timestamp_ms"] = now_ms + POKESTOP_COOLDOWN * 1000
+        fort["last_modified_timestamp_ms"] = now_ms
+        self.stats["poke_stop_visits"] += 1
+        self._add_experience(50)
+
+        response = {
+            "experience_awarded": 50,
+            "cooldown_complete_timestamp_ms": fort["cooldown_complete_timestamp_ms"]
+        }
+
+        if self._item_count() >= self.max_item_storage:
+            response["result"] = 4
+            return response
+
+        items_awarded = []
+        loot, weights = zip(*POKESTOP_LOOT)
+        for _ in range(min(3, self.max_item_storage - self._item_count())):
+            item_id = self._weighted_choice(loot, weights)
+            self.items[item_id] = self.items.get(item_id, 0) + 1
+            items_awarded.append({"item_id": item_id, "item_count": 1})
+        response["result"] = 1
+        response["items_awarded"] = items_awarded
+
+        if self._pokemon_count() < self.max_pokemon_storage and self._rng.random() < 0.1:
+            egg = self._add_pokemon({
+                "pokemon_id": 0,
+                "is_egg": True,
+                "egg_km_walked_target": self._rng.choice([2.0, 5.0, 10.0]),
+                "egg_km_walked_start": 0.0,
+                "egg_incubator_id": ""
+            })
+            response["pokemon_data_egg"] = egg
+
+        return response
+
+    def _weighted_choice(self, choices, weights):
+        roll = self._rng.uniform(0, sum(weights))
+        for choice, weight in zip(choices, weights):
+            roll -= weight
+            if roll <= 0:
+                return choice
+        return choices[-1]
+
+    def recycle_inventory_item(self, item_id=None, count=0, **kwargs):  # pylint: disable=unused-argument
+        if self.items.get(item_id, 0) < count:
+            return {"result": 2}
+        self.items[item_id] -= count
+        new_count = self.items[item_id]
+        if new_count == 0:
+            del self.items[item_id]
+        return {"result": 1, "new_count": new_count}
+
+    def use_item_egg_incubator(self, item_id=None, pokemon_id=None, **kwargs):  # pylint: disable=unused-argument
+        incubator = None
+        for candidate in self.incubators:
+            if candidate["id"] == item_id:
+                incubator = candidate
+        if incubator is None:
+            return {"result": 2}
+
+        egg = self.pokemon.get(pokemon_id, None)
+        if egg is None:
+            return {"result": 3}
+        if not egg.get("is_egg", False):
+            return {"result": 4}
+        if incubator["pokemon_id"] != 0:
+            return {"result": 5}
+        if egg["egg_incubator_id"] != "":
+            return {"result": 6}
+
+        egg["egg_incubator_id"] = incubator["id"]
+        incubator["pokemon_id"] = egg["id"]
+        incubator["start_km_walked"] = self.stats["km_walked"]
+        incubator["target_km_walked"] = self.stats["km_walked"] + egg["egg_km_walked_target"]
+        return {"result": 1, "egg_incubator": dict(incubator)}
+
+    def get_hatched_eggs(self, **kwargs):  # pylint: disable=unused-argument
+        response = {
+            "success": True,
+            "pokemon_id": [],
+            "experience_awarded": [],
+            "candy_awarded": [],
+            "stardust_awarded": []
+        }
+        for incubator in self.incubators:
+            if incubator["pokemon_id"] == 0 or incubator["target_km_walked"] > self.stats["km_walked"]:
+                continue
+
+            egg = self.pokemon.pop(incubator["pokemon_id"], None)
+            incubator["pokemon_id"] = 0
+            if egg is None:
+                continue
+
+            pokemon = self._add_pokemon(self._generate_pokemon("egg:{}".format(egg["id"])))
+            family_id = self._family(pokemon["pokemon_id"])
+            self.candy[family_id] = self.candy.get(family_id, 0) + 10
+            self.stardust += 500
+            self._add_experience(500)
+
+            response["pokemon_id"].append(pokemon["id"])
+            response["experience_awarded"].append(500)
+            response["candy_awarded"].append(10)
+            response["stardust_awarded"].append(500)
+        return response
+
+    def evolve_pokemon(self, pokemon_id=None, **kwargs):  # pylint: disable=unused-argument
+        pokemon = self.pokemon.get(pokemon_id, None)
+        if pokemon is None or pokemon.get("is_egg", False):
+            return {"result": 2}
+        evolution = self.evolutions.get(pokemon["pokemon_id"], None)
+        if evolution is None:
+            return {"result": 4}
+
+        evolves_into, cost = evolution
+        family_id = self._family(pokemon["pokemon_id"])
+        if self.candy.get(family_id, 0) < cost:
+            return {"result": 3}
+
+        self.candy[family_id] -= cost - 1
+        del self.pokemon[pokemon_id]
+        evolved = self._add_pokemon(self._generate_pokemon("evolve:{}".format(pokemon_id), evolves_into),
+                                    pokemon.get("pokeball", 1))
+        self._add_experience(500)
+        return {
+            "result": 1,
+            "evolved_pokemon_data": evolved,
+            "experience_awarded": 500,
+            "candy_awarded": 1
+        }
+
+    def download_item_templates(self, **kwargs):  # pylint: disable=unused-argument
+        templates = []
+        for pokemon_id in sorted(self.families):
+            settings = {"pokemon_id": pokemon_id, "family_id": self.families[pokemon_id]}
+            if pokemon_id in self.evolutions:
+                settings["candy_to_evolve"] = self.evolutions[pokemon_id][1]
+            templates.append({"template_id": "V{:04d}_POKEMON".format(pokemon_id), "pokemon_settings": settings})
+        return {"success": True, "item_templates": templates}
+
+    def set_favorite_pokemon(self, pokemon_id=None, is_favorite=False, **kwargs):  # pylint: disable=unused-argument
+        pokemon = self.pokemon.get(pokemon_id, None)
+        if pokemon is None:
+            return {"result": 2}
+        pokemon["favorite"] = 1 if is_favorite else 0
+        return {"result": 1}
+
+    def level_up_rewards(self, level=1, **kwargs):  # pylint: disable=unused-argument
+        if level > self.stats["level"]:
+            return {"result": 0}
+        if level in self.awarded_levels:
+            return {"result": 2}
+
+        self.awarded_levels.add(level)
+        if level == 1:
+            return {"result": 1}
+
+        items_awarded = [{"item_id": 1, "item_count": 15}, {"item_id": 101, "item_count": 10}]
+        for award in items_awarded:
+            self.items[award["item_id"]] = self.items.get(award["item_id"], 0) + award["item_count"]
+        return {"result": 1, "items_awarded": items_awarded}
@@ -0,0 +1,262 @@
+import random
+import threading
+
+from app import kernel
+from app.clock import get_clock
+
+# Uncomment to enable type annotations for Python 3
+# from typing import Any, Dict, Optional
+
+# Failure classes, each backs off on its own
+THROTTLED = 'throttled'     # status code 52, too many requests
+HTTP_ERROR = 'http_error'   # non-200 HTTP response
+OFFLINE = 'offline'         # the request could not be made at all
+EMPTY = 'empty'             # empty response
+BAD_STATUS = 'bad_status'   # any other unexpected status code
+FORBIDDEN = 'forbidden'     # 403, never retried
+
+# (base, cap) of the backoff delay in seconds
+BACKOFF = {
+    THROTTLED: (2.0, 60.0),
+    HTTP_ERROR: (5.0, 120.0),
+    OFFLINE: (5.0, 300.0),
+    EMPTY: (2.0, 60.0),
+    BAD_STATUS: (2.0, 60.0)
+}
+
+
+class TokenBucket(object):
+    """
+        Requests per second the server lets us make. The rate creeps up with every successful request and halves
+        whenever the server says we are too fast, so it settles just below the server's limit.
+    """
+
+    def __init__(self, rate=1.0, burst=2.0, min_rate=0.1, max_rate=5.0, increase=0.01):
+        # type: (float, float, float, float, float) -> None
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.tokens = self.burst
+        self.updated = get_clock().time()
+
+    def _refill(self, now):
+        # type: (float) -> None
+        # A clock that was set back must not leave us in debt
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        # type: () -> float
+        """
+            Takes a token and returns how long to wait before it may be used.
+        """
+        self._refill(get_clock().time())
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def throttled(self):
+        # type: () -> None
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+
+    def succeeded(self):
+        # type: () -> None
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class Backoff(object):
+    """
+        Exponential backoff with full jitter: the n-th failure in a row waits a random time up to base * 2^n.
+    """
+
+    def __init__(self, base, cap, rand=None):
+        # type: (float, float, Optional[random.Random]) -> None
+        self.base = base
+        self.cap = cap
+        self.failures = 0
+        self._random = rand or random.Random()
+
+    def next_delay(self):
+        # type: () -> float
+        delay = self._random.uniform(0, min(self.cap, self.base * 2 ** self.failures))
+        self.failures += 1
+        return delay
+
+    def reset(self):
+        # type: () -> None
+        self.failures = 0
+
+
+class CircuitBreaker(object):
+    """
+        Stops all requests for a while once too many of them failed in a row, instead of every caller retrying on
+        its own. Each time it trips again without a success in between, the pause doubles.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold=5, reset_timeout=60.0, max_timeout=600.0):
+        # type: (int, float, float) -> None
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.max_timeout = max_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_until = 0.0
+
+    def remaining(self):
+        # type: () -> float
+        """
+            Seconds until requests may be made again, moves an open breaker to half open once the pause is over.
+        """
+        if self.state != self.OPEN:
+            return 0.0
+        remaining = self.opened_until - get_clock().time()
+        if remaining <= 0:
+            self.state = self.HALF_OPEN
+            return 0.0
+        return remaining
+
+    def failed(self):
+        # type: () -> bool
+        """
+            Counts a failure, returns True if that opened the breaker.
+        """
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+            self.trips += 1
+            self.state = self.OPEN
+            self.opened_until = get_clock().time() + self.get_timeout()
+            return True
+        return False
+
+    def succeeded(self):
+        # type: () -> None
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+
+    def get_timeout(self):
+        # type: () -> float
+        return min(self.max_timeout, self.reset_timeout * 2 ** max(0, self.trips - 1))
+
+
+@kernel.container.register('pacer', ['@config.core', '@logger'])
+class Pacer(object):
+    """
+        Decides when the API wrapper may make its next request: a token bucket keeps us below the server's rate
+        limit, failures back off per class and a circuit breaker pauses every request after repeated failures.
+        Keeps track of how much time went into waiting versus into the requests themselves.
+    """
+
+    def __init__(self, config, logger):
+        # type: (Namespace, Logger) -> None
+        self.logger = logger.getLogger('Pacing')
+
+        pacing = config.get('pacing', None) or {}
+        self.bucket = TokenBucket(
+            rate=pacing.get('rate', 1.0),
+            burst=pacing.get('burst', 2),
+            min_rate=pacing.get('min_rate', 0.1),
+            max_rate=pacing.get('max_rate', 5.0)
+        )
+        self.breaker = CircuitBreaker(
+            threshold=pacing.get('circuit_threshold', 5),
+            reset_timeout=pacing.get('circuit_timeout', 60),
+            max_timeout=pacing.get('circuit_max_timeout', 600)
+        )
+        self.backoff = {}
+        for failure, (base, cap) in BACKOFF.items():
+            self.backoff[failure] = Backoff(base, cap)
+        self.report_every = pacing.get('report_every', 100)
+
+        self.requests = 0
+        self.successes = 0
+        self.failures = dict((failure, 0) for failure in BACKOFF)
+        self.waiting = {'pacing': 0.0, 'backoff': 0.0, 'circuit': 0.0}
+        self.working = 0.0
+
+        self._lock = threading.Lock()
+
+    def wait(self):
+        # type: () -> None
+        """
+            Blocks until the next request may be made.
+        """
+        while True:
+            with self._lock:
+                circuit_wait = self.breaker.remaining()
+            if circuit_wait <= 0:
+                break
+            self._sleep('circuit', circuit_wait)
+
+        with self._lock:
+            pacing_wait = self.bucket.take()
+            self.requests += 1
+        if pacing_wait > 0:
+            self._sleep('pacing', pacing_wait)
+
+    def succeeded(self, duration):
+        # type: (float) -> None
+        with self._lock:
+            self.successes += 1
+            self.working += duration
+            self.bucket.succeeded()
+            self.breaker.succeeded()
+            for backoff in self.backoff.values():
+                backoff.reset()
+            report = self.report_every and self.successes % self.report_every == 0
+
+        if report:
+            metrics = self.get_metrics()
+            self.logger.debug('{} requests at {:.2f}/s, {:.0f}s working, {:.0f}s waiting ({}), failures: {}'.format(
+                metrics['requests'], metrics['rate'], metrics['working'], sum(metrics['waiting'].values()),
+                ', '.join('{} {:.0f}s'.format(kind, seconds) for kind, seconds in sorted(metrics['waiting'].items())),
+                ', '.join('{} {}'.format(kind, count) for kind, count in sorted(metrics['failures'].items()) if count)
+                or 'none'))
+
+    def failed(self, failure, message, duration=0.0):
+        # type: (str, str, float) -> None
+        """
+            Records a failed request and backs off before it is retried.
+        """
+        with self._lock:
+            self.failures[failure] += 1
+            self.working += duration
+            if failure == THROTTLED:
+                self.bucket.throttled()
+            delay = self.backoff[failure].next_delay()
+            tripped = self.breaker.failed()
+            circuit_timeout = self.breaker.get_timeout()
+
+        self.logger.warning('{} Retrying in {:.1f} seconds...'.format(message, delay))
+        if tripped:
+            self.logger.error('Too many failed requests, pausing all requests for {:.0f} seconds.'.format(
+                circuit_timeout), 'red')
+        self._sleep('backoff', delay)
+
+    def _sleep(self, reason, seconds):
+        # type: (str, float) -> None
+        get_clock().sleep(seconds)
+        with self._lock:
+            self.waiting[reason] += seconds
+
+    def get_metrics(self):
+        # type: () -> Dict[str, Any]
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'successes': self.successes,
+                'failures': dict(self.failures),
+                'rate': self.bucket.rate,
+                'circuit': self.breaker.state,
+                'working': self.working,
+                'waiting': dict(self.waiting)
+            }
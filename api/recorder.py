@@ -0,0 +1,209 @@
+import atexit
+import base64
+import json
+import os
+import struct
+import threading
+from collections import deque
+
+from app import kernel
+from app.clock import get_clock
+
+# Uncomment to enable type annotations for Python 3
+# from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Every record is its JSON encoding prefixed with the length as a 4 byte big endian integer
+FRAME_HEADER = struct.Struct('>I')
+
+
+def _encode_value(value):
+    # type: (Any) -> Any
+    """
+        Copy of value that json can dump, with binary strings base64 encoded. json.dumps would not pass them to its
+        default hook on Python 2, where they are str and fail to decode.
+    """
+    if isinstance(value, dict):
+        return dict((key, _encode_value(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item) for item in value]
+    if isinstance(value, bytes):
+        # Text is str on Python 2 as well, only the binary ones need encoding
+        if bytes is str:
+            try:
+                value.decode('utf-8')
+                return value
+            except UnicodeDecodeError:
+                pass
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    return value
+
+
+def _decode_object(obj):
+    # type: (Dict[str, Any]) -> Any
+    if len(obj) == 1 and '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+    return obj
+
+
+def encode_frame(record):
+    # type: (Dict[str, Any]) -> bytes
+    data = json.dumps(_encode_value(record), separators=(',', ':'), default=repr).encode('utf-8')
+    return FRAME_HEADER.pack(len(data)) + data
+
+
+def read_capture(capture_file):
+    # type: (str) -> Iterator[Dict[str, Any]]
+    """
+        Records of a capture file in the order they were made. A frame cut short by a crash ends the capture.
+    """
+    with open(capture_file, 'rb') as capture:
+        while True:
+            header = capture.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            length, = FRAME_HEADER.unpack(header)
+            data = capture.read(length)
+            if len(data) < length:
+                return
+            yield json.loads(data.decode('utf-8'), object_hook=_decode_object)
+
+
+def create_record(methods, method_keys, results, failure=None):
+    # type: (Dict[str, Tuple], List[str], Optional[Dict[str, Any]], Optional[str]) -> Dict[str, Any]
+    record = {
+        'time': get_clock().time(),
+        'requests': [[method, list(methods[method][0]), methods[method][1]] for method in method_keys],
+        'response': results
+    }
+    if failure is not None:
+        record['failure'] = failure
+    return record
+
+
+@kernel.container.register('rpc_recorder', ['@config.core', '@logger'])
+class RpcRecorder(object):
+    """
+        Keeps the latest requests and their raw responses in memory and writes them to a capture file from a
+        background thread, so recording only costs the API wrapper an append. Encoding happens on the writer thread,
+        which relies on nothing changing the response dicts after they were parsed.
+
+        In session mode every request of the session, failed ones included, is appended to a session capture as
+        well, which api.replay can play back.
+    """
+
+    def __init__(self, config, logger):
+        # type: (Namespace, Logger) -> None
+        self.logger = logger.getLogger('Recorder')
+
+        recording = config.get('recording', None) or {}
+        self.enabled = recording.get('rpc', False)
+        self.session = recording.get('session', False)
+        self.interval = recording.get('interval', 10)
+        username = config['login']['username']
+        # Written from the exit hook and the writer thread, wherever the working directory happens to be by then
+        self.capture_file = os.path.abspath('data/rpc-{}.capture'.format(username))
+        self.session_file = os.path.abspath('data/session-{}.capture'.format(username))
+
+        self._records = deque(maxlen=recording.get('size', 100))
+        self._unwritten = []
+        self._session_started = False
+        self._changed = threading.Event()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer = None
+
+    def record(self, methods, method_keys, results, failure=None):
+        # type: (Dict[str, Tuple], List[str], Optional[Dict[str, Any]], Optional[str]) -> None
+        """
+            Records a request, failure is one of the api.pacing failure classes if the request did not go through.
+        """
+        if not self.enabled and not self.session:
+            return
+
+        record = create_record(methods, method_keys, results, failure)
+        with self._lock:
+            if self.enabled:
+                self._records.append(record)
+            if self.session:
+                self._unwritten.append(record)
+            if self._writer is None and not self._closed.is_set():
+                self._writer = threading.Thread(target=self._write_changes, name='RpcRecorder')
+                self._writer.daemon = True
+                self._writer.start()
+                # The writer might be asleep when the bot exits, a session must not lose its last requests
+                atexit.register(self._write_at_exit)
+        self._changed.set()
+
+    def get_records(self):
+        # type: () -> List[Dict[str, Any]]
+        with self._lock:
+            return list(self._records)
+
+    def dump(self):
+        # type: () -> None
+        frames = b''.join(encode_frame(record) for record in self.get_records())
+        with open(self.capture_file, 'wb') as capture:
+            capture.write(frames)
+
+    def flush(self):
+        # type: () -> None
+        """
+            Writes everything recorded so far.
+        """
+        with self._write_lock:
+            with self._lock:
+                unwritten = list(self._unwritten)
+
+            if self.session and (len(unwritten) or not self._session_started):
+                # Encoded up front, a record that can not be encoded must not leave half a batch behind
+                frames = b''.join(encode_frame(record) for record in unwritten)
+                # A session capture starts over with every run of the bot
+                with open(self.session_file, 'ab' if self._session_started else 'wb') as capture:
+                    capture.write(frames)
+                self._session_started = True
+
+            # Only forgotten once they are on disk, a failed write is tried again with the next one
+            with self._lock:
+                del self._unwritten[:len(unwritten)]
+
+            if self.enabled:
+                self.dump()
+
+    def close(self):
+        # type: () -> None
+        """
+            Stops the writer thread and writes what it did not get to yet.
+        """
+        self._closed.set()
+        self._changed.set()
+        if self._writer is None:
+            return
+        self._writer.join()
+        # Python 2 has no way to unregister, the hook does nothing once closed
+        if hasattr(atexit, 'unregister'):
+            atexit.unregister(self._write_at_exit)
+        self._write()
+
+    def _write_at_exit(self):
+        # type: () -> None
+        if not self._closed.is_set():
+            self._write()
+
+    def _write(self):
+        # type: () -> None
+        try:
+            self.flush()
+        except (IOError, OSError, TypeError, ValueError) as error:
+            self.logger.error('Could not write the RPC capture: {}'.format(error))
+
+    def _write_changes(self):
+        # type: () -> None
+        while not self._closed.is_set():
+            self._changed.wait()
+            self._changed.clear()
+            if self._closed.is_set():
+                return
+            self._write()
+            # Wall clock time on purpose, a virtual clock would have this thread rewrite the file in a loop
+            self._closed.wait(self.interval)
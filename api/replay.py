@@ -0,0 +1,146 @@
+from pgoapi.exceptions import ServerSideRequestThrottlingException, ServerSideAccessForbiddenException, \
+    UnexpectedResponseException  # type: ignore
+
+from api.offline import OfflineAuthProvider
+from api.pacing import THROTTLED, HTTP_ERROR, OFFLINE, FORBIDDEN
+from api.recorder import read_capture
+from app.clock import VirtualClock, get_clock
+
+# Uncomment to enable type annotations for Python 3
+# from typing import Any, Dict, List, Optional, Tuple
+
+# How the API wrapper saw each failure class that has no response to replay
+FAILURE_EXCEPTIONS = {
+    THROTTLED: ServerSideRequestThrottlingException,
+    HTTP_ERROR: UnexpectedResponseException,
+    OFFLINE: TypeError,
+    FORBIDDEN: ServerSideAccessForbiddenException
+}
+
+
+class ReplayFinished(Exception):
+    """
+        Raised by the request after the last recorded one.
+    """
+    pass
+
+
+class ReplayRequest(object):
+    """
+        Collects RPCs like a pgoapi request and answers them with the next recorded response when called.
+    """
+
+    def __init__(self, api):
+        # type: (ReplayPGoApi) -> None
+        self._api = api
+        self._methods = []
+
+    def __getattr__(self, method):
+        def queue(*args, **kwargs):  # pylint: disable=unused-argument
+            self._methods.append(method.upper())
+            return self
+
+        return queue
+
+    def call(self):
+        # type: () -> Optional[Dict[str, Any]]
+        record = self._api.next_record(self._methods)
+        self._methods = []
+
+        failure = record.get('failure', None)
+        if failure in FAILURE_EXCEPTIONS:
+            raise FAILURE_EXCEPTIONS[failure]()
+        return record['response']
+
+
+class ReplayPGoApi(object):
+    """
+        Stand-in for pgoapi.PGoApi that answers every request with the next one of a session capture (see
+        api.recorder), as fast as the bot asks. Random decisions can take the bot another way than it went back
+        then, the requests answered out of order or without a recording are counted in diverged.
+    """
+
+    # How many recorded requests to look ahead for the methods the bot asks for
+    LOOKAHEAD = 10
+
+    def __init__(self, capture_file):
+        # type: (str) -> None
+        # Read up front, so that replaying measures the bot and not the disk
+        self.records = list(read_capture(capture_file))
+        self._auth_provider = OfflineAuthProvider()
+        self._index = 0
+        self.position = (0.0, 0.0, 0.0)
+        self.rpc_count = 0
+        self.method_counts = {}
+        self.diverged = 0
+        self.skipped = 0
+
+    def next_record(self, methods):
+        # type: (List[str]) -> Dict[str, Any]
+        """
+            The next recorded request, or a later one asking for the same methods if the bot went another way than
+            it did back then. Requests without any recorded counterpart get empty responses.
+        """
+        if self._index >= len(self.records):
+            raise ReplayFinished()
+
+        self.rpc_count += 1
+        for method in methods:
+            self.method_counts[method] = self.method_counts.get(method, 0) + 1
+
+        for index in range(self._index, min(len(self.records), self._index + self.LOOKAHEAD)):
+            if [request[0] for request in self.records[index]['requests']] == methods:
+                if index != self._index:
+                    self.diverged += 1
+                    self.skipped += index - self._index
+                record = self.records[index]
+                self._index = index + 1
+                break
+        else:
+            self.diverged += 1
+            record = {
+                'time': self.records[self._index]['time'],
+                'response': {'status_code': 1, 'responses': dict((method, {}) for method in methods)}
+            }
+
+        # A simulated clock catches up with the time the response came in, cooldowns and expiry times in the
+        # responses are relative to it
+        clock = get_clock()
+        if isinstance(clock, VirtualClock):
+            clock.advance(record['time'] - clock.time())
+        return record
+
+    def get_start_time(self):
+        # type: () -> Optional[float]
+        if not len(self.records):
+            return None
+        return self.records[0]['time']
+
+    def get_remaining(self):
+        # type: () -> int
+        return len(self.records) - self._index
+
+    def activate_signature(self, shared_lib):  # pylint: disable=unused-argument
+        pass
+
+    @staticmethod
+    def login(provider, username, password, app_simulation=True):  # pylint: disable=unused-argument
+        # type: (str, str, str, bool) -> bool
+        return True
+
+    def set_position(self, lat, lng, alt):
+        # type: (float, float, float) -> None
+        self.position = (lat, lng, alt)
+
+    def get_position(self):
+        # type: () -> Tuple[float, float, float]
+        return self.position
+
+    @staticmethod
+    def list_curr_methods():
+        # type: () -> List[str]
+        return []
+
+    def create_request(self):
+        # type: () -> ReplayRequest
+        return ReplayRequest(self)
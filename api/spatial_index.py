@@ -0,0 +1,153 @@
+from math import cos, floor, radians
+
+from .geo import EARTH_RADIUS_METRES, equirectangular_distance
+
+# Uncomment to enable type annotations for Python 3
+# from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+
+class SpatialIndex(object):
+    """
+        Uniform grid over equirectangular-projected coordinates. Points are bucketed into square cells of
+        bucket_size metres, so radius and k-nearest queries only look at the buckets around the query point
+        instead of every point the bot knows about.
+    """
+
+    def __init__(self, bucket_size=100.0):
+        # type: (float) -> None
+        self.bucket_size = float(bucket_size)
+
+        # Longitude scale of the projection, fixed by the first inserted point. The bot stays within a few
+        # kilometres of where it started, so a single reference latitude keeps buckets square enough.
+        self._lng_scale = None
+
+        self._buckets = {}
+        self._entries = {}
+
+        self._min_bucket = None
+        self._max_bucket = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def items(self):
+        # type: () -> List[Any]
+        return [entry[2] for entry in self._entries.values()]
+
+    def _project(self, lat, lng):
+        # type: (float, float) -> Tuple[float, float]
+        if self._lng_scale is None:
+            self._lng_scale = cos(radians(lat))
+        return (EARTH_RADIUS_METRES * radians(lng) * self._lng_scale,
+                EARTH_RADIUS_METRES * radians(lat))
+
+    def _bucket(self, x, y):
+        # type: (float, float) -> Tuple[int, int]
+        return int(floor(x / self.bucket_size)), int(floor(y / self.bucket_size))
+
+    def insert(self, key, lat, lng, item=None):
+        # type: (Hashable, float, float, Any) -> None
+        """
+            Add or move a point. Re-inserting a known key at the same position is a cheap no-op.
+        """
+        entry = self._entries.get(key, None)
+        if entry is not None:
+            if entry[0] == lat and entry[1] == lng:
+                entry[2] = item
+                return
+            self.remove(key)
+
+        bucket = self._bucket(*self._project(lat, lng))
+        self._entries[key] = [lat, lng, item, bucket]
+        self._buckets.setdefault(bucket, {})[key] = self._entries[key]
+
+        if self._min_bucket is None:
+            self._min_bucket = bucket
+            self._max_bucket = bucket
+        else:
+            self._min_bucket = (min(self._min_bucket[0], bucket[0]), min(self._min_bucket[1], bucket[1]))
+            self._max_bucket = (max(self._max_bucket[0], bucket[0]), max(self._max_bucket[1], bucket[1]))
+
+    def remove(self, key):
+        # type: (Hashable) -> None
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        bucket = self._buckets[entry[3]]
+        del bucket[key]
+        if len(bucket) == 0:
+            del self._buckets[entry[3]]
+
+    def _scan(self, lat, lng, predicate):
+        # type: (float, float, Optional[Callable[[Any], bool]]) -> List[Tuple[Any, float]]
+        results = []
+        for entry in self._entries.values():
+            if predicate is None or predicate(entry[2]):
+                results.append((entry[2], equirectangular_distance(lat, lng, entry[0], entry[1])))
+        results.sort(key=lambda result: result[1])
+        return results
+
+    def within(self, lat, lng, radius, predicate=None):
+        # type: (float, float, float, Optional[Callable[[Any], bool]]) -> List[Tuple[Any, float]]
+        """
+            All items within radius metres of (lat, lng) as (item, distance) pairs, nearest first.
+        """
+        if len(self._entries) == 0:
+            return []
+
+        bucket_x, bucket_y = self._bucket(*self._project(lat, lng))
+        reach = int(radius // self.bucket_size) + 1
+
+        # On a sparse map it is cheaper to look at every point than at every bucket in range
+        if (2 * reach + 1) ** 2 > len(self._buckets):
+            return [result for result in self._scan(lat, lng, predicate) if result[1] <= radius]
+
+        results = []
+        for x in range(bucket_x - reach, bucket_x + reach + 1):
+            for y in range(bucket_y - reach, bucket_y + reach + 1):
+                for entry in self._buckets.get((x, y), {}).values():
+                    dist = equirectangular_distance(lat, lng, entry[0], entry[1])
+                    if dist <= radius and (predicate is None or predicate(entry[2])):
+                        results.append((entry[2], dist))
+
+        results.sort(key=lambda result: result[1])
+        return results
+
+    def nearest(self, lat, lng, k=1, predicate=None):
+        # type: (float, float, int, Optional[Callable[[Any], bool]]) -> List[Tuple[Any, float]]
+        """
+            The k items closest to (lat, lng) as (item, distance) pairs, nearest first. Searches rings of
+            buckets outwards and stops as soon as no unvisited bucket can hold anything closer.
+        """
+        if len(self._entries) == 0 or k <= 0:
+            return []
+
+        bucket_x, bucket_y = self._bucket(*self._project(lat, lng))
+        max_ring = max(abs(bucket_x - self._min_bucket[0]), abs(bucket_x - self._max_bucket[0]),
+                       abs(bucket_y - self._min_bucket[1]), abs(bucket_y - self._max_bucket[1]))
+
+        candidates = []
+        for ring in range(max_ring + 1):
+            if (2 * ring + 1) ** 2 > len(self._buckets):
+                return self._scan(lat, lng, predicate)[:k]
+
+            for x in range(bucket_x - ring, bucket_x + ring + 1):
+                for y in range(bucket_y - ring, bucket_y + ring + 1):
+                    # Only the outline of the square, the inside was visited by previous rings
+                    if ring > 0 and bucket_x - ring < x < bucket_x + ring and bucket_y - ring < y < bucket_y + ring:
+                        continue
+                    for entry in self._buckets.get((x, y), {}).values():
+                        if predicate is None or predicate(entry[2]):
+                            candidates.append((entry[2], equirectangular_distance(lat, lng, entry[0], entry[1])))
+
+            # Everything within ring * bucket_size metres has been seen once this ring is done
+            if len(candidates) >= k:
+                candidates.sort(key=lambda candidate: candidate[1])
+                if candidates[k - 1][1] <= ring * self.bucket_size:
+                    return candidates[:k]
+
+        candidates.sort(key=lambda candidate: candidate[1])
+        return candidates[:k]
@@ -1,16 +1,18 @@
 # pylint: disable=unused-argument
 from __future__ import print_function
 
+from app.clock import get_clock
 from api.evolution_result import EvolutionResult
 from .player import Player
 from .inventory_parser import InventoryParser
 from .worldmap import WorldMap, Gym, PokeStop
 from .encounter import Encounter
 from .item import Incubator
+from .geo import equirectangular_distance
 
 
 class StateManager(object):
-    def __init__(self):
+    def __init__(self, world_map_max_age=1800, world_map_max_distance=3000):
 
         # Transforms response data from the server to objects.
         # Use self._noop if there is no response data.
@@ -30,6 +32,7 @@ class StateManager(object):
             "GET_HATCHED_EGGS": self._parse_get_hatched_eggs,
             "EVOLVE_POKEMON": self._parse_evolution,
             "DOWNLOAD_ITEM_TEMPLATES": self._identity,
+            "CHECK_AWARDED_BADGES": self._identity,
             "SET_FAVORITE_POKEMON": self._identity,
             "LEVEL_UP_REWARDS": self._identity
         }
@@ -38,7 +41,7 @@ class StateManager(object):
         # Used for caching.
         self.method_returns_states = {
             "GET_PLAYER": ["player"],
-            "GET_INVENTORY": ["player", "inventory", "pokemon", "pokedex", "candy", "eggs"],
+            "GET_INVENTORY": ["player", "inventory", "pokemon", "pokedex", "candy", "eggs", "egg_incubators"],
             "USE_ITEM_EGG_INCUBATOR": ["egg_incubators"],
             "GET_HATCHED_EGGS": [],
             "CHECK_AWARDED_BADGES": [],
@@ -57,6 +60,24 @@ class StateManager(object):
             "LEVEL_UP_REWARDS": []
         }
 
+        # How long the states returned above can be served from memory, on top of being invalidated by the
+        # methods that mutate them. max_age is in seconds since the state was returned, max_distance in metres
+        # moved since then. States that are not listed only go stale when they are mutated. The limits of the world
+        # map are set by MapRefreshPolicy from the map_refresh config.
+        # Used for caching.
+        self.state_policies = {
+            "worldmap": {"max_age": 15, "max_distance": 50},
+            "player": {"max_age": 300},
+            "inventory": {"max_age": 300},
+            "pokemon": {"max_age": 300},
+            "pokedex": {"max_age": 300},
+            "candy": {"max_age": 300},
+            "eggs": {"max_age": 300},
+            "egg_incubators": {"max_age": 300},
+            # Never expires
+            "DOWNLOAD_ITEM_TEMPLATES": {}
+        }
+
         # Maps methods to the state objects that they invalidate.
         # (ie. require another API call to get the correct data)
         # If a method needs to always be called, ensure that it
@@ -66,8 +87,8 @@ class StateManager(object):
             "GET_PLAYER": [],
             "GET_INVENTORY": [],
             "USE_ITEM_EGG_INCUBATOR": ["egg_incubators"],
-            "GET_HATCHED_EGGS": [],
-            "CHECK_AWARDED_BADGES": [],
+            "GET_HATCHED_EGGS": ["GET_HATCHED_EGGS"],
+            "CHECK_AWARDED_BADGES": ["CHECK_AWARDED_BADGES"],
             "DOWNLOAD_SETTINGS": [],
             "GET_MAP_OBJECTS": ["worldmap"],
             "ENCOUNTER": ["encounter", "player", "pokedex"],
@@ -88,17 +109,69 @@ class StateManager(object):
 
         self.staleness = {}
 
+        # When and where each state was last returned, for the freshness policies
+        self.updated_at = {}
+        self.updated_position = {}
+        self.position = None
+
+        # Long-lived, GET_INVENTORY responses only carry what changed since the previous one
+        self.inventory = InventoryParser()
+
+        # How long and how far away cells are kept in the world map
+        self.world_map_max_age = world_map_max_age
+        self.world_map_max_distance = world_map_max_distance
+
     def _noop(self, *args, **kwargs):
         pass
 
-    def is_stale(self, key):
-        return self.staleness.get(key, True)
+    def set_position(self, lat, lng):
+        self.position = (lat, lng)
+
+    # Seconds since a state was last returned, None if it never was.
+    def get_age(self, key):
+        updated_at = self.updated_at.get(key, None)
+        if updated_at is None:
+            return None
+        return get_clock().time() - updated_at
+
+    # A state is stale once it was mutated or expired.
+    def is_stale(self, key, max_age=None):
+        if self.staleness.get(key, True):
+            return True
+        return self.is_expired(key, max_age)
+
+    # Whether a state outlived its policy (or max_age), regardless of the methods that mutated it.
+    def is_expired(self, key, max_age=None):
+        return self.get_expiry_reason(key, max_age) is not None
+
+    # Why a state outlived its policy (or max_age): "age" or "distance", None if it did not.
+    def get_expiry_reason(self, key, max_age=None):
+        policy = self.state_policies.get(key, None) or {}
+        age = self.get_age(key)
+        if age is not None:
+            for limit in (policy.get("max_age", None), max_age):
+                if limit is not None and age > limit:
+                    return "age"
+
+        max_distance = policy.get("max_distance", None)
+        updated_position = self.updated_position.get(key, None)
+        if max_distance is not None and updated_position is not None and self.position is not None:
+            lat, lng = updated_position[0], updated_position[1]
+            if equirectangular_distance(lat, lng, self.position[0], self.position[1]) > max_distance:
+                return "distance"
+        return None
+
+    # Get a state if it is fresh enough, None if it has to be requested again.
+    def get_fresh(self, key, max_age=None):
+        if self.is_stale(key, max_age):
+            return None
+        return self.current_state.get(key, None)
 
     # Check whether a method is cached or if it needs to be updated.
-    def is_method_cached(self, method):
+    def is_method_cached(self, method, max_age=None):
         affected_states = self.method_returns_states[method]
         for state in affected_states:
-            if self.is_stale(state):
+            if self.is_stale(state, max_age):
                 return False
         return True
 
@@ -106,7 +179,7 @@ class StateManager(object):
     # uncached) and state-invalidating methods will be called. Note that the order is
     # important - calling GET_INVENTORY before FORT_SEARCH, for example, will return the cached
     # and now invalidated inventory object. To fix, call FORT_SEARCH and then GET_INVENTORY.
-    def filter_cached_methods(self, method_keys):
+    def filter_cached_methods(self, method_keys, max_age=None):
         will_be_stale = {}
         uncached_methods = []
         for method in method_keys:
@@ -118,19 +191,28 @@ class StateManager(object):
             else:
                 returned_states = self.method_returns_states[method]
                 for state in returned_states:
-                    if self.is_stale(state) or will_be_stale.get(state, False):
+                    if self.is_stale(state, max_age) or will_be_stale.get(state, False):
                         uncached_methods.append(method)
                         break
         return uncached_methods
 
+    # Arguments to send a method with, lets GET_INVENTORY ask only for what changed since the last one.
+    def get_request_arguments(self, method, args, kwargs):
+        if method == "GET_INVENTORY" and self.inventory.last_updated and "last_timestamp_ms" not in kwargs:
+            kwargs = dict(kwargs, last_timestamp_ms=self.inventory.last_updated)
+        return args, kwargs
+
     # Update a state object and mark it as valid.
     def _update_state(self, data):
+        now = get_clock().time()
         for key in data:
             value = data.get(key, None)
             if value is None:
                 continue
             self.current_state[key] = data[key]
             self.staleness[key] = False
+            self.updated_at[key] = now
+            self.updated_position[key] = self.position
 
     def get_state(self):
         return self.current_state
@@ -170,15 +252,16 @@ class StateManager(object):
         self._update_state({"player": current_player})
 
     def _parse_inventory(self, key, response):
-        new_inventory = InventoryParser(response)
+        inventory = self.inventory
+        inventory.apply(response)
 
         new_state = {
-            "inventory": new_inventory.items,
-            "pokedex": new_inventory.pokedex_entries,
-            "candy": new_inventory.candy,
-            "pokemon": new_inventory.pokemon,
-            "eggs": new_inventory.eggs,
-            "egg_incubators": new_inventory.egg_incubators
+            "inventory": inventory.items,
+            "pokedex": inventory.pokedex_entries,
+            "candy": inventory.candy,
+            "pokemon": inventory.pokemon,
+            "eggs": inventory.eggs,
+            "egg_incubators": inventory.egg_incubators
         }
 
         current_player = self.current_state.get("player", None)
@@ -190,15 +273,14 @@ class StateManager(object):
         self._update_state(new_state)
 
     def _parse_map(self, key, response):
-        # TODO: Figure out how I want to do WorldMap. Lazy loading might be a better idea
-        """
+        # The world map is long-lived: responses are merged into the cells we already know
         current_map = self.current_state.get("worldmap", None)
         if current_map is None:
-            current_map = WorldMap()
-        current_map.update_map_objects(response)
-        """
-        current_map = WorldMap()
-        current_map.update_map_objects(response)
+            current_map = WorldMap(self.world_map_max_age, self.world_map_max_distance)
+        if self.position is None:
+            current_map.update_map_objects(response)
+        else:
+            current_map.update_map_objects(response, *self.position)
 
         self._update_state({"worldmap": current_map})
 
@@ -236,7 +318,7 @@ class StateManager(object):
             self._update_state({"player": current_player})
 
             if len(response.get("pokemon_id", [])) > 0:
-                self.mark_returned_stale("GET_INVENTORY")
+                self.mark_returned_stale(["GET_INVENTORY"])
 
     def _parse_use_incubator(self, key, response):
         if response.get("result", 0) == 1:
@@ -1,12 +1,19 @@
 # pylint: disable=redefined-builtin
 from builtins import str
-import time
 
+from s2sphere import CellId  # type: ignore
+
+from app.clock import get_clock
+from api.geo import equirectangular_distance
 from api.json_encodable import JSONEncodable
+from api.spatial_index import SpatialIndex
 
 
 class Fort(JSONEncodable):
     def __init__(self, data):
+        self.update(data)
+
+    def update(self, data):
         self.fort_id = data.get("id", "")
         self.fort_name = data.get("name", "Unknown").encode('ascii', 'replace')
                             # TODO: Make this proper unicode  ^^
@@ -18,8 +25,8 @@ class Fort(JSONEncodable):
 
 
 class PokeStop(Fort):
-    def __init__(self, data):
-        super(PokeStop, self).__init__(data)
+    def update(self, data):
+        super(PokeStop, self).update(data)
         self.active_fort_modifier = data.get("active_fort_modifier", None)
         self.cooldown_timestamp_ms = data.get("cooldown_complete_timestamp_ms", None)
 
@@ -33,17 +40,17 @@ class PokeStop(Fort):
     def is_lure_active(self):
         if self.lure_expires_timestamp_ms is None:
             return False
-        return self.lure_expires_timestamp_ms + 1000 > time.time() * 1000
+        return self.lure_expires_timestamp_ms + 1000 > get_clock().time() * 1000
 
     def is_in_cooldown(self):
         if self.cooldown_timestamp_ms is None:
             return False
-        return self.cooldown_timestamp_ms + 1000 > time.time() * 1000
+        return self.cooldown_timestamp_ms + 1000 > get_clock().time() * 1000
 
 
 class Gym(Fort):
-    def __init__(self, data):
-        super(Gym, self).__init__(data)
+    def update(self, data):
+        super(Gym, self).update(data)
 
         self.is_in_battle = True if data.get("is_in_battle", 0) == 1 else False
 
@@ -59,32 +66,179 @@ class Cell(JSONEncodable):
         self.pokestops = []
 
         self.cell_id = data.get("s2_cell_id", 0)
+        self.current_timestamp_ms = 0
+
+        self.catchable_pokemon = []
+        self.nearby_pokemon = []
+        self.wild_pokemon = []
+
+        self.update(data)
 
-        spawn_points = data.get("spawn_points", [])
-        for spawn in spawn_points:
-            self.spawn_points.append((spawn["latitude"], spawn["longitude"]))
+    # Merge a (possibly partial) map cell response into this cell. When the request carried this cell's
+    # last timestamp the server only sends forts that changed since then, so known forts are updated in
+    # place and everything else is kept. Pokemon are always sent in full.
+    def update(self, data):
+        self.current_timestamp_ms = data.get("current_timestamp_ms", self.current_timestamp_ms)
+
+        known_spawn_points = set(self.spawn_points)
+        for spawn in data.get("spawn_points", []):
+            spawn_point = (spawn["latitude"], spawn["longitude"])
+            if spawn_point not in known_spawn_points:
+                known_spawn_points.add(spawn_point)
+                self.spawn_points.append(spawn_point)
 
         self.catchable_pokemon = data.get("catchable_pokemons", [])
         self.nearby_pokemon = data.get("nearby_pokemons", [])
         self.wild_pokemon = data.get("wild_pokemons", [])
 
+        pokestops = dict((pokestop.fort_id, pokestop) for pokestop in self.pokestops)
+        gyms = dict((gym.fort_id, gym) for gym in self.gyms)
+
         forts = data.get("forts", [])
         for fort in forts:
+            fort_id = fort.get("id", "")
             if fort.get("type", 0) == 1:
-                self.pokestops.append(PokeStop(fort))
+                if fort_id in pokestops:
+                    pokestops[fort_id].update(fort)
+                else:
+                    pokestops[fort_id] = PokeStop(fort)
+                    self.pokestops.append(pokestops[fort_id])
             elif fort.get("type", 0) == 2:
-                self.gyms.append(Gym(fort))
+                if fort_id in gyms:
+                    gyms[fort_id].update(fort)
+                else:
+                    gyms[fort_id] = Gym(fort)
+                    self.gyms.append(gyms[fort_id])
             else:
                 # Some unknown kind of fort or invalid data
                 pass
 
+        deleted_objects = set(data.get("deleted_objects", []))
+        if len(deleted_objects):
+            self.pokestops = [pokestop for pokestop in self.pokestops if pokestop.fort_id not in deleted_objects]
+            self.gyms = [gym for gym in self.gyms if gym.fort_id not in deleted_objects]
+
 
 class WorldMap(JSONEncodable):
-    def __init__(self):
+    # Cells not seen for max_age seconds or further than max_distance metres from the player are forgotten, so
+    # a bot walking all day does not keep every cell it ever saw. None keeps them regardless.
+    def __init__(self, max_age=1800, max_distance=3000):
+        self.max_age = max_age
+        self.max_distance = max_distance
+
+        # Cells returned by the latest GET_MAP_OBJECTS response
         self.cells = []
 
-    def update_map_objects(self, data):
+        # Every cell seen recently, keyed by S2 cell id, with when it was last returned
+        self.cells_by_id = {}
+        self.cell_seen_at = {}
+        self._cell_centers = {}
+
+        # Spatial indexes over everything in cells_by_id, kept in sync by update_map_objects and evict
+        self.pokestop_index = SpatialIndex()
+        self.gym_index = SpatialIndex()
+        self.spawn_point_index = SpatialIndex()
+
+    def get_cell(self, cell_id):
+        return self.cells_by_id.get(cell_id, None)
+
+    # Timestamps to send as since_timestamp_ms so that the server only returns what changed
+    def get_cell_timestamps(self, cell_ids):
+        timestamps = []
+        for cell_id in cell_ids:
+            cell = self.cells_by_id.get(cell_id, None)
+            timestamps.append(cell.current_timestamp_ms if cell is not None else 0)
+        return timestamps
+
+    # Merges a response into the cells we know, then forgets the old and far away ones. lat and lng are where the
+    # player is, if known.
+    def update_map_objects(self, data, lat=None, lng=None):
+        now = get_clock().time()
+        self.cells = []
         cells = data.get("map_cells", [])
         for cell_data in cells:
-            cell = Cell(cell_data)
+            cell_id = cell_data.get("s2_cell_id", 0)
+            cell = self.cells_by_id.get(cell_id, None)
+            if cell is None:
+                cell = Cell(cell_data)
+                self.cells_by_id[cell_id] = cell
+            else:
+                cell.update(cell_data)
+            self.cell_seen_at[cell_id] = now
             self.cells.append(cell)
+            self._index_cell(cell, cell_data)
+
+        self.evict(now, lat, lng)
+
+    def evict(self, now, lat=None, lng=None):
+        # The cells of the latest response are always kept, the bot is working on them
+        latest = set(cell.cell_id for cell in self.cells)
+        for cell_id in list(self.cells_by_id):
+            if cell_id in latest:
+                continue
+            if self.max_age is not None and now - self.cell_seen_at[cell_id] > self.max_age:
+                self._remove_cell(cell_id)
+            elif self.max_distance is not None and lat is not None and lng is not None:
+                center = self._cell_centers.get(cell_id, None)
+                if center is None:
+                    lat_lng = CellId(cell_id).to_lat_lng()
+                    center = self._cell_centers[cell_id] = (lat_lng.lat().degrees, lat_lng.lng().degrees)
+                if equirectangular_distance(lat, lng, center[0], center[1]) > self.max_distance:
+                    self._remove_cell(cell_id)
+
+    def _remove_cell(self, cell_id):
+        cell = self.cells_by_id.pop(cell_id)
+        del self.cell_seen_at[cell_id]
+        self._cell_centers.pop(cell_id, None)
+        for pokestop in cell.pokestops:
+            self.pokestop_index.remove(pokestop.fort_id)
+        for gym in cell.gyms:
+            self.gym_index.remove(gym.fort_id)
+        for spawn_point in cell.spawn_points:
+            self.spawn_point_index.remove(spawn_point)
+
+    def _index_cell(self, cell, cell_data):
+        for fort_id in cell_data.get("deleted_objects", []):
+            self.pokestop_index.remove(fort_id)
+            self.gym_index.remove(fort_id)
+
+        for pokestop in cell.pokestops:
+            if pokestop.latitude is not None and pokestop.longitude is not None:
+                self.pokestop_index.insert(pokestop.fort_id, pokestop.latitude, pokestop.longitude, pokestop)
+        for gym in cell.gyms:
+            if gym.latitude is not None and gym.longitude is not None:
+                self.gym_index.insert(gym.fort_id, gym.latitude, gym.longitude, gym)
+        for spawn_point in cell.spawn_points:
+            self.spawn_point_index.insert(spawn_point, spawn_point[0], spawn_point[1], spawn_point)
+
+    @staticmethod
+    def _pokestop_filter(skip_cooldown, lured_only):
+        if not skip_cooldown and not lured_only:
+            return None
+
+        def predicate(pokestop):
+            if skip_cooldown and pokestop.is_in_cooldown():
+                return False
+            if lured_only and not pokestop.is_lure_active():
+                return False
+            return True
+
+        return predicate
+
+    # Every pokestop seen so far
+    def get_pokestops(self):
+        return self.pokestop_index.items()
+
+    # The k closest pokestops to a position, nearest first, as (pokestop, distance) pairs
+    def nearest_pokestops(self, lat, lng, k=1, skip_cooldown=False, lured_only=False):
+        return self.pokestop_index.nearest(lat, lng, k, self._pokestop_filter(skip_cooldown, lured_only))
+
+    # All pokestops within radius metres of a position, nearest first, as (pokestop, distance) pairs
+    def pokestops_within(self, lat, lng, radius, skip_cooldown=False, lured_only=False):
+        return self.pokestop_index.within(lat, lng, radius, self._pokestop_filter(skip_cooldown, lured_only))
+
+    def gyms_within(self, lat, lng, radius):
+        return self.gym_index.within(lat, lng, radius)
+
+    def spawn_points_within(self, lat, lng, radius):
+        return [spawn_point for spawn_point, _ in self.spawn_point_index.within(lat, lng, radius)]
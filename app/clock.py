@@ -0,0 +1,112 @@
+import threading
+import time
+
+
+class Clock(object):
+    """
+        Source of the current time and of sleeps. Everything that waits or reads a timestamp goes through the
+        active clock, so that the bot can run against simulated time.
+    """
+
+    def time(self):  # pragma: no cover
+        # type: () -> float
+        raise NotImplementedError
+
+    def sleep(self, seconds):  # pragma: no cover
+        # type: (float) -> None
+        raise NotImplementedError
+
+
+class RealClock(Clock):
+    """
+        Wall clock time.
+    """
+
+    def time(self):
+        # type: () -> float
+        return time.time()
+
+    def sleep(self, seconds):
+        # type: (float) -> None
+        time.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """
+        Simulated time that only moves when somebody sleeps, so sleeps return instantly.
+    """
+
+    def __init__(self, start=None):
+        # type: (Optional[float]) -> None
+        self._now = time.time() if start is None else float(start)
+        self._lock = threading.Lock()
+
+    def time(self):
+        # type: () -> float
+        return self._now
+
+    def sleep(self, seconds):
+        # type: (float) -> None
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        # type: (float) -> None
+        with self._lock:
+            self._now += max(0.0, seconds)
+
+
+class ScaledClock(Clock):
+    """
+        Wall clock time running scale times faster, sleeps are shortened by the same factor.
+    """
+
+    def __init__(self, scale=100.0, start=None):
+        # type: (float, Optional[float]) -> None
+        if scale <= 0:
+            raise ValueError('Clock scale must be positive, got {}'.format(scale))
+        self.scale = float(scale)
+        self._real_start = time.time()
+        self._start = self._real_start if start is None else float(start)
+
+    def time(self):
+        # type: () -> float
+        return self._start + (time.time() - self._real_start) * self.scale
+
+    def sleep(self, seconds):
+        # type: (float) -> None
+        time.sleep(max(0.0, seconds) / self.scale)
+
+
+CLOCK_TYPES = {
+    'real': RealClock,
+    'virtual': VirtualClock,
+    'scaled': ScaledClock
+}
+
+_clock = RealClock()
+
+
+def create_clock(config, start=None):
+    # type: (Dict[str, Any], Optional[float]) -> Clock
+    """
+        Clock of the given type, simulated clocks start at start (now by default).
+    """
+    clock_type = config.get('type', 'real')
+    if clock_type not in CLOCK_TYPES:
+        raise ValueError('Unknown clock "{}", expected one of {}'.format(clock_type, ', '.join(sorted(CLOCK_TYPES))))
+    if clock_type == 'scaled':
+        return ScaledClock(config.get('scale', 100.0), start)
+    if clock_type == 'virtual':
+        return VirtualClock(start)
+    return CLOCK_TYPES[clock_type]()
+
+
+def get_clock():
+    # type: () -> Clock
+    return _clock
+
+
+def set_clock(clock):
+    # type: (Clock) -> None
+    global _clock  # pylint: disable=global-statement
+    _clock = clock
@@ -0,0 +1,70 @@
+import unittest
+
+from mock import patch
+
+from app.clock import RealClock, ScaledClock, VirtualClock, create_clock, get_clock, set_clock
+
+
+class ClockTest(unittest.TestCase):
+    @staticmethod
+    def test_real_clock():
+        clock = RealClock()
+
+        with patch('time.time', return_value=1234.5):
+            assert clock.time() == 1234.5
+
+        with patch('time.sleep', return_value=None) as sleep:
+            clock.sleep(3)
+            sleep.assert_called_once_with(3)
+
+    @staticmethod
+    def test_virtual_clock():
+        clock = VirtualClock(start=1000)
+
+        with patch('time.sleep', return_value=None) as sleep:
+            clock.sleep(8 * 3600)
+            clock.sleep(-5)
+            assert sleep.call_count == 0
+
+        assert clock.time() == 1000 + 8 * 3600
+
+        clock.advance(0.5)
+        assert clock.time() == 1000 + 8 * 3600 + 0.5
+
+    @staticmethod
+    def test_scaled_clock():
+        with patch('time.time', return_value=1000):
+            clock = ScaledClock(100, start=50)
+
+        with patch('time.time', return_value=1002):
+            assert clock.time() == 250
+
+        with patch('time.sleep', return_value=None) as sleep:
+            clock.sleep(10)
+            sleep.assert_called_once_with(0.1)
+
+    def test_scaled_clock_invalid(self):
+        with self.assertRaises(ValueError):
+            ScaledClock(0)
+
+    def test_create_clock(self):
+        assert isinstance(create_clock({}), RealClock)
+        assert isinstance(create_clock({'type': 'virtual'}), VirtualClock)
+        assert create_clock({'type': 'virtual'}, start=1000).time() == 1000
+
+        clock = create_clock({'type': 'scaled', 'scale': 10})
+        assert isinstance(clock, ScaledClock)
+        assert clock.scale == 10
+
+        with self.assertRaises(ValueError):
+            create_clock({'type': 'sundial'})
+
+    @staticmethod
+    def test_set_clock():
+        original = get_clock()
+        clock = VirtualClock(start=0)
+        try:
+            set_clock(clock)
+            assert get_clock() is clock
+        finally:
+            set_clock(original)
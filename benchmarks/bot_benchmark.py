@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end benchmark for the bot main loop.
+
+Boots the kernel with every plugin except the socket server against the offline API (see api/offline) and a virtual
+clock, so no sleep ever waits, then runs the bot loop for a number of steps. A step starts with every map refresh,
+so it covers the GET_MAP_OBJECTS call, the state parsing, work_on_cells, the plugins reacting to the events and the
+walk to the next position.
+
+Every scenario runs in its own process, so that they cannot share state and peak RSS is measured per scenario.
+Results are printed and can be written to a JSON file, which a later run can compare against:
+
+Usage: python -m benchmarks.bot_benchmark [--steps 200] [--output results.json] [--compare baseline.json]
+                                          [--trace-allocations] [scenario ...]
+"""
+from __future__ import print_function
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import ruamel.yaml
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORIGIN = (51.5044524, -0.0752479)
+
+SCENARIOS = {
+    "fort": {
+        "navigator": "fort"
+    },
+    "waypoint": {
+        "navigator": "waypoint",
+        "navigator_waypoints": [
+            [ORIGIN[0] + 0.004, ORIGIN[1]],
+            [ORIGIN[0] + 0.004, ORIGIN[1] + 0.006],
+            [ORIGIN[0], ORIGIN[1] + 0.006],
+            [ORIGIN[0], ORIGIN[1]]
+        ]
+    },
+    "camper": {
+        "navigator": "camper",
+        "navigator_campsite": [ORIGIN[0], ORIGIN[1]]
+    }
+}
+
+# Metrics compared by --compare, lower is better for all of them
+COMPARED = ("wall_time_per_step_ms", "rpcs_per_step", "dispatch_overhead_per_step_ms", "peak_rss_kb",
+            "allocated_blocks_per_step", "traced_bytes_per_step")
+
+
+class BenchmarkFinished(Exception):
+    pass
+
+
+class Sampler(object):
+    """
+        Takes a reading at the start of every step and raises BenchmarkFinished once enough steps were taken.
+    """
+
+    def __init__(self, pgoapi, steps, trace_allocations):
+        self.pgoapi = pgoapi
+        self.steps = steps
+        self.trace_allocations = trace_allocations
+        self.samples = []
+        self.dispatch_time = 0.0
+        self.listener_time = 0.0
+        self.events_fired = 0
+        self._thread = None
+
+    def sample(self):
+        self.samples.append({
+            "time": time.time(),
+            "rpcs": self.pgoapi.rpc_count,
+            "dispatch": self.dispatch_time - self.listener_time,
+            "events": self.events_fired,
+            "blocks": sys.getallocatedblocks() if hasattr(sys, "getallocatedblocks") else 0,
+            "traced": tracemalloc.get_traced_memory()[0] if self.trace_allocations else 0
+        })
+        if len(self.samples) > self.steps:
+            raise BenchmarkFinished()
+
+    def wrap_get_cells(self, mapper):
+        get_cells = mapper.get_cells
+
+        def sampled_get_cells(lat, lng):
+            self.sample()
+            return get_cells(lat, lng)
+
+        mapper.get_cells = sampled_get_cells
+
+    def wrap_event_manager(self, event_manager):
+        fire = event_manager.fire
+
+        def timed_fire(event_name, *args, **kwargs):
+            self.events_fired += 1
+            started = time.time()
+            try:
+                return fire(event_name, *args, **kwargs)
+            finally:
+                self.dispatch_time += time.time() - started
+
+        event_manager.fire = timed_fire
+
+        # Time the listeners too, what is left of the time spent in fire is the dispatch overhead. The sampler
+        # stands in for the event profiler, so the events wrap their listeners with it when they compile.
+        self._thread = threading.current_thread()
+        event_manager.set_profiler(self)
+
+    def wrap(self, event_name, listener):  # pylint: disable=unused-argument
+        """
+            Listener that adds the time the given one takes to the listener time, like EventProfiler.wrap.
+        """
+        def timed_listener(*args, **kwargs):
+            started = time.time()
+            try:
+                return listener(*args, **kwargs)
+            finally:
+                # Background listeners run on the workers, only handing the event over takes time in fire
+                if threading.current_thread() is self._thread:
+                    self.listener_time += time.time() - started
+
+        return timed_listener
+
+    def summarise(self):
+        steps = [(later["time"] - earlier["time"], later["rpcs"] - earlier["rpcs"],
+                  later["dispatch"] - earlier["dispatch"], later["events"] - earlier["events"],
+                  later["blocks"] - earlier["blocks"], later["traced"] - earlier["traced"])
+                 for earlier, later in zip(self.samples, self.samples[1:])]
+        count = len(steps)
+        if count == 0:
+            return {"steps": 0}
+
+        wall_times = sorted(step[0] for step in steps)
+        result = {
+            "steps": count,
+            "wall_time_per_step_ms": 1000.0 * sum(wall_times) / count,
+            "wall_time_median_ms": 1000.0 * wall_times[count // 2],
+            "wall_time_p95_ms": 1000.0 * wall_times[min(count - 1, int(count * 0.95))],
+            "rpcs_per_step": float(sum(step[1] for step in steps)) / count,
+            "dispatch_overhead_per_step_ms": 1000.0 * sum(step[2] for step in steps) / count,
+            "events_per_step": float(sum(step[3] for step in steps)) / count,
+            "allocated_blocks_per_step": float(sum(step[4] for step in steps)) / count,
+            "rpc_methods": dict(self.pgoapi.method_counts)
+        }
+        if self.trace_allocations:
+            result["traced_bytes_per_step"] = float(sum(step[5] for step in steps)) / count
+            result["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        if resource is not None:
+            result["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return result
+
+
+def create_workspace(scenario, seed, replay=None):
+    # type: (str, int, Optional[str]) -> str
+    """
+        Temporary working directory with a config for the scenario, so that the run does not touch the checkout.
+    """
+    workspace = tempfile.mkdtemp(prefix="bot-benchmark-")
+    shutil.copytree(os.path.join(ROOT, "data"), os.path.join(workspace, "data"))
+    os.makedirs(os.path.join(workspace, "config", "plugins"))
+
+    for node in os.listdir(os.path.join(ROOT, "config", "plugins")):
+        if node.endswith(".yml.example"):
+            shutil.copy(os.path.join(ROOT, "config", "plugins", node),
+                        os.path.join(workspace, "config", "plugins", node[:-len(".example")]))
+
+    with open(os.path.join(ROOT, "config", "config.yml.example")) as config_file:
+        config = ruamel.yaml.load(config_file.read(), ruamel.yaml.RoundTripLoader)
+
+    config["login"]["username"] = "benchmark"
+    config["mapping"]["location"] = "{},{}".format(*ORIGIN)
+    config["mapping"]["location_cache"] = False
+    config["movement"]["path_finder"] = "direct"
+    config["movement"].update(SCENARIOS[scenario])
+    config["clock"]["type"] = "virtual"
+    config["offline"]["enabled"] = True
+    config["offline"]["seed"] = seed
+    config["offline"]["replay"] = replay
+    config["logging"]["log_to_file"] = False
+    config["plugins"]["exclude"] = ["socket"]
+    config["plugins"]["include"] = [os.path.join(ROOT, "plugins")]
+
+    with open(os.path.join(workspace, "config", "config.yml"), "w") as config_file:
+        config_file.write(ruamel.yaml.dump(config, Dumper=ruamel.yaml.RoundTripDumper))
+
+    return workspace
+
+
+def run_scenario(scenario, steps, seed, trace_allocations):
+    # type: (str, int, int, bool) -> Dict[str, Any]
+    """
+        Runs one scenario in this process. Only call this once per process, the kernel can only boot once.
+    """
+    workspace = create_workspace(scenario, seed)
+    cwd = os.getcwd()
+    os.chdir(workspace)
+    sys.path.insert(0, ROOT)
+    bot = None
+    try:
+        from app import kernel
+        import pokemongo_bot  # pylint: disable=unused-variable
+
+        kernel.set_config_file(os.path.join(workspace, "config", "config.yml"))
+        kernel.boot()
+
+        bot = kernel.container.get('pokemongo_bot')
+        pgoapi = kernel.container.get('pgoapi')
+        clock = kernel.container.get('clock')
+        logging.getLogger('pokemongo_bot.logger').setLevel(logging.WARNING)
+
+        started = time.time()
+        bot.start()
+        start_time = time.time() - started
+
+        sampler = Sampler(pgoapi, steps, trace_allocations)
+        sampler.wrap_event_manager(bot.event_manager)
+        sampler.wrap_get_cells(bot.map_refresh_policy)
+        if trace_allocations:
+            tracemalloc.start()
+
+        simulated_start = clock.time()
+        try:
+            while True:
+                bot.run()
+        except BenchmarkFinished:
+            pass
+
+        result = sampler.summarise()
+        result["start_time_ms"] = 1000.0 * start_time
+        result["simulated_seconds"] = clock.time() - simulated_start
+        return result
+    finally:
+        # Saves the last location, the fort details and the RPC captures into the workspace, not wherever the process ends up
+        if bot is not None:
+            bot.stop()
+            kernel.container.get('fort_details_service').close()
+            kernel.container.get('rpc_recorder').close()
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def run_in_subprocess(scenario, steps, seed, trace_allocations):
+    # type: (str, int, int, bool) -> Dict[str, Any]
+    handle, result_file = tempfile.mkstemp(suffix=".json")
+    os.close(handle)
+    try:
+        command = [sys.executable, "-m", "benchmarks.bot_benchmark", "--steps", str(steps), "--seed", str(seed),
+                   "--result-file", result_file, scenario]
+        if trace_allocations:
+            command.append("--trace-allocations")
+        subprocess.check_call(command, cwd=ROOT)
+        with open(result_file) as result:
+            return json.load(result)
+    finally:
+        os.remove(result_file)
+
+
+def get_commit():
+    # type: () -> Optional[str]
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    # type: (Dict[str, Dict[str, Any]], Optional[Dict[str, Any]]) -> None
+    for scenario in sorted(results):
+        result = results[scenario]
+        print("{} navigator, {} steps ({:.0f} simulated seconds)".format(scenario, result["steps"],
+                                                                        result.get("simulated_seconds", 0)))
+        for metric in COMPARED:
+            if metric not in result:
+                continue
+            line = "  {:<32} {:>12.2f}".format(metric, result[metric])
+            old = (baseline or {}).get("scenarios", {}).get(scenario, {}).get(metric, None)
+            if old:
+                line += " {:>+8.1f}%".format(100.0 * (result[metric] - old) / abs(old))
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark for the bot main loop")
+    parser.add_argument("scenarios", nargs="*", help="any of {}, all of them by default".format(
+        ", ".join(sorted(SCENARIOS))))
+    parser.add_argument("--steps", type=int, default=200, help="steps to measure per scenario")
+    parser.add_argument("--seed", type=int, default=1337, help="seed of the offline world")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare with")
+    parser.add_argument("--trace-allocations", action="store_true",
+                        help="trace allocated bytes per step as well, this slows the bot down considerably")
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    scenarios = args.scenarios or sorted(SCENARIOS)
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            parser.error("Unknown scenario \"{}\"".format(scenario))
+
+    if args.result_file is not None:
+        result = run_scenario(scenarios[0], args.steps, args.seed, args.trace_allocations)
+        with open(args.result_file, "w") as result_file:
+            json.dump(result, result_file)
+        return
+
+    results = {}
+    for scenario in scenarios:
+        results[scenario] = run_in_subprocess(scenario, args.steps, args.seed, args.trace_allocations)
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+
+    if args.output is not None:
+        with open(args.output, "w") as output:
+            json.dump({
+                "commit": get_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "steps": args.steps,
+                "seed": args.seed,
+                "scenarios": results
+            }, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
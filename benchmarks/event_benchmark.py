@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for event dispatch.
+
+Fires events shaped like the ones the bot fires on every step through the compiled dispatch plan and through the
+old dispatch, which sorted the priorities and inspected every listener's arguments on every fire.
+
+Usage: python -m benchmarks.event_benchmark [fire count]
+"""
+from __future__ import print_function
+import inspect
+import sys
+import timeit
+
+from mock import Mock
+
+from pokemongo_bot.event_manager import Event
+
+
+class LegacyEvent(Event):
+    """
+        Event as it dispatched before the dispatch plan, kept to compare against.
+    """
+
+    def fire(self, **kwargs):
+        if self.num_listeners == 0:
+            self.logger.warning("No handler has registered to handle event \"{}\"".format(self.name))
+
+        priorities = sorted(self.listeners, key=lambda event_priority: event_priority)
+        for priority in priorities:
+            for listener in list(self.listeners[priority]):
+                kwargs["event_name"] = self.name
+
+                # pylint: disable=deprecated-method
+                argspec = inspect.getargspec(listener)
+
+                if not argspec.args:
+                    return_dict = listener()
+                else:
+                    listener_args = {}
+                    for key in argspec.args:
+                        if key == 'self':
+                            continue
+                        listener_args[key] = kwargs.get(key)
+                    return_dict = listener(**listener_args)
+
+                if return_dict is False:
+                    return False
+                if return_dict is not None:
+                    kwargs.update(return_dict)
+        return kwargs
+
+
+class Plugin(object):
+    # pylint: disable=unused-argument,no-self-use
+
+    def filter_pokestops(self, bot=None, pokestops=None):
+        return {"pokestops": pokestops}
+
+    def visit_near_pokestops(self, bot=None, pokestops=None):
+        pass
+
+    def emit(self, bot=None, pokestops=None, event_name=None):
+        pass
+
+    def position_update(self, bot=None, coordinates=None):
+        pass
+
+    def pokemon_found(self, bot=None, encounters=None):
+        pass
+
+
+def create_events(event_class):
+    logger = Mock()
+    plugin = Plugin()
+
+    pokestops_found = event_class("pokestops_found", logger)
+    pokestops_found.add_listener(plugin.filter_pokestops, priority=-1000)
+    pokestops_found.add_listener(plugin.emit, priority=-2000)
+    pokestops_found.add_listener(plugin.visit_near_pokestops, priority=1000)
+
+    position_updated = event_class("position_updated", logger)
+    position_updated.add_listener(plugin.position_update)
+
+    pokemon_found = event_class("pokemon_found", logger)
+    pokemon_found.add_listener(plugin.pokemon_found)
+
+    return pokestops_found, position_updated, pokemon_found
+
+
+def fire_step(events):
+    pokestops_found, position_updated, pokemon_found = events
+    position_updated.fire(bot=None, coordinates=(51.5, -0.07, 0.0))
+    pokemon_found.fire(bot=None, encounters=[])
+    pokestops_found.fire(bot=None, pokestops=[])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print("Firing position_updated, pokemon_found and pokestops_found {:,} times".format(count))
+    results = {}
+    for name, event_class in (("old dispatch", LegacyEvent), ("dispatch plan", Event)):
+        events = create_events(event_class)
+        elapsed = min(timeit.repeat(lambda: fire_step(events), number=count, repeat=3))
+        results[name] = elapsed
+        print("  {:<16} {:>8.2f}us per step".format(name, elapsed / count * 1e6))
+    print("  {:<16} {:>8.1f}x".format("speed-up", results["old dispatch"] / results["dispatch plan"]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for the distance engine.
+
+Compares the old per-pair vincenty calls against the batched distance API on a synthetic map of forts.
+
+Usage: python -m benchmarks.geo_benchmark [fort count]
+"""
+from __future__ import print_function
+import random
+import sys
+import timeit
+
+from geopy.distance import vincenty     # type: ignore
+
+from api.worldmap import PokeStop
+from pokemongo_bot import geo
+
+ORIGIN = (51.5044524, -0.0752479)
+
+
+def create_forts(count, seed=1337):
+    # type: (int, int) -> List[PokeStop]
+    rand = random.Random(seed)
+    forts = []
+    for i in range(count):
+        forts.append(PokeStop({
+            "id": "fort_{}".format(i),
+            "latitude": ORIGIN[0] + rand.uniform(-0.01, 0.01),
+            "longitude": ORIGIN[1] + rand.uniform(-0.015, 0.015),
+            "type": 1
+        }))
+    return forts
+
+
+def sort_vincenty_per_pair(forts):
+    lat, lng = ORIGIN
+    return sorted(forts, key=lambda fort: vincenty((lat, lng), (fort.latitude, fort.longitude)).meters)
+
+
+def sort_scalar(forts, accuracy):
+    lat, lng = ORIGIN
+    return sorted(forts, key=lambda fort: geo.distance(lat, lng, fort.latitude, fort.longitude, accuracy))
+
+
+def sort_batch(forts, accuracy):
+    return geo.sort_by_distance(ORIGIN[0], ORIGIN[1], forts, accuracy)
+
+
+def run(count, repeat=5):
+    forts = create_forts(count)
+
+    cases = [
+        ("per-pair vincenty (old)", lambda: sort_vincenty_per_pair(forts)),
+        ("per-pair haversine", lambda: sort_scalar(forts, geo.HAVERSINE)),
+        ("batch vincenty", lambda: sort_batch(forts, geo.VINCENTY)),
+        ("batch haversine", lambda: sort_batch(forts, geo.HAVERSINE)),
+        ("batch equirectangular", lambda: sort_batch(forts, geo.EQUIRECTANGULAR)),
+    ]
+
+    results = []
+    for name, case in cases:
+        best = min(timeit.repeat(case, number=1, repeat=repeat))
+        results.append((name, best))
+
+    baseline = results[0][1]
+    print("Sorting {:,} forts by distance (best of {})".format(count, repeat))
+    for name, best in results:
+        print("  {:<26} {:>10.2f} ms {:>9.1f}x".format(name, best * 1000, baseline / best))
+
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    run(count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Replays a recorded session at full speed.
+
+Record a session with recording.session enabled, then run this against data/session-<username>.capture. The bot runs
+with every plugin except the socket server and a virtual clock, and every request is answered with the next recorded
+response (see api/replay.py) until there are none left. Nothing leaves the process, so an incident can be reproduced
+offline, and the parsing and plugin pipeline can be profiled against real server responses.
+
+Usage: python -m benchmarks.replay_session [--navigator fort] [--profile replay.prof] capture
+"""
+from __future__ import print_function
+import argparse
+import cProfile
+import logging
+import os
+import pstats
+import shutil
+import sys
+import time
+
+from benchmarks.bot_benchmark import ROOT, SCENARIOS, create_workspace
+
+
+def replay(capture_file, navigator, profile_file=None):
+    # type: (str, str, Optional[str]) -> None
+    capture_file = os.path.abspath(capture_file)
+    workspace = create_workspace(navigator, 0, replay=capture_file)
+    cwd = os.getcwd()
+    os.chdir(workspace)
+    sys.path.insert(0, ROOT)
+    try:
+        from api.replay import ReplayFinished
+        from app import kernel
+        import pokemongo_bot  # pylint: disable=unused-variable
+
+        kernel.set_config_file(os.path.join(workspace, "config", "config.yml"))
+        kernel.boot()
+
+        bot = kernel.container.get('pokemongo_bot')
+        pgoapi = kernel.container.get('pgoapi')
+        clock = kernel.container.get('clock')
+        logging.getLogger('pokemongo_bot.logger').setLevel(logging.WARNING)
+
+        profiler = cProfile.Profile() if profile_file is not None else None
+        simulated_start = clock.time()
+        started = time.time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            bot.start()
+            while True:
+                bot.run()
+        except ReplayFinished:
+            pass
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        elapsed = time.time() - started
+
+        print("Replayed {:,} requests in {:.2f}s ({:,.0f} requests/s), {:.0f} simulated seconds".format(
+            pgoapi.rpc_count, elapsed, pgoapi.rpc_count / max(elapsed, 1e-9), clock.time() - simulated_start))
+        if pgoapi.diverged:
+            print("{:,} requests asked for other methods than the recorded ones, {:,} recorded ones were "
+                  "skipped".format(pgoapi.diverged, pgoapi.skipped))
+
+        if profiler is not None:
+            profile_file = os.path.join(cwd, profile_file)
+            profiler.dump_stats(profile_file)
+            pstats.Stats(profile_file).sort_stats("cumulative").print_stats(20)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays a recorded session at full speed")
+    parser.add_argument("capture", help="session capture, see recording.session")
+    parser.add_argument("--navigator", default="fort", choices=sorted(SCENARIOS),
+                        help="navigator the session was recorded with")
+    parser.add_argument("--profile", help="profile the replay with cProfile and write the stats to this file")
+    args = parser.parse_args()
+
+    replay(args.capture, args.navigator, args.profile)
+
+
+if __name__ == '__main__':
+    main()
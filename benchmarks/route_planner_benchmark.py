@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the fort navigator route planner.
+
+Plans tours over synthetic maps of pokestops, some of them on cooldown, and compares visiting them in order of
+distance from the start (the old fort navigator) with the nearest neighbour seed and the improved route.
+
+Usage: python -m benchmarks.route_planner_benchmark [stop count ...]
+"""
+from __future__ import print_function
+import random
+import sys
+import time
+
+from benchmarks.geo_benchmark import ORIGIN, create_forts
+from pokemongo_bot import geo
+from pokemongo_bot.navigation.route_planner import RoutePlanner
+
+WALK_SPEED = 4.16
+
+
+def create_pokestops(count, now, seed=1337):
+    # type: (int, float, int) -> List[PokeStop]
+    # Keep the density of a busy city centre, roughly one stop per 100m x 100m
+    rand = random.Random(seed)
+    pokestops = create_forts(count, seed)
+    scale = (count / 500.0) ** 0.5
+    for pokestop in pokestops:
+        pokestop.latitude = ORIGIN[0] + (pokestop.latitude - ORIGIN[0]) * scale
+        pokestop.longitude = ORIGIN[1] + (pokestop.longitude - ORIGIN[1]) * scale
+        # A tenth of the stops were spun recently
+        if rand.random() < 0.1:
+            pokestop.cooldown_timestamp_ms = (now + rand.uniform(0, 300)) * 1000
+        else:
+            pokestop.cooldown_timestamp_ms = 0
+    return pokestops
+
+
+def sorted_by_distance(pokestops, now):
+    planner = RoutePlanner(WALK_SPEED)
+    planner.route = geo.sort_by_distance(ORIGIN[0], ORIGIN[1], pokestops)
+    # Same cooldown rule as the planner, so the numbers compare like for like
+    xs, ys = planner._project(ORIGIN[0], ORIGIN[1], planner.route)  # pylint: disable=protected-access
+    path = [len(planner.route)] + list(range(len(planner.route)))
+    planner.route = planner._schedule(xs, ys, planner.route, path, now)  # pylint: disable=protected-access
+    return planner
+
+
+def nearest_neighbour(pokestops, now):
+    planner = RoutePlanner(WALK_SPEED, time_budget=0)
+    planner.plan(ORIGIN[0], ORIGIN[1], pokestops, now)
+    return planner
+
+
+def improved(pokestops, now, time_budget):
+    planner = RoutePlanner(WALK_SPEED, time_budget=time_budget)
+    planner.plan(ORIGIN[0], ORIGIN[1], pokestops, now)
+    return planner
+
+
+def run(count, time_budget=2.0):
+    now = time.time()
+    pokestops = create_pokestops(count, now)
+
+    cases = [
+        ("sorted by distance (old)", lambda: sorted_by_distance(pokestops, now)),
+        ("nearest neighbour", lambda: nearest_neighbour(pokestops, now)),
+        ("nn + 2-opt/or-opt", lambda: improved(pokestops, now, time_budget)),
+    ]
+
+    print("Route over {:,} pokestops at {} m/s ({}s improvement budget)".format(count, WALK_SPEED, time_budget))
+    print("  {:<26} {:>10} {:>8} {:>12} {:>10}".format("", "length", "stops", "spins/hour", "planning"))
+    results = []
+    for name, case in cases:
+        started = time.time()
+        planner = case()
+        elapsed = time.time() - started
+        length = planner.route_length(ORIGIN[0], ORIGIN[1])
+        spins = planner.spins_per_hour(ORIGIN[0], ORIGIN[1])
+        print("  {:<26} {:>8.2f}km {:>8} {:>12.1f} {:>8.0f}ms".format(name, length / 1000, len(planner.route),
+                                                                     spins, elapsed * 1000))
+        results.append((name, length, spins, elapsed))
+
+    # Incremental re-plan when the map reveals a handful of new stops
+    planner = improved(pokestops, now, time_budget)
+    new_stops = create_pokestops(10, now, seed=4242)
+    for index, pokestop in enumerate(new_stops):
+        pokestop.fort_id = "new_fort_{}".format(index)
+    started = time.time()
+    planner.update(ORIGIN[0], ORIGIN[1], pokestops + new_stops, now)
+    print("  {:<26} {:>8.0f}ms".format("re-plan with 10 new stops", (time.time() - started) * 1000))
+
+    return results
+
+
+def main():
+    counts = [int(count) for count in sys.argv[1:]] or [500, 5000]
+    for count in counts:
+        run(count)
+
+
+if __name__ == '__main__':
+    main()
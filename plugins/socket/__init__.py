@@ -13,14 +13,16 @@ from pokemongo_bot.navigation.camper_navigator import CamperNavigator
 
 # pylint: disable=unused-variable, unused-argument
 
-@kernel.container.register('socket', ['@config.socket', "@pokemongo_bot", '@event_manager', '@logger', '@go_there_navigator'], tags=['plugin'])
+@kernel.container.register('socket', ['@config.socket', "@pokemongo_bot", '@event_manager', '@logger', '@go_there_navigator', '@fort_details_service', '@event_profiler'], tags=['plugin'])
 class Socket(Plugin):
-    def __init__(self, config, bot, event_manager, logger, go_there_navigator):
+    def __init__(self, config, bot, event_manager, logger, go_there_navigator, fort_details, event_profiler):
         self.config = config
         self.event_manager = event_manager
         self.logger = logger.getLogger('Socket')
         self.bot = bot
         self.go_there_navigator = go_there_navigator
+        self.fort_details = fort_details
+        self.event_profiler = event_profiler
         self.oldnavigator = None
 
         logging.getLogger('socketio').disabled = True
@@ -66,7 +68,7 @@ class Socket(Plugin):
         state = {}
 
         BotEvents(self.bot, socketio, state, self.event_manager)
-        UiEvents(self.bot, socketio, state, self.event_manager, self.logger)
+        UiEvents(self.bot, socketio, state, self.event_manager, self.logger, self.fort_details, self.event_profiler)
 
         self.logger.info("Starting socket server...")
 
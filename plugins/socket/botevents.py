@@ -8,20 +8,23 @@ class BotEvents(object):
         self.bot = bot
 
         event_manager.add_listener('bot_initialized', self.bot_initialized, priority=-1000)
-        event_manager.add_listener('position_updated', self.position_update)
 
-        event_manager.add_listener('gyms_found', self.gyms_found_event, priority=-2000)
-        event_manager.add_listener('pokestops_found', self.pokestops_found_event, priority=-2000)
-        event_manager.add_listener('pokestop_visited', self.pokestop_visited_event, priority=-2000)
+        # Emitting to the UI must never hold up the bot, only the latest position, route and forts matter
+        event_manager.add_listener('position_updated', self.position_update, background=True, policy='coalesce')
 
-        event_manager.add_listener('pokemon_caught', self.pokemon_caught_event, priority=-1000)
-        event_manager.add_listener('pokemon_evolved', self.pokemon_evolved_event)
-        event_manager.add_listener('after_transfer_pokemon', self.transfer_pokemon_event)
+        event_manager.add_listener('gyms_found', self.gyms_found_event, priority=-2000, background=True, policy='coalesce')
+        event_manager.add_listener('pokestops_found', self.pokestops_found_event, priority=-2000, background=True,
+                                   policy='coalesce')
+        event_manager.add_listener('pokestop_visited', self.pokestop_visited_event, priority=-2000, background=True)
 
-        event_manager.add_listener('player_level_up', self.player_level_up_event)
+        event_manager.add_listener('pokemon_caught', self.pokemon_caught_event, priority=-1000, background=True)
+        event_manager.add_listener('pokemon_evolved', self.pokemon_evolved_event, background=True)
+        event_manager.add_listener('after_transfer_pokemon', self.transfer_pokemon_event, background=True)
 
-        event_manager.add_listener('route', self.on_route_event)
-        event_manager.add_listener('manual_destination_reached', self.manual_destination_reached_event)
+        event_manager.add_listener('player_level_up', self.player_level_up_event, background=True)
+
+        event_manager.add_listener('route', self.on_route_event, background=True, policy='coalesce')
+        event_manager.add_listener('manual_destination_reached', self.manual_destination_reached_event, background=True)
 
     def bot_initialized(self, bot):
         player = bot.player_service.get_player()
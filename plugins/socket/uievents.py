@@ -3,9 +3,11 @@ from flask import request
 
 # pylint: disable=unused-variable, unused-argument
 class UiEvents(object):
-    def __init__(self, bot, socketio, state, event_manager, logger):
+    def __init__(self, bot, socketio, state, event_manager, logger, fort_details, event_profiler):
         self.logger = logger
         self.bot = bot
+        self.fort_details = fort_details
+        self.event_profiler = event_profiler
 
         @socketio.on("connect", namespace="/event")
         def connect():
@@ -135,6 +137,29 @@ class UiEvents(object):
 
             self.bot.api_wrapper.set_favorite_pokemon(pokemon_id=pkm_id, is_favorite=favorite).call()
 
+        @socketio.on("fort_details", namespace="/event")
+        def client_ask_for_fort_details(evt):
+            # Only what the bot already looked up, the web UI never triggers FORT_DETAILS itself
+            fort_ids = evt["ids"] if "ids" in evt else [evt["id"]]
+            emit_object = {
+                "forts": [details for details in [self.fort_details.peek(fort_id) for fort_id in fort_ids] if details is not None]
+            }
+            socketio.emit("fort_details", emit_object, namespace="/event", room=request.sid)
+
+        @socketio.on("event_profile", namespace="/event")
+        def client_ask_for_event_profile(evt=None):
+            # Listener timings, only recorded with profiling.events enabled
+            evt = evt or {}
+            if evt.get("dump", False):
+                self.event_profiler.dump()
+            emit_object = {
+                "enabled": self.event_profiler.enabled,
+                "events": self.event_profiler.get_stats()
+            }
+            if evt.get("trace", False):
+                emit_object["trace"] = self.event_profiler.get_chrome_trace()
+            socketio.emit("event_profile", emit_object, namespace="/event", room=request.sid)
+
         @socketio.on("set_destination", namespace="/event")
         def client_set_destination(evt):
             self.logger.info("Web UI action: Set Destination")
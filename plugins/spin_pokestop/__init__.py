@@ -1,21 +1,23 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import print_function
-import time
 from math import ceil
 
 from app import Plugin
 from app import kernel
+from app.clock import get_clock
 from pokemongo_bot.human_behaviour import sleep
+from pokemongo_bot import geo
 from pokemongo_bot.utils import format_time, filtered_forts, distance, format_dist
 from api.worldmap import PokeStop
 
 
-@kernel.container.register('spin_pokestop', ['@event_manager', '@logger'], tags=['plugin'])
+@kernel.container.register('spin_pokestop', ['@event_manager', '@logger', '@fort_details_service'], tags=['plugin'])
 class SpinPokestop(Plugin):
-    def __init__(self, event_manager, logger):
+    def __init__(self, event_manager, logger, fort_details):
         self.event_manager = event_manager
         self.logger = logger.getLogger('PokeStop')
+        self.fort_details = fort_details
 
         self.event_manager.add_listener('pokestops_found', self.filter_pokestops, priority=-1000)
         self.event_manager.add_listener('pokestops_found', self.visit_near_pokestops, priority=1000)
@@ -39,14 +41,25 @@ class SpinPokestop(Plugin):
         if pokestops is None:
             return
 
-        # If we're debugging, don't filter pokestops so we can test if they are on cooldown
-        if not bot.config["debug"]:
-            pokestops = filtered_forts(bot.stepper.current_lat, bot.stepper.current_lng, pokestops)
+        lat = bot.stepper.current_lat
+        lng = bot.stepper.current_lng
 
-        now = int(time.time()) * 1000
-        for pokestop in pokestops:
-            dist = distance(bot.stepper.current_lat, bot.stepper.current_lng, pokestop.latitude, pokestop.longitude)
+        # If we're debugging, don't filter pokestops so we can test if they are on cooldown
+        world_map = bot.mapper.get_world_map()
+        if not bot.config["debug"] and world_map is not None:
+            # The world map indexes every pokestop we know of, so there is no need to measure the whole list.
+            # Only stops that made it through the listeners before us are visited.
+            fort_ids = set(pokestop.fort_id for pokestop in pokestops)
+            nearby_pokestops = [(pokestop, dist) for pokestop, dist in
+                                world_map.pokestops_within(lat, lng, 35, skip_cooldown=True)
+                                if pokestop.fort_id in fort_ids]
+        else:
+            if not bot.config["debug"]:
+                pokestops = filtered_forts(lat, lng, pokestops)
+            nearby_pokestops = zip(pokestops, geo.distances_to(lat, lng, pokestops))
 
+        now = int(get_clock().time()) * 1000
+        for pokestop, dist in nearby_pokestops:
             if dist < 35:
                 if pokestop.is_in_cooldown() is False:
                     self.event_manager.fire_with_context('pokestop_arrived', bot, pokestop=pokestop)
@@ -71,13 +84,10 @@ class SpinPokestop(Plugin):
         player_latitude = bot.stepper.current_lat
         player_longitude = bot.stepper.current_lng
 
-        fort_details = bot.api_wrapper.fort_details(fort_id=pokestop.fort_id,
-                                                    latitude=pokestop.latitude,
-                                                    longitude=pokestop.longitude).call()
         dist = distance(bot.stepper.current_lat, bot.stepper.current_lng, pokestop.latitude, pokestop.longitude)
         self.logger.info(
             "Nearby PokeStop found \"{}\" ({} away)".format(
-                fort_details["fort"].fort_name,
+                self.fort_details.get_name(pokestop),
                 format_dist(dist,
                             bot.config["mapping"]["distance_unit"])
             ),
@@ -128,7 +138,7 @@ class SpinPokestop(Plugin):
 
             pokestop_cooldown = spin_details.get("cooldown_complete_timestamp_ms")
             if pokestop_cooldown:
-                seconds_since_epoch = time.time()
+                seconds_since_epoch = get_clock().time()
                 cooldown_time = str(format_time((pokestop_cooldown / 1000) - seconds_since_epoch))
                 self.logger.info("PokeStop is on cooldown for {}.".format(cooldown_time))
 
@@ -143,7 +153,7 @@ class SpinPokestop(Plugin):
             self.logger.info("PokeStop is already on cooldown.", "red")
             pokestop_cooldown = spin_details.get("cooldown_complete_timestamp_ms")
             if pokestop_cooldown:
-                seconds_since_epoch = time.time()
+                seconds_since_epoch = get_clock().time()
                 cooldown_time = str(format_time((pokestop_cooldown / 1000) - seconds_since_epoch))
                 self.logger.info("PokeStop is already on cooldown for {}.".format(cooldown_time), "red")
         elif spin_result == 4:
@@ -34,6 +34,7 @@ import sys
 import colorama
 
 # Disable HTTPS certificate verification
+from api.replay import ReplayFinished
 from app import kernel
 from pokemongo_bot.bot import PokemonGoBot
 
@@ -72,6 +73,7 @@ def main():
     kernel.set_config_file(config_dir)
     kernel.boot()
 
+    bot = None
     try:
         bot = kernel.container.get('pokemongo_bot')
         bot.start()
@@ -82,6 +84,14 @@ def main():
     except KeyboardInterrupt:
         logger = kernel.container.get('logger').getLogger()
         logger.info('Exiting PokemonGo Bot', 'red')
+    except ReplayFinished:
+        logger = kernel.container.get('logger').getLogger()
+        logger.info('Replayed every recorded request, exiting PokemonGo Bot', 'green')
+    finally:
+        if bot is not None:
+            bot.stop()
+            kernel.container.get('fort_details_service').close()
+            kernel.container.get('rpc_recorder').close()
 
 
 if __name__ == '__main__':
@@ -5,7 +5,12 @@ import sys
 import googlemaps
 from pgoapi import PGoApi
 
+from api.offline import OfflineMaps, OfflinePGoApi, SyntheticWorld
+from api.recorder import RpcRecorder
+from api.replay import ReplayPGoApi
 from app import kernel
+from app.clock import create_clock, set_clock
+from pokemongo_bot import geo
 from pokemongo_bot.bot import PokemonGoBot
 from pokemongo_bot.event_manager import EventManager
 from pokemongo_bot.logger import Logger
@@ -13,7 +18,8 @@ from pokemongo_bot.mapper import Mapper
 from pokemongo_bot.stepper import Stepper
 from pokemongo_bot.navigation import CamperNavigator, FortNavigator, WaypointNavigator
 from pokemongo_bot.navigation.path_finder import DirectPathFinder, GooglePathFinder
-from pokemongo_bot.service import Player, Pokemon
+from pokemongo_bot.service import EventProfiler, FortDetails, GeoCache, LocationStore, MapPrefetcher, MapRefreshPolicy, \
+    Player, Pokemon, Scheduler
 
 
 @kernel.container.register_compiler_pass()
@@ -28,9 +34,37 @@ def boot(service_container):
     service_container.set_parameter('pogoapi.username', config['login']['username'])
     service_container.set_parameter('pogoapi.password', config['login']['password'])
     service_container.set_parameter('pogoapi.shared_lib', config['load_library'])
+    service_container.set_parameter('pogoapi.token_refresh', config['login'].get('token_refresh', 600))
+    service_container.set_parameter('pogoapi.world_map_max_age', config['mapping'].get('world_map_max_age', 1800))
+    service_container.set_parameter('pogoapi.world_map_max_distance',
+                                    config['mapping'].get('world_map_max_distance', 3000))
 
-    service_container.register_singleton('pgoapi', PGoApi())
-    service_container.register_singleton('google_maps', googlemaps.Client(key=config["mapping"]["gmapkey"]))
+    geo.set_accuracy(config['mapping'].get('distance_accuracy', geo.HAVERSINE))
+
+    offline = config.get('offline', None) or {}
+    replay = None
+    if offline.get('enabled', False) and offline.get('replay', None):
+        replay = ReplayPGoApi(offline['replay'])
+
+    # Everything that sleeps or reads the time uses this clock, including code outside the container. A replay
+    # starts at the time the session was recorded, so that the recorded timestamps make sense to the bot
+    clock = create_clock(config.get('clock', None) or {}, replay.get_start_time() if replay is not None else None)
+    set_clock(clock)
+    service_container.register_singleton('clock', clock)
+
+    if offline.get('enabled', False):
+        world = SyntheticWorld(
+            seed=offline.get('seed', 1337),
+            pokestops_per_cell=offline.get('pokestops_per_cell', 1.5),
+            gyms_per_cell=offline.get('gyms_per_cell', 0.25),
+            spawn_points_per_cell=offline.get('spawn_points_per_cell', 6.0),
+            lure_chance=offline.get('lure_chance', 0.05)
+        )
+        service_container.register_singleton('pgoapi', replay or OfflinePGoApi(world))
+        service_container.register_singleton('google_maps', OfflineMaps(world))
+    else:
+        service_container.register_singleton('pgoapi', PGoApi())
+        service_container.register_singleton('google_maps', googlemaps.Client(key=config["mapping"]["gmapkey"]))
 
     if config['movement']['path_finder'] in ['google', 'direct']:
         service_container.set_parameter('path_finder', config['movement']['path_finder'] + '_path_finder')
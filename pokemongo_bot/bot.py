@@ -8,8 +8,9 @@ import sys
 import time
 
 from app import kernel
+from app.clock import get_clock
 from pokemongo_bot.navigation.path_finder import DirectPathFinder, GooglePathFinder
-from pokemongo_bot.service import Player, Pokemon
+from pokemongo_bot.service import LocationStore, MapRefreshPolicy, Player, Pokemon, Scheduler
 from pokemongo_bot.utils import filtered_forts, distance
 from pokemongo_bot.human_behaviour import sleep
 from pokemongo_bot.item_list import Item
@@ -24,12 +25,12 @@ from api.encounter import Encounter
 # from api.pokemon import Pokemon
 # from api.worldmap import Cell
 
-@kernel.container.register('pokemongo_bot', ['@config.core', '@api_wrapper', '@player_service', '@pokemon_service', '@event_manager', '@mapper', '@stepper', '%navigator%', '@logger'])
+@kernel.container.register('pokemongo_bot', ['@config.core', '@api_wrapper', '@player_service', '@pokemon_service', '@event_manager', '@mapper', '@stepper', '%navigator%', '@logger'], {'scheduler': '@scheduler', 'map_refresh_policy': '@map_refresh_policy', 'location_store': '@location_store'})
 class PokemonGoBot(object):
     process_ignored_pokemon = False
 
-    def __init__(self, config, api_wrapper, player_service, pokemon_service, event_manager, mapper, stepper, navigator, logger):
-        # type: (Namespace, PoGoApi, Player, Pokemon, EventManager, Mapper, Stepper, Navigator, Logger) -> None
+    def __init__(self, config, api_wrapper, player_service, pokemon_service, event_manager, mapper, stepper, navigator, logger, scheduler=None, map_refresh_policy=None, location_store=None):
+        # type: (Namespace, PoGoApi, Player, Pokemon, EventManager, Mapper, Stepper, Navigator, Logger, Scheduler, MapRefreshPolicy, LocationStore) -> None
         self.config = config
         self.api_wrapper = api_wrapper
         self.player_service = player_service
@@ -46,11 +47,28 @@ class PokemonGoBot(object):
             self.item_list[int(item_id)] = item_name
 
         self.position = (0.0, 0.0, 0.0)
-        self.last_session_check = time.gmtime()
+        self.last_session_check = time.gmtime(get_clock().time())
 
         self.break_nav = False
         event_manager.add_listener("reset_navigation", self.reset_navigation)
 
+        # Periodic requests, sent along with the map request of the step they are due in
+        self.scheduler = scheduler or Scheduler(config, logger)
+        self.scheduler.add_task('heartbeat', lambda: self.player_service.heartbeat(defer=True), interval=120)
+        self.scheduler.add_task('hatched_eggs', lambda: self.player_service.get_hatched_eggs(defer=True),
+                                interval=600, distance=250)
+        self.scheduler.add_task('awarded_badges', lambda: self.player_service.check_awarded_badges(defer=True),
+                                interval=900)
+
+        # Between two map requests the steps are worked on from the cells of the last one
+        self.map_refresh_policy = map_refresh_policy or MapRefreshPolicy(config, mapper, logger)
+
+        # The cells along the route are requested a few at a time with the map requests while walking towards them
+        self.map_prefetcher = mapper.map_prefetcher
+
+        # Saved from a background thread every few seconds, read once at start
+        self.location_store = location_store or LocationStore(config, logger)
+
         self.logger.info('PokemonGO Bot v1.0', color='green')
         self.logger.info('Configuration initialized', color='yellow')
 
@@ -67,6 +85,10 @@ class PokemonGoBot(object):
 
         self.player_service.update()
 
+    def stop(self):
+        # type: () -> None
+        self.location_store.close()
+
     def _setup_logging(self):
         if self.config['debug']:
             logging.getLogger("requests").setLevel(logging.DEBUG)
@@ -84,12 +106,12 @@ class PokemonGoBot(object):
         while not self.player_service.login():
             self.logger.error('Login Error, server busy', 'red')
             self.logger.info('Waiting 15 seconds before trying again...')
-            time.sleep(15)
+            get_clock().sleep(15)
 
         self.logger.info('Login to Pokemon Go successful.', 'green')
 
     def run(self):
-        map_cells = self.mapper.get_cells(
+        map_cells = self.map_refresh_policy.get_cells(
             self.stepper.current_lat,
             self.stepper.current_lng
         )
@@ -113,6 +135,8 @@ class PokemonGoBot(object):
                 destination.target_alt
             )
             destination.set_steps(steps)
+            self.map_prefetcher.plan(steps)
+            self.location_store.set_navigation(type(self.navigator).__name__, self.navigator.get_state(), destination)
 
             self.fire("route", route=steps)
 
@@ -125,13 +149,16 @@ class PokemonGoBot(object):
                     return
 
                 self.fire("position_updated", coordinates=step)
-                self.player_service.heartbeat()
+                self.location_store.update(self.stepper.current_lat, self.stepper.current_lng,
+                                           self.stepper.current_alt)
+                self.scheduler.tick(self.stepper.current_lat, self.stepper.current_lng)
 
                 self.work_on_cells(
-                    self.mapper.get_cells(
+                    self.map_refresh_policy.get_cells(
                         self.stepper.current_lat,
                         self.stepper.current_lng
-                    )
+                    ),
+                    self.map_refresh_policy.refreshed
                 )
 
                 if self.break_nav:
@@ -141,17 +168,19 @@ class PokemonGoBot(object):
             self.fire("walking_finished",
                       coords=(destination.target_lat, destination.target_lng, destination.target_alt))
 
-    def work_on_cells(self, map_cells):
-        # type: (Cell, bool) -> None
+    def work_on_cells(self, map_cells, fresh=True):
+        # type: (List[Cell], bool) -> None
         encounters = []
         pokestops = []
         for cell in map_cells:
-            encounters += cell.catchable_pokemon + cell.wild_pokemon
+            # Pokemon of cells served from memory may be gone or out of reach by now, pokestops are still there
+            if fresh:
+                encounters += cell.catchable_pokemon + cell.wild_pokemon
             pokestops += cell.pokestops
 
         lure_encounters = []
         for fort in pokestops:
-            if fort.lure_encounter_id is not None:
+            if fresh and fort.lure_encounter_id is not None:
                 lure_encounters.append({
                     "encounter_id": fort.lure_encounter_id,
                     "latitude": fort.latitude,
@@ -173,25 +202,25 @@ class PokemonGoBot(object):
 
     def _set_starting_position(self):
         if self.config["mapping"]["location_cache"]:
-            try:
-                #
-                # save location flag used to pull the last known location from
-                # the location.json
-                with open('data/last-location-%s.json' % self.config["login"]["username"]) as last_location_file:
-                    location_json = json.load(last_location_file)
+            location = self.location_store.load()
+            if location is not None:
+                self.position = (location['lat'], location['lng'], location.get('alt', 0.0))
+                self.api_wrapper.set_position(*self.position)
 
-                    self.position = (location_json['lat'], location_json['lng'], 0.0)
-                    self.api_wrapper.set_position(*self.position)
+                # Pick the route up where it was left, as long as the same navigator is walking it
+                navigation = location.get('navigation', None) or {}
+                if navigation.get('navigator', None) == type(self.navigator).__name__:
+                    self.navigator.set_state(navigation.get('state', None) or {})
 
-                    self.logger.info('')
-                    self.logger.info('Last location flag used. Overriding passed in location')
-                    self.logger.info('Last in-game location was set as: {}'.format(self.position))
-                    self.logger.info('')
+                self.logger.info('')
+                self.logger.info('Last location flag used. Overriding passed in location')
+                self.logger.info('Last in-game location was set as: {}'.format(self.position))
+                self.logger.info('')
 
-                    return
-            except IOError:
-                if not self.config["mapping"]["location"]:
-                    sys.exit("No cached Location. Please specify initial location.")
+                return
+
+            if not self.config["mapping"]["location"]:
+                sys.exit("No cached Location. Please specify initial location.")
 
         # Fallback to location in configuration
         self.position = self.mapper.find_location(self.config["mapping"]["location"])
@@ -1,64 +1,248 @@
 from __future__ import print_function
+import copy
 import inspect
+import threading
 import time
+from collections import deque
+
+from six.moves import queue  # type: ignore
 
 from app import kernel
 
+# Policies for background listeners that fall behind
+DROP = 'drop'           # forget new events once the queue is full
+COALESCE = 'coalesce'   # only keep the latest pending event
+
+BACKGROUND_WORKERS = 2
+
+
+def snapshot(kwargs):
+    # type: (Dict[str, Any]) -> Dict[str, Any]
+    """
+        Deep copy of the arguments of an event for a background listener, the bot thread keeps changing the objects
+        they point to, e.g. cells and pokestops on every map refresh. The bot context is passed as it is, and so is
+        anything else that cannot be copied.
+    """
+    memo = {}
+    if kwargs.get('bot', None) is not None:
+        memo[id(kwargs['bot'])] = kwargs['bot']
+
+    copied = {}
+    for key, value in kwargs.items():
+        try:
+            copied[key] = copy.deepcopy(value, memo)
+        except (TypeError, copy.Error):
+            # Services holding locks or sockets
+            copied[key] = value
+    return copied
+
+
+class WorkerPool(object):
+    """
+        Threads that run background listeners. They are only started once the first background listener has work.
+    """
+
+    def __init__(self, logger, workers=BACKGROUND_WORKERS):
+        self.logger = logger
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def schedule(self, background_listener):
+        # type: (BackgroundListener) -> None
+        if len(self._threads) < self.workers:
+            self._start()
+        self._queue.put(background_listener)
+
+    def join(self):
+        # type: () -> None
+        """
+            Blocks until every queued event has been handled.
+        """
+        self._queue.join()
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name="EventWorker-{}".format(len(self._threads)))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            background_listener = self._queue.get()
+            try:
+                background_listener.run_next()
+            except Exception as error:  # pylint: disable=broad-except
+                self.logger.error("Background listener {} failed: {}".format(background_listener.name, error), "red")
+            finally:
+                self._queue.task_done()
+
+
+class BackgroundListener(object):
+    """
+        Queue of events for a listener that runs on the worker pool instead of the bot thread. Events for the same
+        listener are handled one at a time and in order.
+    """
+
+    def __init__(self, listener, pool, queue_size=100, policy=DROP):
+        # type: (Callable, WorkerPool, int, str) -> None
+        if policy not in (DROP, COALESCE):
+            raise ValueError('Unknown background policy "{}", expected "{}" or "{}"'.format(policy, DROP, COALESCE))
+        self.listener = listener
+        self.name = getattr(listener, '__name__', repr(listener))
+        # What actually runs, the listener wrapped by the profiler while profiling
+        self.runner = listener
+        self.pool = pool
+        self.queue_size = max(1, queue_size)
+        self.policy = policy
+        self.dropped = 0
+        self._pending = deque()
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def submit(self, kwargs):
+        # type: (Dict[str, Any]) -> None
+        with self._lock:
+            if self.policy == COALESCE:
+                self.dropped += len(self._pending)
+                self._pending.clear()
+            elif len(self._pending) >= self.queue_size:
+                self.dropped += 1
+                return
+            self._pending.append(kwargs)
+
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.pool.schedule(self)
+
+    def run_next(self):
+        # type: () -> None
+        with self._lock:
+            kwargs = self._pending.popleft()
+        try:
+            return_dict = self.runner(**kwargs)
+            if return_dict is not None:
+                self.pool.logger.warning("Background listener {} returned {!r}, background listeners cannot change or "
+                                         "cancel events".format(self.name, return_dict), "yellow")
+        finally:
+            with self._lock:
+                if len(self._pending):
+                    self.pool.schedule(self)
+                else:
+                    self._scheduled = False
+
+
 class Event(object):
 
-    def __init__(self, name, logger):
+    def __init__(self, name, logger, profiler=None):
         self.name = name
         self.logger = logger
+        self.profiler = profiler
+        # Listeners by priority, background listeners are in there as the BackgroundListener that runs them
         self.listeners = {}
         self.num_listeners = 0
+        self._plan = None
 
-    def add_listener(self, listener, priority=0):
+    def add_listener(self, listener, priority=0, background=None):
+        # type: (Callable, int, Optional[BackgroundListener]) -> None
         self.num_listeners += 1
         if priority not in self.listeners:
             self.listeners[priority] = list()
-        self.listeners[priority].append(listener)
+        self.listeners[priority].append(listener if background is None else background)
+        self._plan = None
 
     def remove_listener(self, listener):
         for priority in self.listeners:
-            self.listeners[priority].remove(listener)
+            for entry in self.listeners[priority]:
+                if self._get_listener(entry) == listener:
+                    self.listeners[priority].remove(entry)
+                    break
         self.num_listeners -= 1
+        self._plan = None
+
+    @staticmethod
+    def _get_listener(entry):
+        # type: (Union[Callable, BackgroundListener]) -> Callable
+        if isinstance(entry, BackgroundListener):
+            return entry.listener
+        return entry
+
+    def set_profiler(self, profiler):
+        self.profiler = profiler
+        self._plan = None
+
+    def compile(self):
+        """
+            Works out the order of the listeners and the arguments each of them takes once, instead of on every fire.
+            Called automatically on the first fire after listeners were added or removed; call it by hand after
+            changing the listeners dict directly.
+        """
+        plan = []
+        # Sort events by priorities from least to greatest, the last listener has the final say
+        for priority in sorted(self.listeners):
+            for entry in self.listeners[priority]:
+                listener = self._get_listener(entry)
+                # pylint: disable=deprecated-method
+                argspec = inspect.getargspec(listener)
+                if argspec.keywords is not None:
+                    # Listeners taking **kwargs get every argument
+                    arg_names = None
+                else:
+                    arg_names = tuple(arg for arg in argspec.args if arg != 'self')
+                background = entry if isinstance(entry, BackgroundListener) else None
+                if background is not None:
+                    # Profiled on the worker that runs them
+                    background.runner = listener
+                    if self.profiler is not None:
+                        background.runner = self.profiler.wrap(self.name, listener)
+                elif self.profiler is not None:
+                    listener = self.profiler.wrap(self.name, listener)
+                plan.append((listener, arg_names, background))
+        self._plan = tuple(plan)
+        return self._plan
 
     def fire(self, **kwargs):
         if self.num_listeners == 0:
             self.logger.warning("No handler has registered to handle event \"{}\"".format(self.name))
 
-        # Sort events by priorities from greatest to least
-        priorities = sorted(self.listeners, key=lambda event_priority: event_priority)
-        for priority in priorities:
-            for listener in list(self.listeners[priority]):
+        plan = self._plan
+        if plan is None:
+            plan = self.compile()
 
-                # Pass in the event name to the handler
-                kwargs["event_name"] = self.name
+        # Pass in the event name to the handler
+        kwargs["event_name"] = self.name
 
+        for listener, arg_names, background in plan:
+            if background is not None:
+                # Background listeners get a copy of the arguments, the pipeline and the bot keep changing them
+                if arg_names is None:
+                    background.submit(snapshot(kwargs))
+                else:
+                    background.submit(snapshot({key: kwargs.get(key) for key in arg_names}))
+                continue
+
+            if arg_names is None:
+                return_dict = listener(**kwargs)
+            elif not arg_names:
+                return_dict = listener()
+            else:
                 # Slice off any named arguments that the handler doesn't need
-                # pylint: disable=deprecated-method
-                argspec = inspect.getargspec(listener)
+                return_dict = listener(**{key: kwargs.get(key) for key in arg_names})
 
-                if not argspec.args:
-                    return_dict = listener()
-                else:
-                    listener_args = {}
-                    for key in argspec.args:
-                        if key == 'self':
-                            continue
-                        listener_args[key] = kwargs.get(key)
-                    return_dict = listener(**listener_args)
-
-                # If a handler returns False, this means that the event should be cancelled.
-                if return_dict is False:
-                    return False
-
-                # Update the list of arguments to be used for the next function
-                # This enables "pipeline"-like functionality - if arguments to an event handler
-                # need to be processed in some way, another handler with higher priority can be
-                # installed beforehand to do this without touching the original handler.
-                if return_dict is not None:
-                    kwargs.update(return_dict)
+            # If a handler returns False, this means that the event should be cancelled.
+            if return_dict is False:
+                return False
+
+            # Update the list of arguments to be used for the next function
+            # This enables "pipeline"-like functionality - if arguments to an event handler
+            # need to be processed in some way, another handler with higher priority can be
+            # installed beforehand to do this without touching the original handler.
+            if return_dict is not None:
+                kwargs.update(return_dict)
         return kwargs
 
     def print_event_pipeline(self):
@@ -69,7 +253,7 @@ class Event(object):
         for priority in priorities:
             if len(self.listeners[priority]) == 0:
                 continue
-            func_names = [f.__name__ for f in self.listeners[priority]]
+            func_names = [self._get_listener(entry).__name__ for entry in self.listeners[priority]]
             output.append("{} ({})".format(priority, " -> ".join(func_names)))
         if len(output) == 0:
             self.logger.debug("Event pipeline for \"{}\" is empty.".format(self.name))
@@ -77,18 +261,49 @@ class Event(object):
         self.logger.debug(" -> ".join(output) + "\n", color="yellow")
 
 
-@kernel.container.register('event_manager', ['@logger'])
+@kernel.container.register('event_manager', ['@logger', '@event_profiler'])
 class EventManager(object):
-    def __init__(self, logger):
+    def __init__(self, logger, profiler=None):
         logger.setEventManager(self)
         self.logger = logger.getLogger('EventManager')
         self.events = {}
+        self.worker_pool = WorkerPool(self.logger)
+        self.profiler = None
+        if profiler is not None and profiler.enabled:
+            self.profiler = profiler
 
     def add_listener(self, name, listener, **kwargs):
+        """
+            Listeners run on the bot thread in order of priority. Pass background=True for listeners that only
+            report on an event, like emitting it to a UI, to run them on a worker thread instead so that the bot
+            never waits for them. Background listeners cannot change or cancel the event. Each has its own queue of
+            queue_size events (default 100); policy "drop" forgets new events while the queue is full, "coalesce"
+            only keeps the latest one.
+        """
         if name not in self.events:
-            self.events[name] = Event(name, self.logger)
+            self.events[name] = Event(name, self.logger, self.profiler)
         priority = kwargs.get("priority", 0)
-        self.events[name].add_listener(listener, priority)
+        background = None
+        if kwargs.get("background", False):
+            background = BackgroundListener(listener, self.worker_pool, kwargs.get("queue_size", 100),
+                                            kwargs.get("policy", DROP))
+        self.events[name].add_listener(listener, priority, background)
+
+    def set_profiler(self, profiler):
+        # type: (Optional[EventProfiler]) -> None
+        """
+            Starts recording listener calls with the given profiler, or stops recording with None.
+        """
+        self.profiler = profiler
+        for event in self.events.values():
+            event.set_profiler(profiler)
+
+    def join_background(self):
+        # type: () -> None
+        """
+            Blocks until the background listeners have handled every event fired so far.
+        """
+        self.worker_pool.join()
 
     # Fire an event and call all event handlers.
     def fire(self, event_name, *args, **kwargs):
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+from math import asin, cos, radians, sin, sqrt
+
+import numpy                            # type: ignore
+from geopy.distance import vincenty     # type: ignore
+
+from api.geo import EARTH_RADIUS_METRES, equirectangular_distance
+
+# Uncomment to enable type annotations for Python 3
+# from typing import Any, Callable, List, Sequence
+
+# Accuracy tiers, cheapest first. Equirectangular is accurate to a few centimetres over the distances the bot
+# deals with (a cell radius), haversine is exact on a sphere and vincenty is exact on the WGS-84 ellipsoid
+# but iterates and is roughly two orders of magnitude slower.
+EQUIRECTANGULAR = 'equirectangular'
+HAVERSINE = 'haversine'
+VINCENTY = 'vincenty'
+
+ACCURACY_TIERS = (EQUIRECTANGULAR, HAVERSINE, VINCENTY)
+
+_accuracy = HAVERSINE
+
+
+def set_accuracy(accuracy):
+    # type: (str) -> None
+    global _accuracy  # pylint: disable=global-statement
+    if accuracy not in ACCURACY_TIERS:
+        raise ValueError('Unknown distance accuracy "{}", expected one of {}'.format(accuracy, ', '.join(ACCURACY_TIERS)))
+    _accuracy = accuracy
+
+
+def get_accuracy():
+    # type: () -> str
+    return _accuracy
+
+
+def distance(lat1, lng1, lat2, lng2, accuracy=None):
+    # type: (float, float, float, float, Optional[str]) -> float
+    accuracy = accuracy or _accuracy
+
+    if accuracy == VINCENTY:
+        return vincenty((lat1, lng1), (lat2, lng2)).meters
+    if accuracy == EQUIRECTANGULAR:
+        return equirectangular_distance(lat1, lng1, lat2, lng2)
+
+    phi1 = radians(lat1)
+    phi2 = radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = radians(lng2 - lng1)
+
+    h = sin(d_phi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METRES * asin(min(1.0, sqrt(h)))
+
+
+def distances(lat, lng, lats, lngs, accuracy=None):
+    # type: (float, float, Sequence[float], Sequence[float], Optional[str]) -> numpy.ndarray
+    """
+        One-to-many distances in metres from (lat, lng) to every (lats[i], lngs[i]).
+    """
+    accuracy = accuracy or _accuracy
+
+    if accuracy == VINCENTY:
+        return numpy.array([vincenty((lat, lng), (other_lat, other_lng)).meters
+                            for other_lat, other_lng in zip(lats, lngs)], dtype=numpy.float64)
+
+    phi1 = radians(lat)
+    phi2 = numpy.radians(numpy.asarray(lats, dtype=numpy.float64))
+    d_phi = phi2 - phi1
+    d_lambda = numpy.radians(numpy.asarray(lngs, dtype=numpy.float64) - lng)
+
+    if accuracy == EQUIRECTANGULAR:
+        return EARTH_RADIUS_METRES * numpy.hypot(d_lambda * numpy.cos((phi1 + phi2) / 2), d_phi)
+
+    h = numpy.sin(d_phi / 2) ** 2 + cos(phi1) * numpy.cos(phi2) * numpy.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METRES * numpy.arcsin(numpy.sqrt(numpy.minimum(h, 1.0)))
+
+
+def distances_to(lat, lng, objects, accuracy=None):
+    # type: (float, float, Sequence[Any], Optional[str]) -> numpy.ndarray
+    """
+        One-to-many distances to anything exposing latitude and longitude attributes (forts, encounters).
+    """
+    lats = [obj.latitude for obj in objects]
+    lngs = [obj.longitude for obj in objects]
+    return distances(lat, lng, lats, lngs, accuracy)
+
+
+def sort_by_distance(lat, lng, objects, accuracy=None):
+    # type: (float, float, List[Any], Optional[str]) -> List[Any]
+    if len(objects) < 2:
+        return list(objects)
+    order = numpy.argsort(distances_to(lat, lng, objects, accuracy), kind='mergesort')
+    return [objects[i] for i in order]
@@ -1,14 +1,15 @@
 # -*- coding: utf-8 -*-
 
-import time
 from math import ceil
 from random import random, randint
 
+from app.clock import get_clock
+
 
 def sleep(seconds, delta=0.3):
     jitter = ceil(delta * seconds)
     sleep_time = randint(int(seconds - jitter), int(seconds + jitter))
-    time.sleep(sleep_time)
+    get_clock().sleep(sleep_time)
 
 
 def random_lat_long_delta(factor=10):
@@ -1,52 +1,80 @@
 # -*- coding: utf-8 -*-
 
-import json
+from collections import OrderedDict
 
-from googlemaps.exceptions import ApiError
 from s2sphere import CellId, LatLng  # type: ignore
 from pgoapi.utilities import get_cell_ids
 
 from app import kernel
-from pokemongo_bot.utils import distance
+from pokemongo_bot import geo
+from pokemongo_bot.service import GeoCache, MapPrefetcher
 
 
-@kernel.container.register('mapper', ['@config.core', '@api_wrapper', '@google_maps', '@logger'])
+@kernel.container.register('mapper', ['@config.core', '@api_wrapper', '@google_maps', '@logger'], {'geo_cache': '@geo_cache', 'map_prefetcher': '@map_prefetcher'})
 class Mapper(object):
-    def __init__(self, config, api_wrapper, google_maps, logger):
-        # type: (Namespace, PoGoApi, Client) -> None
+    def __init__(self, config, api_wrapper, google_maps, logger, geo_cache=None, map_prefetcher=None):
+        # type: (Namespace, PoGoApi, Client, Logger, GeoCache, MapPrefetcher) -> None
         self.config = config
         self.api_wrapper = api_wrapper
         self.google_maps = google_maps
         self.logger = logger.getLogger('Mapper')
 
+        # Elevations and addresses looked up before are not asked for again, not even after a restart
+        self.geo_cache = geo_cache or GeoCache(config, google_maps, logger)
+
+        # Cells along the route ahead ride along with the map requests
+        self.map_prefetcher = map_prefetcher or MapPrefetcher(config, api_wrapper, logger)
+
+        # The cells covering the radius around a position, keyed by the leaf cell of the position. The cover is
+        # centred on the exact position, so a coarser key would hand out cells around somewhere else. Requests
+        # from where the player stands, e.g. while spinning or catching, reuse them. Least recently used entries go
+        # once the cache is full.
+        self.cell_cache_size = config['mapping'].get('cell_cache_size', 64)
+        self._cell_cache = OrderedDict()
+
+        # Whether the latest get_cells() got no response, its empty list does not mean the map is empty
+        self.failed = False
+
     def get_cells(self, lat, lng):
         # type: (float, float) -> List[Cell]
         cell_id = self._get_cell_id_from_latlong(
             self.config['mapping']['cell_radius']
         )
-        timestamp = [0, ] * len(cell_id)
+        prefetched = self.map_prefetcher.take(cell_id)
+        cell_id = cell_id + prefetched
+
+        # Ask only for what changed since the last time we saw each cell
+        world_map = self.get_world_map()
+        if world_map is None:
+            timestamp = [0, ] * len(cell_id)
+        else:
+            timestamp = world_map.get_cell_timestamps(cell_id)
         self.api_wrapper.get_map_objects(latitude=lat,
                                          longitude=lng,
                                          since_timestamp_ms=timestamp,
                                          cell_id=cell_id)
 
         response_dict = self.api_wrapper.call()
+        self.failed = response_dict is None
         if response_dict is None:
+            self.map_prefetcher.give_back(prefetched)
             return []
 
-        # Passing data through last-location and location
-        map_objects = response_dict["worldmap"]
-
-        with open("data/last-location-{}.json".format(self.config["login"]["username"]), "w") as outfile:
-            outfile.truncate()
-            json.dump({"lat": lat, "lng": lng}, outfile)
-
-        map_cells = map_objects.cells
+        # The prefetched cells are only kept in the world map, they are not around the player
+        prefetched = set(prefetched)
+        map_cells = [cell for cell in response_dict["worldmap"].cells if cell.cell_id not in prefetched]
         # Sort all by distance from current pos - eventually this should build graph and A* it
-        map_cells.sort(key=lambda x: distance(lat, lng, x.pokestops[0].latitude, x.pokestops[0].longitude) if len(
-            x.pokestops) > 0 else 1e6)
+        # Cells without pokestops go to the back of the list
+        cells_with_stops = [cell for cell in map_cells if len(cell.pokestops) > 0]
+        cells_without_stops = [cell for cell in map_cells if len(cell.pokestops) == 0]
+        first_stops = [cell.pokestops[0] for cell in cells_with_stops]
+        order = geo.distances_to(lat, lng, first_stops).argsort(kind='mergesort')
+
+        return [cells_with_stops[i] for i in order] + cells_without_stops
 
-        return map_cells
+    def get_world_map(self):
+        # type: () -> Optional[WorldMap]
+        return self.api_wrapper.state.get_state().get("worldmap", None)
 
     def find_location(self, location):
         # type: (str) -> Tuple[float, float, float]
@@ -60,28 +88,33 @@ class Mapper(object):
                 pos_lng = float(parts[1])
 
                 # we need to ask google for the altitude
-                response = self.google_maps.elevation((pos_lat, pos_lng))
+                altitude = self.geo_cache.get_elevation(pos_lat, pos_lng)
+                if altitude is not None:
+                    return pos_lat, pos_lng, altitude
 
-                if response is not None and len(response) and "elevation" in response[0]:
-                    return pos_lat, pos_lng, response[0]["elevation"]
-                else:
-                    raise ValueError
-            except ApiError:
                 self.logger.warning("Could not fetch altitude from google. Trying geolocator.", color='yellow')
             except ValueError:
                 self.logger.warning("Location was not Lat/Lng. Trying geolocator.", color='yellow')
 
         # Fallback to geolocation if no Lat/Lng can be found
-        loc = self.google_maps.geocode(location)
-
-        return loc.latitude, loc.longitude, loc.altitude
+        return self.geo_cache.geocode(location)
 
     def _get_cell_id_from_latlong(self, radius=1000):
         # type: (Optional[int]) -> List[str]
         position_lat, position_lng, _ = self.api_wrapper.get_position()
 
+        key = (CellId.from_lat_lng(LatLng.from_degrees(position_lat, position_lng)).id(), radius)
+        cells = self._cell_cache.pop(key, None)
+        if cells is not None:
+            self._cell_cache[key] = cells
+            return cells
+
         cells = get_cell_ids(position_lat, position_lng, radius)
+        while len(self._cell_cache) >= self.cell_cache_size:
+            self._cell_cache.popitem(last=False)
+        self._cell_cache[key] = cells
 
+        # Only logged when the cells change
         if self.config['debug']:
             self.logger.debug('Cells:', color='yellow')
             self.logger.debug('Origin: {},{}'.format(position_lat, position_lng), color='yellow')
@@ -4,11 +4,11 @@ from pokemongo_bot.navigation.destination import Destination
 from pokemongo_bot.navigation.navigator import Navigator
 
 
-@kernel.container.register('camper_navigator', ['@config.core', '@api_wrapper', '@logger'])
+@kernel.container.register('camper_navigator', ['@config.core', '@api_wrapper', '@logger'], {'geo_cache': '@geo_cache'})
 class CamperNavigator(Navigator):
-    def __init__(self, config, api_wrapper, logger):
-        # type: (Namespace, PoGoApi, Logger) -> None
-        super(CamperNavigator, self).__init__(config, api_wrapper)
+    def __init__(self, config, api_wrapper, logger, geo_cache=None):
+        # type: (Namespace, PoGoApi, Logger, GeoCache) -> None
+        super(CamperNavigator, self).__init__(config, api_wrapper, geo_cache)
 
         self.camping_sites = []
         self.logger = logger.getLogger('Camper')
@@ -27,7 +27,7 @@ class CamperNavigator(Navigator):
 
         try:
             lat, lng = self.camping_sites[self.pointer]
-            position = (lat, lng, 0.0)
+            position = (lat, lng, self.get_altitude(lat, lng))
 
             yield Destination(*position, name="Camping position at {},{}".format(lat, lng), exact_location=True)
 
@@ -35,6 +35,17 @@ class CamperNavigator(Navigator):
         except IndexError:
             self.logger.critical("No campsite location found")
 
+    def get_state(self):
+        # type: () -> Dict[str, Any]
+        return {"pointer": self.pointer, "camping_sites": self.camping_sites}
+
+    def set_state(self, state):
+        # type: (Dict[str, Any]) -> None
+        camping_sites = state.get("camping_sites", None)
+        if camping_sites:
+            self.camping_sites = [(float(lat), float(lng)) for lat, lng in camping_sites]
+            self.pointer = min(state.get("pointer", 0), len(self.camping_sites) - 1)
+
     def set_campsite(self, longitude, latitude):
         # type: (float, float) -> None
         self.camping_sites.append((longitude, latitude))
@@ -1,38 +1,54 @@
 from app import kernel
 from pokemongo_bot.navigation.destination import Destination
 from pokemongo_bot.navigation.navigator import Navigator
-from pokemongo_bot.utils import distance
+from pokemongo_bot.navigation.route_planner import RoutePlanner
+from pokemongo_bot.service.fort_details import FortDetails
 
 
-@kernel.container.register('fort_navigator', ['@config.core', '@api_wrapper'])
+@kernel.container.register('fort_navigator', ['@config.core', '@api_wrapper', '@fort_details_service'])
 class FortNavigator(Navigator):
-    def navigate(self, map_cells):
-        # type: (List[Cell]) -> List([Destination])
+    def __init__(self, config, api_wrapper, fort_details=None):
+        # type: (Namespace, PoGoApi, Optional[FortDetails]) -> None
+        super(FortNavigator, self).__init__(config, api_wrapper)
+        self.fort_details = fort_details or FortDetails(config, api_wrapper)
 
-        for cell in map_cells:
-            pokestops = [pokestop for pokestop in cell.pokestops if
-                         pokestop.latitude is not None and pokestop.longitude is not None]
-            # gyms = [gym for gym in cell['forts'] if 'gym_points' in gym]
+        walk_speed = self.config['movement']['walk_speed']
+        if walk_speed is None or walk_speed <= 0:
+            walk_speed = 4.16
+        self.route_planner = RoutePlanner(walk_speed, self.config['movement'].get('route_planning_time', 0.5))
 
-            # Sort all by distance from current pos- eventually this should
-            # build graph & A* it
-            current_lat, current_lng, _ = self.api_wrapper.get_position()
-            pokestops.sort(key=lambda x, lat=current_lat, lng=current_lng: distance(lat, lng, x.latitude, x.longitude))
+        # Stops further away are left for a later plan, 0 plans through every stop we know of
+        self.route_radius = self.config['movement'].get('route_radius', 1000)
 
-            for fort in pokestops:
+    def navigate(self, map_cells):
+        # type: (List[Cell]) -> List([Destination])
+
+        current_lat, current_lng, _ = self.api_wrapper.get_position()
+        self.route_planner.plan(current_lat, current_lng, self._get_pokestops(map_cells, current_lat, current_lng))
 
-                response_dict = self.api_wrapper.fort_details(
-                    fort_id=fort.fort_id,
-                    latitude=fort.latitude,
-                    longitude=fort.longitude
-                ).call()
+        while True:
+            fort = self.route_planner.pop()
+            if fort is None:
+                return
 
-                if response_dict is None:
-                    fort_name = fort.fort_id
-                else:
-                    fort_name = response_dict["fort"].fort_name
+            fort_name = self.fort_details.get_name(fort)
 
-                if isinstance(fort_name, bytes):
-                    fort_name = fort_name.decode()
+            yield Destination(fort.latitude, fort.longitude, 0.0, name="PokeStop \"{}\"".format(fort_name))
 
-                yield Destination(fort.latitude, fort.longitude, 0.0, name="PokeStop \"{}\"".format(fort_name))
+            # Stops discovered while walking are merged into the rest of the route
+            current_lat, current_lng, _ = self.api_wrapper.get_position()
+            self.route_planner.update(current_lat, current_lng,
+                                      self._get_pokestops(map_cells, current_lat, current_lng))
+
+    def _get_pokestops(self, map_cells, lat, lng):
+        # type: (List[Cell], float, float) -> List[PokeStop]
+        world_map = self.api_wrapper.state.get_state().get("worldmap", None)
+        if world_map is not None:
+            if not self.route_radius:
+                return world_map.get_pokestops()
+            return [pokestop for pokestop, _ in world_map.pokestops_within(lat, lng, self.route_radius)]
+
+        pokestops = []
+        for cell in map_cells:
+            pokestops += cell.pokestops
+        return pokestops
@@ -3,17 +3,17 @@ from pokemongo_bot.navigation.destination import Destination
 from pokemongo_bot.navigation.navigator import Navigator
 
 
-@kernel.container.register('go_there_navigator', ['@config.core', '@api_wrapper'])
+@kernel.container.register('go_there_navigator', ['@config.core', '@api_wrapper'], {'geo_cache': '@geo_cache'})
 class GoThereNavigator(Navigator):
-    def __init__(self, config, api_wrapper):
-        # type: (Namespace, PoGoApi) -> None
-        super(GoThereNavigator, self).__init__(config, api_wrapper)
+    def __init__(self, config, api_wrapper, geo_cache=None):
+        # type: (Namespace, PoGoApi, GeoCache) -> None
+        super(GoThereNavigator, self).__init__(config, api_wrapper, geo_cache)
 
         self.position = None
 
     def set_destination(self, lat, lng):
-        # TODO get altitude?
-        self.position = (lat, lng, 0)
+        # type: (float, float) -> None
+        self.position = (lat, lng, self.get_altitude(lat, lng))
 
     def navigate(self, map_cells):
         # type: (List[Cell]) -> List[Destination]
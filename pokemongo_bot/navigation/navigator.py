@@ -3,11 +3,30 @@ class Navigator(object):
         Abstract class for a navigator
     """
 
-    def __init__(self, config, api_wrapper):
-        # type: (Namespace, PoGoApi) -> None
+    def __init__(self, config, api_wrapper, geo_cache=None):
+        # type: (Namespace, PoGoApi, GeoCache) -> None
         self.config = config
         self.api_wrapper = api_wrapper
+        self.geo_cache = geo_cache
+
+    def get_altitude(self, lat, lng):
+        # type: (float, float) -> float
+        if self.geo_cache is None:
+            return 0.0
+        altitude = self.geo_cache.get_elevation(lat, lng)
+        return 0.0 if altitude is None else altitude
 
     def navigate(self, map_cells):  # pragma: no cover
         # type: (List[Cell]) -> List[Direction]
         raise NotImplementedError
+
+    def get_state(self):
+        # type: () -> Dict[str, Any]
+        """
+            What the navigator needs to pick up where it left off after a restart, must be JSON serializable.
+        """
+        return {}
+
+    def set_state(self, state):
+        # type: (Dict[str, Any]) -> None
+        pass
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+
+from math import cos, hypot, radians, sqrt
+import time
+
+import numpy  # type: ignore
+
+from app.clock import get_clock
+from pokemongo_bot.geo import EARTH_RADIUS_METRES
+
+# Uncomment to enable type annotations for Python 3
+# from typing import List, Optional, Tuple
+# from api.worldmap import PokeStop
+
+
+class RoutePlanner(object):
+    """
+        Plans the order in which to visit pokestops so that the bot spends as little time as possible walking
+        between spins.
+
+        A cooldown-aware nearest neighbour tour is improved with 2-opt and Or-opt moves until the time budget
+        runs out. Stops that would still be on cooldown when the bot reaches them are deferred to the next plan.
+        New stops can be merged into an existing route without planning from scratch.
+    """
+
+    # How many nearest neighbours each stop considers for improvement moves
+    NEIGHBOURS = 8
+
+    # Longest run of consecutive stops Or-opt tries to move
+    MAX_SEGMENT = 3
+
+    # Seconds spent at each stop (fort details, spinning and looting)
+    SPIN_DURATION = 6.0
+
+    def __init__(self, walk_speed=4.16, time_budget=0.5):
+        # type: (float, float) -> None
+        self.walk_speed = walk_speed
+        self.time_budget = time_budget
+
+        self.route = []
+        self._visited = set()
+        self._deferred = set()
+
+    def plan(self, lat, lng, pokestops, now=None):
+        # type: (float, float, List[PokeStop], Optional[float]) -> List[PokeStop]
+        """
+            Plan a new route from (lat, lng) through the given pokestops.
+        """
+        now = get_clock().time() if now is None else now
+        # The time budget is spent on this machine's CPU, so it is measured in wall clock time
+        deadline = time.time() + self.time_budget
+
+        self._visited = set()
+        self._deferred = set()
+
+        stops = [stop for stop in pokestops if stop.latitude is not None and stop.longitude is not None]
+        if len(stops) == 0:
+            self.route = []
+            return []
+
+        xs, ys = self._project(lat, lng, stops)
+        neighbours = self._neighbours(xs, ys)
+        path = self._nearest_neighbour(xs, ys, stops, neighbours, now)
+        path = self._improve(xs, ys, path, neighbours, deadline)
+
+        self.route = self._schedule(xs, ys, [stops[node] for node in path[1:]], path, now)
+        return list(self.route)
+
+    def update(self, lat, lng, pokestops, now=None):
+        # type: (float, float, List[PokeStop], Optional[float]) -> List[PokeStop]
+        """
+            Merge pokestops that are not on the route yet into it, starting from the current position. Stops
+            already visited or deferred during this plan are left alone.
+        """
+        now = get_clock().time() if now is None else now
+        deadline = time.time() + self.time_budget / 10
+
+        on_route = set(stop.fort_id for stop in self.route)
+        new_stops = [stop for stop in pokestops
+                     if stop.fort_id not in on_route and stop.fort_id not in self._visited and
+                     stop.fort_id not in self._deferred and stop.latitude is not None and stop.longitude is not None]
+        if len(new_stops) == 0:
+            return list(self.route)
+
+        stops = self.route + new_stops
+        xs, ys = self._project(lat, lng, stops)
+
+        start = len(stops)
+        path = [start] + list(range(len(self.route)))
+        for node in range(len(self.route), len(stops)):
+            self._insert_cheapest(xs, ys, path, node)
+        path = self._improve(xs, ys, path, self._neighbours(xs, ys), deadline)
+
+        self.route = self._schedule(xs, ys, [stops[node] for node in path[1:]], path, now)
+        return list(self.route)
+
+    def pop(self):
+        # type: () -> Optional[PokeStop]
+        """
+            Take the next stop off the route.
+        """
+        if len(self.route) == 0:
+            return None
+        stop = self.route.pop(0)
+        self._visited.add(stop.fort_id)
+        return stop
+
+    def route_length(self, lat, lng):
+        # type: (float, float) -> float
+        """
+            Walking distance in metres from (lat, lng) along the current route.
+        """
+        if len(self.route) == 0:
+            return 0.0
+        xs, ys = self._project(lat, lng, self.route)
+        path = [len(self.route)] + list(range(len(self.route)))
+        return self._path_length(xs, ys, path)
+
+    def spins_per_hour(self, lat, lng):
+        # type: (float, float) -> float
+        if len(self.route) == 0:
+            return 0.0
+        duration = self.route_length(lat, lng) / self.walk_speed + len(self.route) * self.SPIN_DURATION
+        return len(self.route) * 3600.0 / duration
+
+    @staticmethod
+    def _project(lat, lng, stops):
+        # type: (float, float, List[PokeStop]) -> Tuple[List[float], List[float]]
+        # Local equirectangular projection in metres around the current position, which is appended as
+        # the last node so that it can be the fixed start of every path
+        lng_scale = cos(radians(lat))
+        xs = [EARTH_RADIUS_METRES * radians(stop.longitude - lng) * lng_scale for stop in stops] + [0.0]
+        ys = [EARTH_RADIUS_METRES * radians(stop.latitude - lat) for stop in stops] + [0.0]
+        return xs, ys
+
+    @staticmethod
+    def _path_length(xs, ys, path):
+        # type: (List[float], List[float], List[int]) -> float
+        length = 0.0
+        for i in range(len(path) - 1):
+            length += hypot(xs[path[i]] - xs[path[i + 1]], ys[path[i]] - ys[path[i + 1]])
+        return length
+
+    def _nearest_neighbour(self, xs, ys, stops, neighbours, now):
+        # type: (List[float], List[float], List[PokeStop], List[List[int]], float) -> List[int]
+        # Greedy tour where the cost of the next stop is the time until it can be spun: walking there, or
+        # waiting for its cooldown if that takes longer. Only the nearest neighbours are candidates, every
+        # remaining stop is looked at when all of them have been visited already.
+        count = len(stops)
+        ready = [(stop.cooldown_timestamp_ms or 0) / 1000.0 for stop in stops]
+        x = numpy.array(xs[:count])
+        y = numpy.array(ys[:count])
+        ready_array = numpy.array(ready)
+        remaining = numpy.ones(count, dtype=bool)
+
+        path = [count]
+        current, clock = count, now
+        for _ in range(count):
+            best, best_time = None, None
+            for node in neighbours[current]:
+                if node == count or not remaining[node]:
+                    continue
+                arrival = clock + hypot(xs[node] - xs[current], ys[node] - ys[current]) / self.walk_speed
+                spin_time = max(arrival, ready[node])
+                if best is None or spin_time < best_time:
+                    best, best_time = node, spin_time
+
+            if best is None:
+                arrival = clock + numpy.hypot(x - xs[current], y - ys[current]) / self.walk_speed
+                spin_times = numpy.where(remaining, numpy.maximum(arrival, ready_array), numpy.inf)
+                best = int(spin_times.argmin())
+                best_time = spin_times[best]
+
+            remaining[best] = False
+            path.append(best)
+            clock = best_time + self.SPIN_DURATION
+            current = best
+
+        return path
+
+    def _neighbours(self, xs, ys):
+        # type: (List[float], List[float]) -> List[List[int]]
+        # Approximate k nearest neighbours of every node. Nodes are bucketed into a grid holding about k nodes
+        # per 3x3 block, and only the block around a bucket is searched.
+        x = numpy.array(xs)
+        y = numpy.array(ys)
+        count = len(xs)
+        k = min(self.NEIGHBOURS, count - 1)
+        if k <= 0:
+            return [[] for _ in range(count)]
+
+        # The grid spans the stops only, the start node (last) is clamped onto it in case it is far away
+        min_x, max_x = float(x[:-1].min()), float(x[:-1].max())
+        min_y, max_y = float(y[:-1].min()), float(y[:-1].max())
+        size = max(sqrt(max((max_x - min_x) * (max_y - min_y), 1.0) * k / count), 1.0)
+        bucket_x = ((numpy.clip(x, min_x, max_x) - min_x) // size).astype(int).tolist()
+        bucket_y = ((numpy.clip(y, min_y, max_y) - min_y) // size).astype(int).tolist()
+
+        buckets = {}
+        for node in range(count):
+            buckets.setdefault((bucket_x[node], bucket_y[node]), []).append(node)
+
+        everything = numpy.arange(count)
+        neighbours = [None] * count
+        for (column, row), members in buckets.items():
+            candidates = []
+            for other_column in (column - 1, column, column + 1):
+                for other_row in (row - 1, row, row + 1):
+                    candidates += buckets.get((other_column, other_row), [])
+            candidates = numpy.array(candidates) if len(candidates) > k else everything
+
+            members = numpy.array(members)
+            block = numpy.hypot(x[members, None] - x[None, candidates], y[members, None] - y[None, candidates])
+            block[members[:, None] == candidates[None, :]] = numpy.inf
+
+            rows = numpy.arange(len(members))[:, None]
+            nearest = numpy.argpartition(block, k - 1, axis=1)[:, :k]
+            nearest = nearest[rows, block[rows, nearest].argsort(axis=1)]
+            for member, nodes in zip(members.tolist(), candidates[nearest].tolist()):
+                neighbours[member] = nodes
+        return neighbours
+
+    def _improve(self, xs, ys, path, neighbours, deadline):
+        # type: (List[float], List[float], List[int], List[List[int]], float) -> List[int]
+        if len(path) < 4:
+            return path
+
+        improved = True
+        while improved and time.time() < deadline:
+            improved = self._two_opt(xs, ys, path, neighbours, deadline)
+            improved = self._or_opt(xs, ys, path, neighbours, deadline) or improved
+        return path
+
+    @staticmethod
+    def _two_opt(xs, ys, path, neighbours, deadline):
+        # type: (List[float], List[float], List[int], List[List[int]], float) -> bool
+        # Open path with a fixed start: reversing path[i + 1..j] swaps edges (a, b) and (c, d) for (a, c)
+        # and (b, d). A missing d means the reversed run ends the path.
+        def dist(u, v):
+            return hypot(xs[u] - xs[v], ys[u] - ys[v])
+
+        position = [0] * len(path)
+        for index, node in enumerate(path):
+            position[node] = index
+
+        improved = False
+        last = len(path) - 1
+        for i in range(last):
+            if time.time() > deadline:
+                break
+            a = path[i]
+            b = path[i + 1]
+            d_ab = dist(a, b)
+            for c in neighbours[a]:
+                j = position[c]
+                if j <= i + 1:
+                    continue
+                if j < last:
+                    d = path[j + 1]
+                    delta = dist(a, c) + dist(b, d) - d_ab - dist(c, d)
+                else:
+                    delta = dist(a, c) - d_ab
+                if delta < -1e-7:
+                    path[i + 1:j + 1] = path[i + 1:j + 1][::-1]
+                    for index in range(i + 1, j + 1):
+                        position[path[index]] = index
+                    improved = True
+                    break
+        return improved
+
+    def _or_opt(self, xs, ys, path, neighbours, deadline):
+        # type: (List[float], List[float], List[int], List[List[int]], float) -> bool
+        # Move a run of up to MAX_SEGMENT stops, possibly reversed, between two other stops
+        def dist(u, v):
+            if u is None or v is None:
+                return 0.0
+            return hypot(xs[u] - xs[v], ys[u] - ys[v])
+
+        position = {}
+        for index, node in enumerate(path):
+            position[node] = index
+
+        improved = False
+        i = 1
+        while i < len(path):
+            if time.time() > deadline:
+                break
+            moved = False
+            for length in range(1, self.MAX_SEGMENT + 1):
+                if i + length > len(path):
+                    break
+                first = path[i]
+                last = path[i + length - 1]
+                before = path[i - 1]
+                after = path[i + length] if i + length < len(path) else None
+                gain = dist(before, first) + dist(last, after) - dist(before, after)
+                if gain <= 1e-7:
+                    continue
+
+                segment = set(path[i:i + length])
+                for c in neighbours[first] + neighbours[last]:
+                    if c in segment or c == before:
+                        continue
+                    j = position[c]
+                    c_next = path[j + 1] if j + 1 < len(path) else None
+                    if c_next in segment:
+                        continue
+                    forward = dist(c, first) + dist(last, c_next) - dist(c, c_next)
+                    backward = dist(c, last) + dist(first, c_next) - dist(c, c_next)
+                    if min(forward, backward) < gain - 1e-7:
+                        run = path[i:i + length]
+                        if backward < forward:
+                            run.reverse()
+                        del path[i:i + length]
+                        j = path.index(c)
+                        path[j + 1:j + 1] = run
+                        for index in range(min(i, j + 1), len(path)):
+                            position[path[index]] = index
+                        moved = True
+                        break
+                if moved:
+                    break
+            if moved:
+                improved = True
+            else:
+                i += 1
+        return improved
+
+    @staticmethod
+    def _insert_cheapest(xs, ys, path, node):
+        # type: (List[float], List[float], List[int], int) -> None
+        def dist(u, v):
+            return hypot(xs[u] - xs[v], ys[u] - ys[v])
+
+        best_index = len(path)
+        best_cost = dist(path[-1], node)
+        for index in range(1, len(path)):
+            cost = dist(path[index - 1], node) + dist(node, path[index]) - dist(path[index - 1], path[index])
+            if cost < best_cost:
+                best_cost = cost
+                best_index = index
+        path.insert(best_index, node)
+
+    def _schedule(self, xs, ys, route, path, now):
+        # type: (List[float], List[float], List[PokeStop], List[int], float) -> List[PokeStop]
+        # Walk the route in time and defer stops that would still be on cooldown when we get there
+        scheduled = []
+        clock = now
+        previous = path[0]
+        for stop, node in zip(route, path[1:]):
+            arrival = clock + hypot(xs[previous] - xs[node], ys[previous] - ys[node]) / self.walk_speed
+            if stop.cooldown_timestamp_ms is not None and stop.cooldown_timestamp_ms / 1000.0 > arrival:
+                self._deferred.add(stop.fort_id)
+                continue
+            scheduled.append(stop)
+            clock = arrival + self.SPIN_DURATION
+            previous = node
+        return scheduled
@@ -3,11 +3,11 @@ from pokemongo_bot.navigation.destination import Destination
 from pokemongo_bot.navigation.navigator import Navigator
 
 
-@kernel.container.register('waypoint_navigator', ['@config.core', '@api_wrapper'])
+@kernel.container.register('waypoint_navigator', ['@config.core', '@api_wrapper'], {'geo_cache': '@geo_cache'})
 class WaypointNavigator(Navigator):
-    def __init__(self, config, api_wrapper):
-        # type: (Namespace, PoGoApi) -> None
-        super(WaypointNavigator, self).__init__(config, api_wrapper)
+    def __init__(self, config, api_wrapper, geo_cache=None):
+        # type: (Namespace, PoGoApi, GeoCache) -> None
+        super(WaypointNavigator, self).__init__(config, api_wrapper, geo_cache)
 
         self.waypoints = config['movement']['navigator_waypoints']
         self.pointer = 0
@@ -22,7 +22,7 @@ class WaypointNavigator(Navigator):
                 continue
 
             if len(waypoint) == 2:
-                waypoint.append(0.0)
+                waypoint.append(self.get_altitude(*waypoint))
 
             lat, lng, alt = waypoint
             yield Destination(lat, lng, alt, name="Waypoint at {},{}".format(lat, lng))
@@ -31,6 +31,16 @@ class WaypointNavigator(Navigator):
 
         self.pointer = 0
 
+    def get_state(self):
+        # type: () -> Dict[str, Any]
+        return {"pointer": self.pointer}
+
+    def set_state(self, state):
+        # type: (Dict[str, Any]) -> None
+        pointer = state.get("pointer", 0)
+        if 0 <= pointer < len(self.waypoints):
+            self.pointer = pointer
+
     def waypoint_add(self, longitude, latitude):
         # type: (float, float) -> None
         self.waypoints.append([longitude, latitude])
@@ -1,3 +1,10 @@
 
 from pokemongo_bot.service.player import Player
 from pokemongo_bot.service.pokemon import Pokemon
+from pokemongo_bot.service.fort_details import FortDetails
+from pokemongo_bot.service.event_profiler import EventProfiler
+from pokemongo_bot.service.scheduler import Scheduler
+from pokemongo_bot.service.map_refresh import MapRefreshPolicy
+from pokemongo_bot.service.map_prefetcher import MapPrefetcher
+from pokemongo_bot.service.location_store import LocationStore
+from pokemongo_bot.service.geo_cache import GeoCache
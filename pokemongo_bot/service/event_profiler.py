@@ -0,0 +1,164 @@
+import os
+import signal
+import threading
+from collections import deque
+from timeit import default_timer
+
+from app import kernel
+from pokemongo_bot.utils import save_json
+
+
+@kernel.container.register('event_profiler', ['@config.core', '@logger'])
+class EventProfiler(object):
+    """
+        Records how often and how long every listener runs, per event, plus a trace of the latest listener calls
+        that chrome://tracing can show on a timeline. The event manager only wraps listeners while profiling is
+        enabled, so it costs nothing otherwise. Listeners run on the bot thread and the background workers while the
+        numbers are read from the socket server or after a signal, hence the lock.
+    """
+
+    SAMPLES = 1000
+
+    def __init__(self, config, logger):
+        # type: (Namespace, Logger) -> None
+        self.logger = logger.getLogger('Profiler')
+
+        profiling = config.get('profiling', None) or {}
+        self.enabled = profiling.get('events', False)
+        self.trace_size = profiling.get('trace_size', 10000)
+        username = config['login']['username']
+        # Dumped from a signal-spawned thread or the socket server, wherever the working directory is by then
+        self.profile_file = os.path.abspath('data/event-profile-{}.json'.format(username))
+        self.trace_file = os.path.abspath('data/event-trace-{}.json'.format(username))
+
+        self._stats = {}
+        self._trace = deque(maxlen=self.trace_size)
+        self._started = default_timer()
+        self._lock = threading.Lock()
+        self._dump_lock = threading.Lock()
+
+        # kill -USR1 <pid> writes the profile and trace files
+        if self.enabled and profiling.get('dump_signal', True) and hasattr(signal, 'SIGUSR1'):
+            try:
+                signal.signal(signal.SIGUSR1, self._on_dump_signal)
+            except ValueError:
+                # Signal handlers can only be installed from the main thread
+                pass
+
+    def _on_dump_signal(self, signum, frame):  # pylint: disable=unused-argument
+        # Signal handlers run on the main thread, which might be holding the lock in record() right now
+        dumper = threading.Thread(target=self.dump, name='EventProfilerDump')
+        dumper.daemon = True
+        dumper.start()
+
+    @staticmethod
+    def get_listener_name(listener):
+        # type: (Callable) -> str
+        owner = getattr(listener, '__self__', None)
+        name = getattr(listener, '__name__', repr(listener))
+        if owner is not None:
+            return '{}.{}'.format(type(owner).__name__, name)
+        return name
+
+    def wrap(self, event_name, listener):
+        # type: (str, Callable) -> Callable
+        """
+            Listener that records every call of the given one. Called by Event when it compiles its dispatch plan.
+        """
+        listener_name = self.get_listener_name(listener)
+
+        def profiled(*args, **kwargs):
+            cancelled = False
+            started = default_timer()
+            try:
+                return_dict = listener(*args, **kwargs)
+                cancelled = return_dict is False
+                return return_dict
+            finally:
+                self.record(event_name, listener_name, started, default_timer() - started, cancelled)
+
+        profiled.__name__ = getattr(listener, '__name__', listener_name)
+        return profiled
+
+    def record(self, event_name, listener_name, started, duration, cancelled=False):
+        # type: (str, str, float, float, bool) -> None
+        with self._lock:
+            key = (event_name, listener_name)
+            stats = self._stats.get(key, None)
+            if stats is None:
+                stats = {"calls": 0, "total": 0.0, "max": 0.0, "cancelled": 0, "samples": deque(maxlen=self.SAMPLES)}
+                self._stats[key] = stats
+            stats["calls"] += 1
+            stats["total"] += duration
+            stats["max"] = max(stats["max"], duration)
+            stats["samples"].append(duration)
+            if cancelled:
+                stats["cancelled"] += 1
+            self._trace.append((event_name, listener_name, started, duration, threading.current_thread().ident))
+
+    def reset(self):
+        # type: () -> None
+        with self._lock:
+            self._stats = {}
+            self._trace.clear()
+
+    def get_stats(self):
+        # type: () -> Dict[str, Dict[str, Dict[str, float]]]
+        """
+            Calls, cancellations and latencies in milliseconds (total, mean, 50th, 95th and 99th percentile of the
+            latest calls and max) per event and listener.
+        """
+        with self._lock:
+            stats = [(key, dict(value, samples=sorted(value["samples"]))) for key, value in self._stats.items()]
+
+        result = {}
+        for (event_name, listener_name), listener_stats in stats:
+            samples = listener_stats["samples"]
+            result.setdefault(event_name, {})[listener_name] = {
+                "calls": listener_stats["calls"],
+                "cancelled": listener_stats["cancelled"],
+                "total_ms": listener_stats["total"] * 1000,
+                "mean_ms": listener_stats["total"] * 1000 / listener_stats["calls"],
+                "p50_ms": self._percentile(samples, 0.5) * 1000,
+                "p95_ms": self._percentile(samples, 0.95) * 1000,
+                "p99_ms": self._percentile(samples, 0.99) * 1000,
+                "max_ms": listener_stats["max"] * 1000
+            }
+        return result
+
+    @staticmethod
+    def _percentile(samples, percentile):
+        # type: (List[float], float) -> float
+        if not len(samples):
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * percentile))]
+
+    def get_chrome_trace(self):
+        # type: () -> Dict[str, Any]
+        """
+            The latest listener calls in the Chrome trace event format, load it in chrome://tracing.
+        """
+        with self._lock:
+            trace = list(self._trace)
+
+        pid = os.getpid()
+        return {
+            "traceEvents": [{
+                "name": listener_name,
+                "cat": event_name,
+                "ph": "X",
+                "ts": (started - self._started) * 1e6,
+                "dur": duration * 1e6,
+                "pid": pid,
+                "tid": thread
+            } for event_name, listener_name, started, duration, thread in trace],
+            "displayTimeUnit": "ms"
+        }
+
+    def dump(self):
+        # type: () -> None
+        # The files are replaced atomically, so whoever reads them never sees half of one
+        with self._dump_lock:
+            save_json(self.profile_file, self.get_stats(), indent=2, sort_keys=True)
+            save_json(self.trace_file, self.get_chrome_trace())
+        self.logger.info('Wrote event profile to {} and trace to {}'.format(self.profile_file, self.trace_file))
@@ -0,0 +1,178 @@
+import atexit
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from app import kernel
+from app.clock import get_clock
+from pokemongo_bot.utils import save_json
+
+
+@kernel.container.register('fort_details_service', ['@config.core', '@api_wrapper'], {'logger': '@logger'})
+class FortDetails(object):
+    """
+        Per fort id cache of FORT_DETAILS results (name and position). Entries expire after a TTL, the least
+        recently used ones are evicted once the cache is full, and the cache can be persisted so names survive
+        restarts. New entries are saved from a background thread at most once every save interval, and once more
+        when the bot exits. The socket server reads it from its own thread, hence the lock.
+    """
+
+    def __init__(self, config, api_wrapper, logger=None):
+        # type: (Namespace, PoGoApi, Optional[Logger]) -> None
+        self._config = config
+        self._api_wrapper = api_wrapper
+        self._logger = logger.getLogger('PokeStop') if logger is not None else None
+
+        mapping = config['mapping']
+        self.ttl = mapping.get('fort_details_ttl', 86400)
+        self.max_size = mapping.get('fort_details_cache_size', 1000)
+        self.save_interval = mapping.get('fort_details_save_interval', 30)
+        self.cache_file = None
+        if mapping.get('fort_details_persist', False):
+            self.cache_file = os.path.abspath('data/fort-details-{}.json'.format(config['login']['username']))
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Changes made and changes saved, the writer thread only saves when they differ
+        self._version = 0
+        self._saved = 0
+        self._changed = threading.Event()
+        self._closed = threading.Event()
+        self._save_lock = threading.Lock()
+        self._writer = None
+
+        self.load()
+
+    def get(self, fort):
+        # type: (Fort) -> Optional[Dict[str, Any]]
+        """
+            Details of a fort, only asking the server when they are not cached or have expired.
+        """
+        details = self.peek(fort.fort_id)
+        if details is not None:
+            return details
+
+        response_dict = self._api_wrapper.fort_details(
+            fort_id=fort.fort_id,
+            latitude=fort.latitude,
+            longitude=fort.longitude
+        ).call()
+        if response_dict is None:
+            return None
+
+        fort_name = response_dict["fort"].fort_name
+        if isinstance(fort_name, bytes):
+            fort_name = fort_name.decode()
+
+        details = {
+            "fort_id": fort.fort_id,
+            "name": fort_name,
+            "latitude": fort.latitude,
+            "longitude": fort.longitude,
+            "fetched_at": get_clock().time()
+        }
+        with self._lock:
+            # peek() already dropped any expired entry, so this lands at the most recently used end
+            self._cache[fort.fort_id] = details
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+            self._version += 1
+        self._schedule_save()
+
+        return details
+
+    def get_name(self, fort):
+        # type: (Fort) -> str
+        details = self.get(fort)
+        if details is None:
+            return fort.fort_id
+        return details["name"]
+
+    def peek(self, fort_id):
+        # type: (str) -> Optional[Dict[str, Any]]
+        """
+            Cached details of a fort, never asks the server.
+        """
+        with self._lock:
+            details = self._cache.pop(fort_id, None)
+            if details is None or details["fetched_at"] + self.ttl < get_clock().time():
+                return None
+            # Re-inserting marks it as the most recently used
+            self._cache[fort_id] = details
+            return details
+
+    def load(self):
+        if self.cache_file is None or not os.path.isfile(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file) as cache_file:
+                entries = json.load(cache_file)
+        except ValueError:
+            return
+
+        now = get_clock().time()
+        with self._lock:
+            for details in sorted(entries, key=lambda entry: entry["fetched_at"]):
+                if details["fetched_at"] + self.ttl >= now:
+                    self._cache[details["fort_id"]] = details
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def save(self):
+        if self.cache_file is None:
+            return
+
+        with self._save_lock:
+            with self._lock:
+                entries = list(self._cache.values())
+                version = self._version
+            save_json(self.cache_file, entries)
+            self._saved = version
+
+    def close(self):
+        # type: () -> None
+        """
+            Stops the writer thread and saves what it did not get to yet.
+        """
+        self._closed.set()
+        self._changed.set()
+        if self._writer is not None:
+            self._writer.join()
+        self._save_changes()
+
+    def _schedule_save(self):
+        # type: () -> None
+        if self.cache_file is None:
+            return
+        with self._lock:
+            if self._writer is None and not self._closed.is_set():
+                self._writer = threading.Thread(target=self._write_changes, name='FortDetails')
+                self._writer.daemon = True
+                self._writer.start()
+                atexit.register(self._save_changes)
+        self._changed.set()
+
+    def _save_changes(self):
+        # type: () -> None
+        if self._saved == self._version:
+            return
+        try:
+            self.save()
+        except (IOError, OSError, TypeError, ValueError) as error:
+            # Names are fetched again when they are missing, not worth stopping the bot for
+            if self._logger is not None:
+                self._logger.error('Could not save the fort details: {}'.format(error))
+
+    def _write_changes(self):
+        # type: () -> None
+        while not self._closed.is_set():
+            self._changed.wait()
+            self._changed.clear()
+            if self._closed.is_set():
+                return
+            self._save_changes()
+            # Wall clock time on purpose, a virtual clock would have this thread save in a loop
+            self._closed.wait(self.save_interval)
@@ -0,0 +1,158 @@
+import sqlite3
+import threading
+
+from googlemaps.exceptions import ApiError, Timeout, TransportError
+
+from app import kernel
+from app.clock import get_clock
+
+# Uncomment to enable type annotations for Python 3
+# from typing import Dict, List, Optional, Tuple
+
+
+@kernel.container.register('geo_cache', ['@config.core', '@google_maps', '@logger'])
+class GeoCache(object):
+    """
+        Remembers the elevations and addresses google told us about in a SQLite database, so restarts and routes
+        through known places do not ask again. Elevations are kept per grid square of mapping.elevation_precision
+        decimal places (3 is about 100 metres), which is close enough for the altitude the player walks at.
+        Lookups run on the bot thread, so after google failed it is left alone for mapping.elevation_retry_delay
+        seconds, and squares it had no elevation for are not asked for again in that time either.
+    """
+
+    # The elevation API takes up to 512 locations, fewer keep the URL short
+    BATCH_SIZE = 256
+
+    def __init__(self, config, google_maps, logger):
+        # type: (Namespace, Client, Logger) -> None
+        self.google_maps = google_maps
+        self.logger = logger.getLogger('Mapper')
+
+        mapping = config.get('mapping', None) or {}
+        self.precision = mapping.get('elevation_precision', 3)
+        self.path = mapping.get('geo_cache', 'data/geo-cache.db') or ':memory:'
+        self.retry_delay = mapping.get('elevation_retry_delay', 600)
+
+        self.requests = 0
+
+        self._elevations = {}
+        # When each grid square google had no elevation for may be asked for again
+        self._failed = {}
+        # No elevations are asked for before this time, the last request failed
+        self._retry_at = None
+        self._lock = threading.Lock()
+        self._db = self._connect()
+
+    def _connect(self):
+        # type: () -> sqlite3.Connection
+        try:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+        except sqlite3.Error as error:
+            self.logger.warning('Could not open {}, geo data will not be saved: {}'.format(self.path, error))
+            db = sqlite3.connect(':memory:', check_same_thread=False)
+
+        db.execute('CREATE TABLE IF NOT EXISTS elevations '
+                   '(lat INTEGER, lng INTEGER, precision INTEGER, elevation REAL, PRIMARY KEY (lat, lng, precision))')
+        db.execute('CREATE TABLE IF NOT EXISTS geocodes (address TEXT PRIMARY KEY, lat REAL, lng REAL, alt REAL)')
+        db.commit()
+        return db
+
+    def _quantize(self, lat, lng):
+        # type: (float, float) -> Tuple[int, int]
+        scale = 10 ** self.precision
+        return int(round(lat * scale)), int(round(lng * scale))
+
+    def get_elevation(self, lat, lng, fetch=True):
+        # type: (float, float, bool) -> Optional[float]
+        return self.get_elevations([(lat, lng)], fetch)[0]
+
+    def get_elevations(self, points, fetch=True):
+        # type: (List[Tuple[float, float]], bool) -> List[Optional[float]]
+        """
+            Looks up the elevation of every point, asking google for the grid squares that are not cached yet in
+            as few requests as possible. Points google could not tell us about are None.
+        """
+        keys = [self._quantize(lat, lng) for lat, lng in points]
+        now = get_clock().time()
+
+        missing = {}
+        with self._lock:
+            for key, point in zip(keys, points):
+                if key in self._elevations or key in missing or self._failed.get(key, 0) > now:
+                    continue
+                row = self._db.execute('SELECT elevation FROM elevations WHERE lat = ? AND lng = ? AND precision = ?',
+                                       (key[0], key[1], self.precision)).fetchone()
+                if row is not None:
+                    self._elevations[key] = row[0]
+                else:
+                    missing[key] = point
+
+        if fetch and len(missing) and (self._retry_at is None or self._retry_at <= now):
+            self._fetch_elevations(missing)
+
+        with self._lock:
+            return [self._elevations.get(key, None) for key in keys]
+
+    def _fetch_elevations(self, missing):
+        # type: (Dict[Tuple[int, int], Tuple[float, float]]) -> None
+        missing = list(missing.items())
+        for start in range(0, len(missing), self.BATCH_SIZE):
+            batch = missing[start:start + self.BATCH_SIZE]
+            try:
+                self.requests += 1
+                response = self.google_maps.elevation([point for _, point in batch])
+            except (ApiError, Timeout, TransportError) as error:
+                self.logger.debug('Could not fetch elevations, retrying in {} seconds: {}'.format(self.retry_delay, error))
+                self._retry_at = get_clock().time() + self.retry_delay
+                return
+
+            if response is None or len(response) != len(batch):
+                self._retry_at = get_clock().time() + self.retry_delay
+                return
+
+            rows = []
+            with self._lock:
+                for (key, _), result in zip(batch, response):
+                    if "elevation" in result:
+                        self._elevations[key] = result["elevation"]
+                        self._failed.pop(key, None)
+                        rows.append((key[0], key[1], self.precision, result["elevation"]))
+                    else:
+                        self._failed[key] = get_clock().time() + self.retry_delay
+                self._save('INSERT OR REPLACE INTO elevations VALUES (?, ?, ?, ?)', rows)
+
+    def geocode(self, address):
+        # type: (str) -> Tuple[float, float, float]
+        """
+            Looks up where an address is. Errors of the maps client are passed on, there is nothing to fall back to.
+        """
+        key = ' '.join(address.lower().split())
+        with self._lock:
+            row = self._db.execute('SELECT lat, lng, alt FROM geocodes WHERE address = ?', (key,)).fetchone()
+        if row is not None:
+            return row
+
+        self.requests += 1
+        location = self.google_maps.geocode(address)
+        if isinstance(location, list):
+            # The google maps client answers with a list of results
+            if not len(location):
+                raise ValueError('Could not find "{}"'.format(address))
+            coordinates = location[0]["geometry"]["location"]
+            lat, lng = coordinates["lat"], coordinates["lng"]
+            alt = self.get_elevation(lat, lng) or 0.0
+        else:
+            lat, lng, alt = location.latitude, location.longitude, location.altitude
+
+        with self._lock:
+            self._save('INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?)', [(key, lat, lng, alt)])
+        return lat, lng, alt
+
+    def _save(self, statement, rows):
+        # type: (str, List[Tuple]) -> None
+        try:
+            self._db.executemany(statement, rows)
+            self._db.commit()
+        except sqlite3.Error as error:
+            # Locked by another bot or a full disk, the values are still known until the bot stops
+            self.logger.debug('Could not save geo data: {}'.format(error))
@@ -0,0 +1,168 @@
+import atexit
+import json
+import os
+import threading
+from math import atan2, cos, degrees, radians, sin
+
+from app import kernel
+from pokemongo_bot.utils import save_json
+
+# Uncomment to enable type annotations for Python 3
+# from typing import Any, Dict, Optional
+
+
+def _bearing(lat1, lng1, lat2, lng2):
+    # type: (float, float, float, float) -> float
+    # Initial bearing in degrees clockwise from north
+    d_lng = radians(lng2 - lng1)
+    lat1, lat2 = radians(lat1), radians(lat2)
+    x = sin(d_lng) * cos(lat2)
+    y = cos(lat1) * sin(lat2) - sin(lat1) * cos(lat2) * cos(d_lng)
+    return (degrees(atan2(x, y)) + 360) % 360
+
+
+@kernel.container.register('location_store', ['@config.core', '@logger'])
+class LocationStore(object):
+    """
+        Keeps where the player is, which way they are heading and what the navigator is up to in memory, and
+        writes it to data/last-location-<username>.json from a background thread: right away after the first
+        change, then at most once every save interval, and once more when the bot is closed or exits. The file is
+        replaced atomically, so a crash never leaves half of it behind.
+    """
+
+    def __init__(self, config, logger):
+        # type: (Namespace, Logger) -> None
+        self.logger = logger.getLogger('Location')
+
+        mapping = config.get('mapping', None) or {}
+        self.interval = mapping.get('location_save_interval', 10)
+        # The exit hook runs wherever the working directory happens to be by then
+        self.location_file = os.path.abspath('data/last-location-{}.json'.format(config['login']['username']))
+
+        self._location = {}
+        # Changes made and changes on disk, the writer thread and the exit hook skip writing when they match
+        self._version = 0
+        self._written = 0
+        self._changed = threading.Event()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._writer = None
+
+    def load(self):
+        # type: () -> Optional[Dict[str, Any]]
+        try:
+            with open(self.location_file) as location_file:
+                location = json.load(location_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if 'lat' not in location or 'lng' not in location:
+            return None
+        with self._lock:
+            self._location = dict(location)
+        return location
+
+    def get(self):
+        # type: () -> Dict[str, Any]
+        with self._lock:
+            return dict(self._location)
+
+    def update(self, lat, lng, alt=None):
+        # type: (float, float, Optional[float]) -> None
+        with self._lock:
+            previous = self._location
+            if previous.get('lat', None) == lat and previous.get('lng', None) == lng:
+                return
+
+            location = dict(previous, lat=lat, lng=lng)
+            if alt is not None:
+                location['alt'] = alt
+            if 'lat' in previous and 'lng' in previous:
+                location['heading'] = _bearing(previous['lat'], previous['lng'], lat, lng)
+            self._location = location
+            self._version += 1
+        self._start_writer()
+        self._changed.set()
+
+    def set_navigation(self, navigator, state, destination=None):
+        # type: (str, Dict[str, Any], Optional[Destination]) -> None
+        """
+            Remembers the navigator's state, so that the route can be picked up again after a restart.
+        """
+        navigation = {'navigator': navigator, 'state': state}
+        if destination is not None:
+            navigation['destination'] = {
+                'lat': destination.target_lat,
+                'lng': destination.target_lng,
+                'alt': destination.target_alt,
+                'name': destination.name
+            }
+        with self._lock:
+            self._location = dict(self._location, navigation=navigation)
+            self._version += 1
+        self._start_writer()
+        self._changed.set()
+
+    def flush(self):
+        # type: () -> None
+        with self._write_lock:
+            with self._lock:
+                location = dict(self._location)
+                version = self._version
+            if 'lat' not in location:
+                return
+
+            save_json(self.location_file, location)
+            self._written = version
+
+    def close(self):
+        # type: () -> None
+        """
+            Stops the writer thread and writes what it did not get to yet.
+        """
+        self._closed.set()
+        self._changed.set()
+        if self._writer is not None:
+            self._writer.join()
+            # Python 2 has no way to unregister, the hook does nothing once closed
+            if hasattr(atexit, 'unregister'):
+                atexit.unregister(self._write_at_exit)
+        self._write()
+
+    def _start_writer(self):
+        # type: () -> None
+        with self._lock:
+            if self._writer is not None or self._closed.is_set():
+                return
+            self._writer = threading.Thread(target=self._write_changes, name='LocationStore')
+            self._writer.daemon = True
+            self._writer.start()
+            # The writer might be waiting out the interval when the bot exits
+            atexit.register(self._write_at_exit)
+
+    def _write_at_exit(self):
+        # type: () -> None
+        if not self._closed.is_set():
+            self._write()
+
+    def _write(self):
+        # type: () -> None
+        with self._write_lock:
+            if self._written == self._version:
+                return
+            try:
+                self.flush()
+            except (IOError, OSError, TypeError, ValueError) as error:
+                self.logger.error('Could not save the last location: {}'.format(error))
+
+    def _write_changes(self):
+        # type: () -> None
+        while not self._closed.is_set():
+            self._changed.wait()
+            self._changed.clear()
+            if self._closed.is_set():
+                return
+            self._write()
+            # Wall clock time on purpose, a virtual clock would have this thread rewrite the file in a loop
+            self._closed.wait(self.interval)
@@ -0,0 +1,82 @@
+from pgoapi.utilities import get_cell_ids
+
+from app import kernel
+from pokemongo_bot import geo
+
+# Uncomment to enable type annotations for Python 3
+# from typing import List, Tuple
+
+
+@kernel.container.register('map_prefetcher', ['@config.core', '@api_wrapper', '@logger'])
+class MapPrefetcher(object):
+    """
+        Requests the cells along the route the stepper planned before the bot gets there, so the navigator and
+        the plugins already know the pokestops and spawn points on the way. Cells that are in the world map are
+        skipped. A few of them at a time are added to the cells of the Mapper's own map request, so prefetching
+        never costs a request of its own.
+    """
+
+    def __init__(self, config, api_wrapper, logger):
+        # type: (Namespace, PoGoApi, Logger) -> None
+        self.api_wrapper = api_wrapper
+        self.logger = logger.getLogger('Mapper')
+
+        settings = config.get('map_prefetch', None) or {}
+        self.enabled = settings.get('enabled', True)
+        # In metres, both for sampling the route and for the cells around each sample, like mapping.cell_radius
+        self.radius = settings.get('radius', 70)
+        self.max_cells = settings.get('max_cells', 20)
+
+        self.prefetched = 0
+
+        # Cells along the route that are not known yet, in the order they will be walked through
+        self._pending = []
+
+    def _is_known(self, cell_id):
+        # type: (int) -> bool
+        world_map = self.api_wrapper.state.get_state().get("worldmap", None)
+        return world_map is not None and world_map.get_cell(cell_id) is not None
+
+    def plan(self, steps):
+        # type: (List[Tuple[float, float, float]]) -> None
+        """
+            Replaces the cells to prefetch with those within radius metres of the given route.
+        """
+        self._pending = []
+        if not self.enabled:
+            return
+
+        planned = set()
+        last = None
+        for lat, lng, _ in steps:
+            # The cells around one point cover the route for a while
+            if last is not None and geo.distance(last[0], last[1], lat, lng) < self.radius:
+                continue
+            last = (lat, lng)
+
+            for cell_id in get_cell_ids(lat, lng, self.radius):
+                if cell_id not in planned and not self._is_known(cell_id):
+                    planned.add(cell_id)
+                    self._pending.append(cell_id)
+
+    def take(self, requested):
+        # type: (List[int]) -> List[int]
+        """
+            Hands out the next few cells to ask for along with the requested ones, and forgets about them.
+        """
+        # Cells the map refresh got in the meantime do not need to be asked for
+        requested = set(requested)
+        self._pending = [cell_id for cell_id in self._pending
+                         if cell_id not in requested and not self._is_known(cell_id)]
+
+        cell_ids, self._pending = self._pending[:self.max_cells], self._pending[self.max_cells:]
+        self.prefetched += len(cell_ids)
+        return cell_ids
+
+    def give_back(self, cell_ids):
+        # type: (List[int]) -> None
+        """
+            Puts cells handed out by take() back in front, the request they went out with got no response.
+        """
+        self._pending = cell_ids + [cell_id for cell_id in self._pending if cell_id not in cell_ids]
+        self.prefetched -= len(cell_ids)
@@ -0,0 +1,90 @@
+from app import kernel
+from app.clock import get_clock
+
+# Uncomment to enable type annotations for Python 3
+# from typing import List, Optional
+# from api.worldmap import Cell
+
+
+@kernel.container.register('map_refresh_policy', ['@config.core', '@mapper', '@logger'])
+class MapRefreshPolicy(object):
+    """
+        Decides when the map is requested again instead of doing it after every step. One step only moves a few
+        metres, so the cells of the last request are served until the player walked a fraction of the cell radius,
+        the interval ran out or a pokestop cooldown or lure that we know of ended. The distance and the interval
+        are the freshness policy of the world map in the StateManager.
+    """
+
+    def __init__(self, config, mapper, logger):
+        # type: (Namespace, Mapper, Logger) -> None
+        self.mapper = mapper
+        self.logger = logger.getLogger('Mapper')
+
+        settings = config.get('map_refresh', None) or {}
+        mapping = config.get('mapping', None) or {}
+        self.distance = settings.get('distance', 0.1) * mapping.get('cell_radius', 500)
+        self.interval = settings.get('interval', 15)
+
+        self.state = mapper.api_wrapper.state
+        self.state.state_policies["worldmap"] = {"max_age": self.interval or None, "max_distance": self.distance}
+
+        self.refreshes = 0
+        self.served = 0
+        self.failures = 0
+
+        # Whether the cells of the latest get_cells() came from the server
+        self.refreshed = False
+
+        self._cells = []
+        self._refreshed_at = None
+
+    def get_refresh_reason(self):
+        # type: () -> Optional[str]
+        if self._refreshed_at is None:
+            return 'start'
+
+        # The distance is walked from where the world map was requested to the api position, where the player is
+        reason = self.state.get_expiry_reason("worldmap")
+        if reason == "age":
+            return 'interval'
+        if reason == "distance":
+            return 'distance'
+
+        # Something we know of changed since the cells came in
+        since_ms, now_ms = self._refreshed_at * 1000, get_clock().time() * 1000
+        for cell in self._cells:
+            for pokestop in cell.pokestops:
+                for timestamp in (pokestop.cooldown_timestamp_ms, pokestop.lure_expires_timestamp_ms):
+                    if timestamp is not None and since_ms < timestamp <= now_ms:
+                        return 'expiry'
+        return None
+
+    def get_cells(self, lat, lng):
+        # type: (float, float) -> List[Cell]
+        reason = self.get_refresh_reason()
+        if reason is None:
+            self.refreshed = False
+            self.served += 1
+            return self._cells
+
+        self.logger.debug('Refreshing the map ({}).'.format(reason))
+        cells = self.mapper.get_cells(lat, lng)
+        if self.mapper.failed:
+            # The cells we had are still better than none, the next step tries again
+            self.logger.debug('The map request failed, serving the previous cells.')
+            self.refreshed = False
+            self.failures += 1
+            return self._cells
+
+        self._cells = cells
+        self._refreshed_at = get_clock().time()
+        self.refreshed = True
+        self.refreshes += 1
+        return self._cells
+
+    def invalidate(self):
+        # type: () -> None
+        """
+            Requests the map again on the next get_cells().
+        """
+        self._refreshed_at = None
@@ -3,6 +3,13 @@ from pokemongo_bot.item_list import Item
 from pokemongo_bot.human_behaviour import sleep
 
 
+# Parts of the state that the player service hands out
+VIEW_STATES = ("player", "inventory", "pokemon", "candy", "eggs", "egg_incubators")
+
+# Methods whose effect on the inventory is booked locally, an inventory that came back with them already has it
+BOOKED_METHODS = ("CATCH_POKEMON", "RELEASE_POKEMON", "RECYCLE_INVENTORY_ITEM", "FORT_SEARCH")
+
+
 @kernel.container.register('player_service', ['@api_wrapper', '@event_manager', '@logger'])
 class Player(object):
     def __init__(self, api_wrapper, event_manager, logger):
@@ -25,62 +32,155 @@ class Player(object):
         self._inventory = None
         self._pokemon = None
 
+        # What has to be requested again before it can be handed out, and whether the state has newer objects
+        # than the ones we hold
+        self._dirty = set(VIEW_STATES)
+        self._outdated = False
+
+        self._api_wrapper.add_response_listener(self._on_response)
+
     def login(self):
         self._logged_in = self._api_wrapper.login()
         return self._logged_in
 
-    def update(self, do_sleep=True):
-        response_dict = self._api_wrapper.get_player().get_inventory().call()
+    def refresh(self, do_sleep=True):
+        """
+            Requests the player and inventory again, whether or not they are cached.
+        """
+        self._api_wrapper.state.mark_returned_stale(["GET_PLAYER", "GET_INVENTORY"])
+        return self.update(do_sleep=do_sleep)
 
-        if do_sleep:
+    def update(self, do_sleep=True, max_age=None):
+        # Served from memory while the player and inventory states are fresh, only a real request needs the pause
+        cached = not len(self._api_wrapper.state.filter_cached_methods(["GET_PLAYER", "GET_INVENTORY"], max_age))
+        response_dict = self._api_wrapper.get_player().get_inventory().call(max_age=max_age)
+
+        if do_sleep and not cached:
             sleep(2)
 
+        return self._update_from(response_dict)
+
+    def _update_from(self, response_dict):
         if response_dict is None:
             self._logger.error('Failed to retrieve player and inventory stats', 'red')
             return False
 
+        # Copies, bookings must not change what the server told the state manager
         self._player = response_dict['player']
-        self._inventory = response_dict['inventory']
-        self._candies = response_dict['candy']
-        self._pokemon = response_dict['pokemon']
-        self._candies = response_dict['candy']
+        self._inventory = dict(response_dict['inventory'])
+        self._pokemon = list(response_dict['pokemon'])
+        self._candies = dict(response_dict['candy'])
         self._eggs = response_dict['eggs']
         self._egg_incubators = response_dict['egg_incubators']
 
-        for item_id in self._inventory:
-            if item_id in self._pokeballs:
-                self._pokeballs[item_id] = self._inventory[item_id]
+        for ball in self._pokeballs:
+            self._pokeballs[ball] = self._inventory.get(ball, 0)
+
+        self._dirty.clear()
+        self._outdated = False
 
         self._event_manager.fire('service_player_updated', data=self)
 
         return True
 
+    def _read(self, *states):
+        # Only goes to the server for parts that a request changed in ways we could not book locally, or that
+        # outlived their freshness policy
+        state = self._api_wrapper.state
+        if any(key in self._dirty or state.is_expired(key) for key in states):
+            return self.update()
+        if self._outdated:
+            return self._update_from(state.get_state())
+        return True
+
+    def _on_response(self, methods, method_keys, responses):
+        state = self._api_wrapper.state
+        returned = set()
+        for method in method_keys:
+            returned.update(state.method_returns_states.get(method, []))
+        returned.intersection_update(VIEW_STATES)
+
+        for method in method_keys:
+            if method in BOOKED_METHODS and "inventory" in returned:
+                continue
+            booked = self._book(method, methods[method][1], responses.get(method, None) or {})
+            self._dirty.update(key for key in state.method_mutates_states.get(method, [])
+                               if key in VIEW_STATES and key not in booked)
+
+        if len(returned):
+            self._dirty.difference_update(returned)
+            self._outdated = True
+
+    def _book(self, method, kwargs, response):
+        # type: (str, Dict[str, Any], Dict[str, Any]) -> List[str]
+        """
+            Applies what a method is known to change to the view and returns the states that are now up to date.
+            Candy is booked by the callers through add_candy().
+        """
+        if self._inventory is None:
+            return []
+
+        if method == "CATCH_POKEMON":
+            self._add_item(kwargs.get("pokeball", 0), -1)
+            return ["inventory", "candy"]
+
+        if method == "RELEASE_POKEMON":
+            unique_id = kwargs.get("pokemon_id", None)
+            self._pokemon = [pokemon for pokemon in self._pokemon if pokemon.unique_id != unique_id]
+            return ["pokemon", "candy"]
+
+        if method == "RECYCLE_INVENTORY_ITEM":
+            if response.get("result", 0) == 1:
+                self._add_item(kwargs.get("item_id", 0), -kwargs.get("count", 0))
+            return ["inventory"]
+
+        if method == "FORT_SEARCH":
+            for item in response.get("items_awarded", []):
+                self._add_item(item.get("item_id", 0), item.get("item_count", 0))
+            return ["inventory"]
+
+        if method == "USE_ITEM_EGG_INCUBATOR":
+            # The egg now has an incubator
+            self._dirty.add("eggs")
+        elif method == "GET_HATCHED_EGGS" and len(response.get("pokemon_id", [])):
+            self._dirty.update(VIEW_STATES)
+        return []
+
+    def _add_item(self, item_id, count):
+        # type: (int, int) -> None
+        if item_id == 0 or count == 0:
+            return
+        self._inventory[item_id] = max(0, self._inventory.get(item_id, 0) + count)
+        self._inventory["count"] = max(0, self._inventory.get("count", 0) + count)
+        if item_id in self._pokeballs:
+            self._pokeballs[item_id] = self._inventory[item_id]
+
     def get_player(self):
-        self.update()
+        self._read("player")
         return self._player
 
     def get_inventory(self):
-        self.update()
+        self._read("inventory")
         return self._inventory
 
     def get_eggs(self):
-        self.update()
+        self._read("eggs")
         return self._eggs
 
     def get_egg_incubators(self):
-        self.update()
+        self._read("egg_incubators")
         return self._egg_incubators
 
     def get_pokemon(self):
-        self.update()
+        self._read("pokemon")
         return self._pokemon
 
     def get_candies(self):
-        self.update()
+        self._read("candy")
         return self._candies
 
     def get_candy(self, pokemon_id):
-        self.update()
+        self._read("candy")
         try:
             return self._candies[pokemon_id]
         except KeyError:
@@ -94,11 +194,12 @@ class Player(object):
             self._candies[pokemon_id] = int(pokemon_candies)
 
     def get_pokeballs(self):
-        self.update()
-        return self._pokeballs
+        self._read("inventory")
+        # Callers count down their own copy while throwing, the view books the throws itself
+        return dict(self._pokeballs)
 
     def print_stats(self):
-        if self.update() is True:
+        if self._read(*VIEW_STATES) is True:
             self._logger.info('')
             self._logger.info('Username: {}'.format(self._player.username))
             self._logger.info('Account creation: {}'.format(self._player.get_creation_date()))
@@ -115,21 +216,39 @@ class Player(object):
             self._logger.info('-- Pokemon captured: {:,}'.format(self._player.pokemons_captured))
             self._logger.info('-- Pokestops visited: {:,}'.format(self._player.poke_stop_visits))
 
-    def heartbeat(self):
+    def heartbeat(self, defer=False):
+        # Picks up what changed on the server's side, so it does not wait for the cache to expire
+        if defer:
+            # Sent along with the next request instead of on its own, usually the map update of the same step
+            self._api_wrapper.state.mark_returned_stale(["GET_PLAYER", "GET_INVENTORY"])
+            self._api_wrapper.get_player().get_inventory().defer().add_done_callback(self._heartbeat_received)
+            return
+
+        self.refresh(do_sleep=False)
+        self._log_hatched_egg()
+
+    def _heartbeat_received(self, response_dict):
+        if self._update_from(response_dict):
+            self._log_hatched_egg()
+
+    def get_hatched_eggs(self, defer=False):
         self._api_wrapper.get_hatched_eggs()
-        self._api_wrapper.check_awarded_badges()
+        if defer:
+            self._api_wrapper.defer().add_done_callback(lambda response_dict: self._log_hatched_egg())
+            return
 
-        self.update(do_sleep=False)
+        self._api_wrapper.call()
+        self._log_hatched_egg()
 
-        if len(self._player.hatched_eggs):
+    def _log_hatched_egg(self):
+        if self._player is not None and len(self._player.hatched_eggs):
             self._player.hatched_eggs.pop(0)
             self._logger_egg.info("Hatched an egg!", "green")
 
-    def get_hatched_eggs(self):
-        self._api_wrapper.get_hatched_eggs().call()
-        if len(self._player.hatched_eggs):
-            self._player.hatched_eggs.pop(0)
-            self._logger_egg.info("Hatched an egg!", "green")
+    def check_awarded_badges(self, defer=False):
+        self._api_wrapper.check_awarded_badges()
+        if defer:
+            self._api_wrapper.defer()
+            return
 
-    def check_awarded_badges(self):
-        self._api_wrapper.check_awarded_badges().call()
+        self._api_wrapper.call()
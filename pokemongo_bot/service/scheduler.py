@@ -0,0 +1,92 @@
+from app import kernel
+from app.clock import get_clock
+from pokemongo_bot import geo
+
+# Uncomment to enable type annotations for Python 3
+# from typing import Any, Callable, Dict, Optional
+
+
+class Task(object):
+    def __init__(self, name, callback, interval, distance):
+        # type: (str, Callable[[], Any], float, float) -> None
+        self.name = name
+        self.callback = callback
+        self.interval = interval
+        self.distance = distance
+
+        self.last_run = None
+        self.walked = 0.0
+        self.triggered = False
+        self.runs = 0
+
+    def is_due(self, now):
+        # type: (float) -> bool
+        if self.triggered or self.last_run is None:
+            return True
+        if self.interval and now - self.last_run >= self.interval:
+            return True
+        return bool(self.distance) and self.walked >= self.distance
+
+
+@kernel.container.register('scheduler', ['@config.core', '@logger'])
+class Scheduler(object):
+    """
+        Runs periodic tasks once every so many seconds, once the player walked far enough since they last ran or
+        when something asks for them, instead of on every step. Tasks are meant to queue deferred requests, which
+        then go out together with the next regular request of the step.
+    """
+
+    def __init__(self, config, logger):
+        # type: (Namespace, Logger) -> None
+        self.logger = logger.getLogger('Scheduler')
+        self.config = config.get('scheduling', None) or {}
+
+        self._tasks = {}
+        self._position = None
+
+    def add_task(self, name, callback, interval=0, distance=0):
+        # type: (str, Callable[[], Any], float, float) -> None
+        """
+            Runs callback every interval seconds and every distance metres walked, whichever comes first. Both
+            defaults can be overridden by the scheduling section of the config, 0 disables a trigger.
+        """
+        settings = self.config.get(name, None) or {}
+        self._tasks[name] = Task(name, callback, settings.get('interval', interval), settings.get('distance', distance))
+
+    def trigger(self, name):
+        # type: (str) -> None
+        """
+            Runs the task on the next tick, however long ago it last ran.
+        """
+        task = self._tasks.get(name, None)
+        if task is not None:
+            task.triggered = True
+
+    def tick(self, lat, lng):
+        # type: (float, float) -> None
+        if self._position is not None:
+            walked = geo.distance(self._position[0], self._position[1], lat, lng)
+            for task in self._tasks.values():
+                task.walked += walked
+        self._position = (lat, lng)
+
+        now = get_clock().time()
+        for task in list(self._tasks.values()):
+            if not task.is_due(now):
+                continue
+            task.last_run = now
+            task.walked = 0.0
+            task.triggered = False
+            task.runs += 1
+            task.callback()
+
+    def get_metrics(self):
+        # type: () -> Dict[str, Dict[str, Any]]
+        now = get_clock().time()
+        return {
+            name: {
+                'runs': task.runs,
+                'since_last_run': None if task.last_run is None else now - task.last_run,
+                'walked': task.walked
+            } for name, task in self._tasks.items()
+        }
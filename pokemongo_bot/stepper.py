@@ -4,19 +4,21 @@ from math import ceil
 
 from app import kernel
 from pokemongo_bot.human_behaviour import sleep, random_lat_long_delta
-from pokemongo_bot.utils import distance, format_time, format_dist
+from pokemongo_bot.geo import distance
+from pokemongo_bot.utils import format_time, format_dist
 
 
-@kernel.container.register('stepper', ['@config.core', '@api_wrapper', '%path_finder%', '@logger'])
+@kernel.container.register('stepper', ['@config.core', '@api_wrapper', '%path_finder%', '@logger'], {'geo_cache': '@geo_cache'})
 class Stepper(object):
     AVERAGE_STRIDE_LENGTH_IN_METRES = 0.60
 
-    def __init__(self, config, api_wrapper, path_finder, logger):
-        # type: (Namespace, PoGpApi, PathFinder, Logger) -> None
+    def __init__(self, config, api_wrapper, path_finder, logger, geo_cache=None):
+        # type: (Namespace, PoGpApi, PathFinder, Logger, GeoCache) -> None
         self.config = config
         self.api_wrapper = api_wrapper
         self.path_finder = path_finder
         self.logger = logger.getLogger('Navigation')
+        self.geo_cache = geo_cache
 
         self.origin_lat = None
         self.origin_lng = None
@@ -74,6 +76,12 @@ class Stepper(object):
             from_lat = path_to_lat
             from_lng = path_to_lng
 
+        # Walk at the height of the ground, looked up for the whole route at once
+        if self.geo_cache is not None and len(route_steps):
+            elevations = self.geo_cache.get_elevations([(lat, lng) for lat, lng, _ in route_steps])
+            route_steps = [(lat, lng, step_alt if elevation is None else elevation)
+                           for (lat, lng, step_alt), elevation in zip(route_steps, elevations)]
+
         return route_steps
 
     def _get_steps_between(self, from_lat, from_lng, to_lat, to_lng, alt):
@@ -8,6 +8,7 @@ from mock import Mock, MagicMock
 import pgoapi
 
 from app import Kernel
+from app.clock import RealClock, VirtualClock, set_clock
 from app.plugin_manager import PluginManager
 from pokemongo_bot import FortNavigator, PokemonGoBot
 from pokemongo_bot.event_manager import EventManager
@@ -18,6 +19,7 @@ from pokemongo_bot.service.player import Player
 from pokemongo_bot.service.pokemon import Pokemon
 from pokemongo_bot.stepper import Stepper
 import api
+from api.recorder import read_capture
 
 
 # pylint: disable=super-init-not-called
@@ -52,6 +54,15 @@ class PGoApiMock(pgoapi.PGoApi):
     def set_response(self, call_type, response):
         self.call_responses.append((call_type, response))
 
+    def set_recorded_responses(self, capture_file):
+        """
+            Queues the responses of an RPC recorder capture, in the order they were recorded.
+        """
+        for record in read_capture(capture_file):
+            responses = record['response'].get('responses', {})
+            for method, _, _ in record['requests']:
+                self.set_response(method, responses.get(method, None))
+
     def create_request(self):
         return PGoApiRequestMock(self)
 
@@ -133,6 +144,31 @@ def create_test_kernel(user_config=None):
     return kernel
 
 
+class VirtualClockMixin(object):
+    """
+        Runs the tests of a TestCase on a VirtualClock starting at clock_start, available as self.clock. The real
+        clock is put back by a cleanup, so a test or a setUp that fails can not leave it virtual for later tests.
+    """
+
+    clock_start = 1000
+
+    def setUp(self):
+        self.clock = VirtualClock(start=self.clock_start)
+        set_clock(self.clock)
+        self.addCleanup(set_clock, RealClock())
+        super(VirtualClockMixin, self).setUp()
+
+
+def get_test_cell_ids(lat, lng, radius):  # pylint: disable=unused-argument
+    """
+        Stand-in for pgoapi's get_cell_ids, whose cells depend on the pgoapi version: a cap around the position or
+        a walk out from its level 15 cell. Here a cell is a band of 0.001 degrees of latitude, about 111 metres, and
+        a position is covered by its own band and the ones on either side.
+    """
+    band = int(lat * 1000)
+    return [band - 1, band, band + 1]
+
+
 def create_core_test_config(user_config=None):
     # type: (Dict) -> Namespace
     if user_config is None:
@@ -151,6 +187,7 @@ def create_core_test_config(user_config=None):
             "location": None,
             "location_cache": False,
             "distance_unit": "km",
+            "geo_cache": None,
         },
         "movement": {
             "path_finder": "direct",
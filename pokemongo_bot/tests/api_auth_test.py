@@ -0,0 +1,60 @@
+import threading
+import time
+import unittest
+
+from mock import Mock
+
+from api.auth import TokenRefresher
+from pokemongo_bot.tests import VirtualClockMixin
+
+
+class TokenRefresherTest(VirtualClockMixin, unittest.TestCase):
+    def test_caches_expiry(self):
+        get_ticket = Mock(return_value=(int(1000 + 3600) * 1000, "token", "signature"))
+        refresher = TokenRefresher(Mock(return_value=True), get_ticket, Mock())
+
+        assert refresher.get_expiration_time() == 3600
+        self.clock.sleep(600)
+        assert refresher.get_expiration_time() == 3000
+        assert get_ticket.call_count == 1
+
+        # A new login means a new ticket
+        refresher.login()
+        refresher.get_expiration_time()
+        assert get_ticket.call_count == 2
+
+    def test_refresh_ahead(self):
+        logged_in = threading.Event()
+
+        def login():
+            logged_in.set()
+            return True
+
+        refresher = TokenRefresher(login, Mock(return_value=None), Mock(), margin=600)
+
+        refresher.refresh_ahead(601)
+        assert not logged_in.is_set()
+
+        refresher.refresh_ahead(599)
+        assert logged_in.wait(5)
+        for _ in range(500):
+            if not refresher.get_metrics()["refreshing"]:
+                break
+            time.sleep(0.01)
+        metrics = refresher.get_metrics()
+        assert metrics["logins"] == 1
+        assert metrics["mean_latency"] == 0
+
+    def test_refresh_failed(self):
+        refresher = TokenRefresher(Mock(return_value=False), Mock(return_value=None), Mock(), margin=600)
+
+        refresher._refreshing = True  # pylint: disable=protected-access
+        refresher._refresh()  # pylint: disable=protected-access
+
+        metrics = refresher.get_metrics()
+        assert metrics["failures"] == 1
+        assert metrics["refreshing"] is False
+
+        # Waits before trying again
+        refresher.refresh_ahead(0)
+        assert refresher.get_metrics()["refreshing"] is False
@@ -0,0 +1,79 @@
+import unittest
+
+from mock import Mock
+
+from pokemongo_bot.service.player import Player
+from pokemongo_bot.tests import create_core_test_config, create_mock_api_wrapper
+
+
+class CoalescingTest(unittest.TestCase):
+
+    @staticmethod
+    def _create_api_wrapper():
+        api_wrapper = create_mock_api_wrapper(create_core_test_config())
+        api_wrapper.pacer.wait = Mock(return_value=None)
+        pgo = api_wrapper.get_api()
+        pgo.create_request = Mock(side_effect=pgo.create_request)
+        return api_wrapper, pgo
+
+    def test_merges_deferred_calls(self):
+        api_wrapper, pgo = self._create_api_wrapper()
+        pgo.set_response('get_player', {'player_data': {'username': 'test_account'}})
+        pgo.set_response('fort_details', {'fort_id': 'fort1', 'name': 'Test Stop', 'type': 1})
+        pgo.set_response('get_map_objects', {'map_cells': []})
+
+        first = api_wrapper.get_player().defer()
+        second = api_wrapper.fort_details(fort_id='fort1').defer()
+        assert not first.done()
+
+        state = api_wrapper.get_map_objects(cell_id=[1]).call()
+
+        assert pgo.create_request.call_count == 1
+        assert pgo.call_stack_size() == 0
+        assert first.done() and second.done()
+        assert first.result()["player"].username == 'test_account'
+        assert second.result() is first.result()
+        assert second.result()["fort"] is not None
+        assert state["worldmap"] is not None
+
+    def test_keeps_order_of_mutating_calls(self):
+        api_wrapper, pgo = self._create_api_wrapper()
+        pgo.set_response('get_player', {'player_data': {'username': 'test_account'}})
+        pgo.set_response('encounter', {'status': 1})
+        pgo.set_response('get_player', {'player_data': {'username': 'test_account'}})
+
+        api_wrapper.get_player().defer()
+        # ENCOUNTER changes the player the first caller reads, so it needs a request of its own
+        api_wrapper.encounter(encounter_id=1).defer()
+        api_wrapper.get_player().call()
+
+        assert pgo.create_request.call_count == 2
+        assert pgo.call_stack_size() == 0
+
+    def test_result_flushes(self):
+        api_wrapper, pgo = self._create_api_wrapper()
+        pgo.set_response('get_player', {'player_data': {'username': 'test_account'}})
+
+        future = api_wrapper.get_player().defer()
+        callback = Mock()
+        future.add_done_callback(callback)
+
+        assert future.result()["player"].username == 'test_account'
+        callback.assert_called_once_with(future.result())
+        assert pgo.call_stack_size() == 0
+
+    def test_deferred_heartbeat(self):
+        api_wrapper, pgo = self._create_api_wrapper()
+        player_service = Player(api_wrapper, Mock(), Mock())
+        pgo.set_response('get_player', {'player_data': {'username': 'test_account'}})
+        pgo.set_response('get_inventory', {'inventory_delta': {'inventory_items': []}})
+        pgo.set_response('get_map_objects', {'map_cells': []})
+
+        player_service.heartbeat(defer=True)
+        assert pgo.create_request.call_count == 0
+
+        api_wrapper.get_map_objects(cell_id=[1]).call()
+
+        assert pgo.create_request.call_count == 1
+        assert pgo.call_stack_size() == 0
+        assert player_service._player.username == 'test_account'  # pylint: disable=protected-access
@@ -0,0 +1,92 @@
+import unittest
+
+from api.inventory_parser import InventoryParser
+from api.offline.world import SyntheticWorld
+from api.state_manager import StateManager
+from pokemongo_bot.tests import VirtualClockMixin
+
+
+class InventoryTest(VirtualClockMixin, unittest.TestCase):
+    clock_start = 1500000000
+
+    @staticmethod
+    def _create_response(items, original_timestamp_ms=0, new_timestamp_ms=1000):
+        return {
+            "inventory_delta": {
+                "original_timestamp_ms": original_timestamp_ms,
+                "new_timestamp_ms": new_timestamp_ms,
+                "inventory_items": items
+            }
+        }
+
+    @staticmethod
+    def _pokemon(unique_id, combat_power, is_egg=False):
+        return {"inventory_item_data": {"pokemon_data": {"id": unique_id, "pokemon_id": 16, "cp": combat_power,
+                                                         "is_egg": is_egg}}}
+
+    @staticmethod
+    def _item(item_id, count):
+        return {"inventory_item_data": {"item": {"item_id": item_id, "count": count}}}
+
+    def test_apply_delta(self):
+        inventory = InventoryParser(self._create_response([
+            self._pokemon(1, 10), self._pokemon(2, 20), self._pokemon(3, 0, is_egg=True),
+            self._item(1, 20), self._item(2, 5),
+            {"inventory_item_data": {"candy": {"family_id": 16, "candy": 3}}}
+        ]))
+        pokemon = inventory.pokemon
+        first = pokemon[0]
+        assert len(pokemon) == 2 and len(inventory.eggs) == 1
+        assert inventory.items == {"count": 25, 1: 20, 2: 5}
+
+        # Nothing changed, nothing is parsed again
+        inventory.apply(self._create_response([self._item(1, 20)], 1000, 2000))
+        assert inventory.pokemon is pokemon
+        assert inventory.last_updated == 2000
+
+        inventory.apply(self._create_response([
+            self._pokemon(2, 25), {"deleted_item_key": 1}, self._item(2, 0),
+            {"inventory_item_data": {"candy": {"family_id": 16, "candy": 5}}}
+        ], 2000, 3000))
+        assert [p.unique_id for p in inventory.pokemon] == [2]
+        assert inventory.pokemon[0].combat_power == 25
+        assert inventory.pokemon[0] is not first
+        assert len(inventory.eggs) == 1
+        assert inventory.items == {"count": 20, 1: 20}
+        assert inventory.candy == {16: 5}
+
+        # A full inventory replaces everything
+        inventory.apply(self._create_response([self._pokemon(4, 40)], 0, 4000))
+        assert [p.unique_id for p in inventory.pokemon] == [4]
+        assert inventory.eggs == [] and inventory.candy == {}
+        assert inventory.items == {"count": 0}
+
+    def test_request_timestamp(self):
+        state = StateManager()
+        assert state.get_request_arguments("GET_INVENTORY", (), {}) == ((), {})
+
+        state.update_with_response("GET_INVENTORY", self._create_response([self._item(1, 20)]))
+        assert state.get_request_arguments("GET_INVENTORY", (), {}) == ((), {"last_timestamp_ms": 1000})
+        assert state.get_request_arguments("GET_PLAYER", (), {}) == ((), {})
+
+    def test_offline_delta(self):
+        world = SyntheticWorld(seed=42)
+        state = StateManager()
+
+        state.update_with_response("GET_INVENTORY", world.get_inventory())
+        released = world._add_pokemon({"pokemon_id": 16})  # pylint: disable=protected-access
+        kept = world._add_pokemon({"pokemon_id": 19})  # pylint: disable=protected-access
+        self.clock.sleep(1)
+        state.update_with_response("GET_INVENTORY", world.get_inventory(last_timestamp_ms=state.inventory.last_updated))
+        assert len(state.get_state()["pokemon"]) == 2
+
+        self.clock.sleep(1)
+        world.release_pokemon(pokemon_id=released["id"])
+        delta = world.get_inventory(last_timestamp_ms=state.inventory.last_updated)
+        # The unchanged items are not sent again
+        entries = delta["inventory_delta"]["inventory_items"]
+        assert {"deleted_item_key": released["id"]} in entries
+        assert not [entry for entry in entries if "item" in entry.get("inventory_item_data", {})]
+        state.update_with_response("GET_INVENTORY", delta)
+        assert [pokemon.unique_id for pokemon in state.get_state()["pokemon"]] == [kept["id"]]
+        assert state.get_state()["candy"] == {16: 1}
@@ -0,0 +1,80 @@
+import random
+import unittest
+
+from mock import Mock
+
+from api.pacing import Backoff, CircuitBreaker, Pacer, TokenBucket, THROTTLED, OFFLINE
+from app.clock import get_clock
+from pokemongo_bot.tests import VirtualClockMixin
+
+
+class PacingTest(VirtualClockMixin, unittest.TestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=2.0, burst=2)
+
+        assert bucket.take() == 0.0
+        assert bucket.take() == 0.0
+        assert bucket.take() == 0.5
+
+        self.clock.sleep(10)
+        assert bucket.take() == 0.0
+
+        bucket.throttled()
+        assert bucket.rate == 1.0
+        bucket.succeeded()
+        assert bucket.rate == 1.01
+
+    @staticmethod
+    def test_backoff():
+        backoff = Backoff(2.0, 10.0, random.Random(1))
+
+        delays = [backoff.next_delay() for _ in range(6)]
+        for failures, delay in enumerate(delays):
+            assert 0 <= delay <= min(10.0, 2.0 * 2 ** failures)
+
+        backoff.reset()
+        assert backoff.failures == 0
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(threshold=2, reset_timeout=60, max_timeout=100)
+
+        assert breaker.failed() is False
+        assert breaker.failed() is True
+        assert breaker.remaining() == 60
+
+        self.clock.sleep(60)
+        assert breaker.remaining() == 0
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        # Failing again straight away doubles the pause, up to the maximum
+        assert breaker.failed() is True
+        assert breaker.remaining() == 100
+
+        self.clock.sleep(100)
+        breaker.remaining()
+        breaker.succeeded()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_pacer(self):
+        pacer = Pacer({"pacing": {"rate": 1.0, "burst": 1, "circuit_threshold": 2, "circuit_timeout": 30}}, Mock())
+
+        pacer.wait()
+        pacer.succeeded(0.2)
+        pacer.wait()
+        pacer.failed(THROTTLED, "Requesting too fast.")
+        assert pacer.bucket.rate == 1.01 / 2
+
+        # The second failure in a row pauses every request, its backoff counts towards the pause
+        started = get_clock().time()
+        pacer.failed(OFFLINE, "Failed to perform API call.")
+        pacer.wait()
+        assert round(get_clock().time() - started, 6) >= 30
+
+        metrics = pacer.get_metrics()
+        assert metrics["requests"] == 3
+        assert metrics["successes"] == 1
+        assert metrics["failures"][THROTTLED] == 1
+        assert metrics["failures"][OFFLINE] == 1
+        assert metrics["working"] == 0.2
+        assert metrics["waiting"]["circuit"] > 0
+        assert metrics["waiting"]["pacing"] > 0
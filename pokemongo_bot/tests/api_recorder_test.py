@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mock import Mock
+
+from api.recorder import RpcRecorder, read_capture
+from pokemongo_bot.tests import create_core_test_config, create_mock_api_wrapper
+
+
+class RecorderTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _create_recorder(self, size=100):
+        config = create_core_test_config({"recording": {"rpc": True, "size": size, "interval": 0}})
+        recorder = RpcRecorder(config, Mock())
+        recorder.capture_file = os.path.join(self.temp_dir, "rpc.capture")
+        return recorder
+
+    def test_keeps_latest(self):
+        recorder = self._create_recorder(size=2)
+        recorder.enabled = False
+        recorder.record({"GET_PLAYER": ((), {})}, ["GET_PLAYER"], {"status_code": 1})
+        assert recorder.get_records() == []
+
+        recorder.enabled = True
+        recorder._writer = Mock()  # pylint: disable=protected-access
+        for level in range(3):
+            recorder.record({"LEVEL_UP_REWARDS": ((), {"level": level})}, ["LEVEL_UP_REWARDS"], {"status_code": 1})
+
+        records = recorder.get_records()
+        assert len(records) == 2
+        assert records[0]["requests"] == [["LEVEL_UP_REWARDS", [], {"level": 1}]]
+
+    def test_writes_capture(self):
+        recorder = self._create_recorder()
+        response = {"status_code": 1, "responses": {"FORT_DETAILS": {"name": b"Test \xc3\x9f Stop"}}}
+        recorder.record({"FORT_DETAILS": ((), {"fort_id": "fort1"})}, ["FORT_DETAILS"], response)
+
+        # The writer thread may still be busy with the file
+        records = []
+        for _ in range(100):
+            if os.path.isfile(recorder.capture_file):
+                records = list(read_capture(recorder.capture_file))
+                if len(records):
+                    break
+            time.sleep(0.01)
+
+        assert len(records) == 1
+        assert records[0]["requests"] == [["FORT_DETAILS", [], {"fort_id": "fort1"}]]
+        assert records[0]["response"] == response
+
+    def test_close(self):
+        cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        try:
+            recorder = RpcRecorder(create_core_test_config({"recording": {"session": True, "interval": 60}}), Mock())
+            session_file = os.path.join(os.getcwd(), "data", "session-testaccount.capture")
+        finally:
+            os.chdir(cwd)
+        # Still where it was meant to go after the working directory changed
+        assert recorder.session_file == session_file
+
+        recorder.session_file = os.path.join(self.temp_dir, "session.capture")
+        for level in range(2):
+            recorder.record({"LEVEL_UP_REWARDS": ((), {"level": level})}, ["LEVEL_UP_REWARDS"], {"status_code": 1})
+
+        # The writer is waiting out the interval, closing writes what came in meanwhile
+        recorder.close()
+        assert not recorder._writer.is_alive()  # pylint: disable=protected-access
+        assert len(list(read_capture(recorder.session_file))) == 2
+
+    def test_session_with_binary_fields(self):
+        recorder = self._create_recorder()
+        recorder.enabled = False
+        recorder.session = True
+        recorder._writer = Mock()  # pylint: disable=protected-access
+        recorder.session_file = os.path.join(self.temp_dir, "missing", "session.capture")
+
+        # Auth tickets carry binary strings that are not UTF-8
+        response = {"status_code": 1, "auth_ticket": {"start": b"\x8f\x00\xff", "end": b"\xc3\x28",
+                                                       "expire_timestamp_ms": 1000}}
+        recorder.record({"GET_PLAYER": ((), {})}, ["GET_PLAYER"], response)
+
+        # Nothing is lost when the capture can not be written
+        recorder._write()  # pylint: disable=protected-access
+        assert len(recorder._unwritten) == 1  # pylint: disable=protected-access
+
+        recorder.session_file = os.path.join(self.temp_dir, "session.capture")
+        recorder.flush()
+        assert len(recorder._unwritten) == 0  # pylint: disable=protected-access
+
+        records = list(read_capture(recorder.session_file))
+        assert len(records) == 1
+        assert records[0]["response"] == response
+
+    def test_replay_as_fixture(self):
+        recorder = self._create_recorder()
+        recorder._writer = Mock()  # pylint: disable=protected-access
+        recorder.record({"GET_PLAYER": ((), {})}, ["GET_PLAYER"],
+                        {"status_code": 1, "responses": {"GET_PLAYER": {"player_data": {"username": "test_account"}}}})
+        recorder.dump()
+
+        api_wrapper = create_mock_api_wrapper(create_core_test_config())
+        pgo = api_wrapper.get_api()
+        pgo.set_recorded_responses(recorder.capture_file)
+
+        assert api_wrapper.get_player().call()["player"].username == "test_account"
+        assert pgo.call_stack_size() == 0
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock
+
+import api
+from api.pacing import Pacer, THROTTLED
+from api.recorder import RpcRecorder, read_capture
+from api.replay import ReplayFinished, ReplayPGoApi
+from app.clock import VirtualClock, set_clock
+from pokemongo_bot.logger import Logger
+from pokemongo_bot.tests import VirtualClockMixin, create_core_test_config
+
+
+class ReplayTest(VirtualClockMixin, unittest.TestCase):
+    def setUp(self):
+        super(ReplayTest, self).setUp()
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _record_session(self):
+        config = create_core_test_config({"recording": {"session": True}})
+        recorder = RpcRecorder(config, Mock())
+        recorder.session_file = os.path.join(self.temp_dir, "session.capture")
+        recorder._writer = Mock()  # pylint: disable=protected-access
+
+        player = {"GET_PLAYER": {"player_data": {"username": "test_account"}}}
+        recorder.record({"GET_PLAYER": ((), {})}, ["GET_PLAYER"], None, THROTTLED)
+        self.clock.sleep(5)
+        recorder.record({"GET_PLAYER": ((), {})}, ["GET_PLAYER"], {"status_code": 1, "responses": player})
+        recorder.record({"GET_MAP_OBJECTS": ((), {"cell_id": [1]})}, ["GET_MAP_OBJECTS"],
+                        {"status_code": 1, "responses": {"GET_MAP_OBJECTS": {"map_cells": []}}})
+        recorder.record({"GET_PLAYER": ((), {})}, ["GET_PLAYER"], {"status_code": 1, "responses": player})
+        recorder.flush()
+        return recorder.session_file
+
+    def _create_api_wrapper(self, pgoapi):
+        logger = Logger()
+        pacer = Pacer({}, logger)
+        api_wrapper = api.PoGoApi(pgoapi, logger, pacer=pacer)
+        api_wrapper.get_expiration_time = Mock(return_value=1000000)
+        return api_wrapper
+
+    def test_session_capture(self):
+        records = list(read_capture(self._record_session()))
+
+        assert len(records) == 4
+        assert records[0]["failure"] == THROTTLED
+        assert records[0]["response"] is None
+        assert records[1]["time"] == 1005
+        assert records[2]["requests"] == [["GET_MAP_OBJECTS", [], {"cell_id": [1]}]]
+
+    def test_replay(self):
+        pgoapi = ReplayPGoApi(self._record_session())
+        set_clock(VirtualClock(start=pgoapi.get_start_time()))
+        api_wrapper = self._create_api_wrapper(pgoapi)
+
+        # The throttled request is retried and gets the recorded response
+        assert api_wrapper.get_player().call()["player"].username == "test_account"
+        assert api_wrapper.pacer.get_metrics()["failures"][THROTTLED] == 1
+        assert pgoapi.rpc_count == 2
+        assert pgoapi.diverged == 0
+
+        # Asking for something else skips ahead to it
+        api_wrapper.state.mark_returned_stale(["GET_PLAYER"])
+        assert api_wrapper.get_player().call()["player"].username == "test_account"
+        assert pgoapi.diverged == 1
+        assert pgoapi.skipped == 1
+
+        with self.assertRaises(ReplayFinished):
+            api_wrapper.get_map_objects(cell_id=[1]).call()
+
+    def test_unrecorded_request(self):
+        pgoapi = ReplayPGoApi(self._record_session())
+
+        request = pgoapi.create_request()
+        request.recycle_inventory_item(item_id=1, count=1)
+        assert request.call() == {"status_code": 1, "responses": {"RECYCLE_INVENTORY_ITEM": {}}}
+        assert pgoapi.diverged == 1
+        assert pgoapi.get_remaining() == 4
@@ -0,0 +1,53 @@
+import unittest
+
+from api.state_manager import StateManager
+from pokemongo_bot.tests import VirtualClockMixin
+
+
+class StateManagerTest(VirtualClockMixin, unittest.TestCase):
+    def test_max_age(self):
+        state = StateManager()
+        state.update_with_response("GET_INVENTORY", {"inventory_delta": {"inventory_items": []}})
+
+        assert state.filter_cached_methods(["GET_INVENTORY"]) == []
+        assert state.get_fresh("candy") == {}
+
+        self.clock.sleep(60)
+        assert state.get_age("candy") == 60
+        # A reader can ask for something more recent than the policy
+        assert state.get_fresh("candy", max_age=30) is None
+        assert state.filter_cached_methods(["GET_INVENTORY"], max_age=30) == ["GET_INVENTORY"]
+
+        self.clock.sleep(300)
+        assert state.filter_cached_methods(["GET_INVENTORY"]) == ["GET_INVENTORY"]
+
+        # Templates never expire
+        state.update_with_response("DOWNLOAD_ITEM_TEMPLATES", {"item_templates": []})
+        self.clock.sleep(86400)
+        assert state.filter_cached_methods(["DOWNLOAD_ITEM_TEMPLATES"]) == []
+
+    def test_max_distance(self):
+        state = StateManager()
+        state.set_position(51.5, -0.1)
+        state.update_with_response("GET_MAP_OBJECTS", {"map_cells": []})
+
+        # About 22 metres away
+        state.set_position(51.5002, -0.1)
+        assert state.get_expiry_reason("worldmap") is None
+
+        # About 110 metres away
+        state.set_position(51.501, -0.1)
+        assert state.is_expired("worldmap")
+        assert state.get_expiry_reason("worldmap") == "distance"
+
+        state.set_position(51.5, -0.1)
+        self.clock.sleep(16)
+        assert state.get_expiry_reason("worldmap") == "age"
+
+    def test_mutated(self):
+        state = StateManager()
+        state.update_with_response("GET_INVENTORY", {"inventory_delta": {"inventory_items": []}})
+
+        state.mark_stale(["RELEASE_POKEMON"])
+        assert state.is_stale("pokemon")
+        assert not state.is_stale("inventory")
@@ -0,0 +1,50 @@
+import unittest
+
+from s2sphere import CellId, LatLng  # type: ignore
+
+from api.worldmap import WorldMap
+from pokemongo_bot.tests import VirtualClockMixin
+
+
+class WorldMapTest(VirtualClockMixin, unittest.TestCase):
+    @staticmethod
+    def _create_map_cell(lat, lng, fort_id):
+        return {
+            "s2_cell_id": CellId.from_lat_lng(LatLng.from_degrees(lat, lng)).parent(15).id(),
+            "spawn_points": [{"latitude": lat, "longitude": lng}],
+            "forts": [{"id": fort_id, "latitude": lat, "longitude": lng, "type": 1}]
+        }
+
+    def test_evicts_old_and_far_cells(self):
+        world_map = WorldMap(max_age=600, max_distance=2000)
+        home = self._create_map_cell(51.5, -0.1, "home")
+        # About 550 metres north
+        near = self._create_map_cell(51.505, -0.1, "near")
+        # About 3.3 kilometres north
+        far = self._create_map_cell(51.53, -0.1, "far")
+
+        world_map.update_map_objects({"map_cells": [home, near]}, 51.5, -0.1)
+        self.clock.sleep(300)
+        world_map.update_map_objects({"map_cells": [home]}, 51.5, -0.1)
+        assert world_map.get_cell(near["s2_cell_id"]) is not None
+
+        # Not seen for more than ten minutes
+        self.clock.sleep(301)
+        world_map.update_map_objects({"map_cells": [home]}, 51.5, -0.1)
+        assert world_map.get_cell(near["s2_cell_id"]) is None
+        assert [pokestop.fort_id for pokestop in world_map.get_pokestops()] == ["home"]
+        assert world_map.spawn_points_within(51.505, -0.1, 100) == []
+
+        # The player walked away from where they started, the cells of the latest response are always kept
+        world_map.update_map_objects({"map_cells": [far]}, 51.53, -0.1)
+        assert list(world_map.cells_by_id) == [far["s2_cell_id"]]
+        assert [pokestop.fort_id for pokestop, _ in world_map.nearest_pokestops(51.5, -0.1, 5)] == ["far"]
+        assert len(world_map.spawn_point_index) == 1
+
+    @staticmethod
+    def test_keeps_everything_without_limits():
+        world_map = WorldMap(max_age=None, max_distance=None)
+        world_map.update_map_objects({"map_cells": [{"s2_cell_id": 1}]}, 51.5, -0.1)
+        world_map.update_map_objects({"map_cells": [{"s2_cell_id": 2}]}, 51.5, -0.1)
+
+        assert sorted(world_map.cells_by_id) == [1, 2]
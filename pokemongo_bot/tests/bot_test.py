@@ -261,9 +261,14 @@ class BotTest(unittest.TestCase):
         bot.stepper.step = stepper_step
 
         bot.player_service.heartbeat = Mock(return_value=None)
+        bot.location_store = Mock()
 
         bot.run()
 
+        assert bot.location_store.set_navigation.call_count == 2
+        assert bot.location_store.update.call_count == 6
+        bot.location_store.update.assert_any_call(51.504601, -0.075964, 10)
+
     def test_work_on_cells(self):
         bot = self._create_generic_bot({})
         bot.fire = Mock()
@@ -1,5 +1,7 @@
+import inspect
+import threading
 import unittest
-from mock import Mock
+from mock import Mock, patch
 
 from pokemongo_bot.event_manager import EventManager, Event
 from pokemongo_bot.logger import Logger
@@ -201,3 +203,158 @@ class EventManagerTest(unittest.TestCase):
         assert '-100 (test_listener_1) -> 0 (test_listener_2 -> test_listener_3) -> 100 (test_listener_4)' in out.getvalue().strip()
         assert 'Event pipeline for "test2":' in out.getvalue().strip()
         assert '100 (test_listener_1)' in out.getvalue().strip()
+
+    @staticmethod
+    def test_fire_kwargs_listener():
+        logger = Mock()
+        event_manager = EventManager(logger)
+
+        received = {}
+
+        def test_listener(**kwargs):
+            received.update(kwargs)
+
+        event_manager.add_listener('test', test_listener)
+        event_manager.fire('test', value='first', other='second')
+
+        assert received == {'value': 'first', 'other': 'second', 'event_name': 'test'}
+
+    @staticmethod
+    def test_fire_compiles_once():
+        logger = Mock()
+        event_manager = EventManager(logger)
+
+        calls = []
+
+        def test_listener(value=None):
+            calls.append(value)
+
+        def test_listener_late(value=None):
+            calls.append('late')
+
+        event_manager.add_listener('test', test_listener)
+
+        with patch('inspect.getargspec', wraps=inspect.getargspec) as getargspec:
+            event_manager.fire('test', value='first')
+            event_manager.fire('test', value='second')
+            assert getargspec.call_count == 1
+
+            # Adding a listener recompiles the plan
+            event_manager.add_listener('test', test_listener_late, priority=10)
+            event_manager.fire('test', value='third')
+            assert getargspec.call_count == 3
+
+        assert calls == ['first', 'second', 'third', 'late']
+
+    @staticmethod
+    def test_fire_background():
+        logger = Mock()
+        event_manager = EventManager(logger)
+
+        threads = []
+
+        def test_listener(value=None):
+            threads.append((threading.current_thread(), value))
+            return {'value': 'ignored'}
+
+        event_manager.add_listener('test', test_listener, background=True)
+
+        return_data = event_manager.fire('test', value='first')
+        event_manager.join_background()
+
+        assert return_data['value'] == 'first'
+        assert len(threads) == 1
+        assert threads[0][0] is not threading.current_thread()
+        assert threads[0][1] == 'first'
+
+    @staticmethod
+    def test_fire_background_policies():
+        logger = Mock()
+        event_manager = EventManager(logger)
+
+        blocked = threading.Event()
+        dropped_values = []
+        coalesced_values = []
+
+        def test_blocking_listener():
+            blocked.wait(5)
+
+        def test_drop_listener(value=None):
+            dropped_values.append(value)
+
+        def test_coalesce_listener(value=None):
+            coalesced_values.append(value)
+
+        # Keep the workers busy, so that events pile up
+        event_manager.add_listener('block', test_blocking_listener, background=True)
+        event_manager.add_listener('block_again', test_blocking_listener, background=True)
+        event_manager.fire('block')
+        event_manager.fire('block_again')
+
+        event_manager.add_listener('test', test_drop_listener, background=True, queue_size=2)
+        event_manager.add_listener('test', test_coalesce_listener, background=True, policy='coalesce')
+        for value in range(5):
+            event_manager.fire('test', value=value)
+
+        blocked.set()
+        event_manager.join_background()
+
+        assert dropped_values == [0, 1]
+        assert coalesced_values == [4]
+
+    @staticmethod
+    def test_fire_background_snapshot():
+        logger = Mock()
+        event_manager = EventManager(logger)
+
+        blocked = threading.Event()
+        received = []
+        bot = Mock()
+
+        def test_listener(bot=None, pokestops=None):
+            blocked.wait(5)
+            received.append((bot, pokestops))
+
+        event_manager.add_listener('test', test_listener, background=True)
+
+        # The bot changes what it found in place before the worker gets to it
+        pokestops = [{"id": "fort", "cooldown_complete_timestamp_ms": 0}]
+        event_manager.fire_with_context('test', bot, pokestops=pokestops)
+        pokestops[0]["cooldown_complete_timestamp_ms"] = 1000
+        pokestops.append({"id": "other"})
+
+        blocked.set()
+        event_manager.join_background()
+
+        assert received[0][0] is bot
+        assert received[0][1] == [{"id": "fort", "cooldown_complete_timestamp_ms": 0}]
+
+    @staticmethod
+    def test_background_listener_added_twice():
+        logger = Mock()
+        event_manager = EventManager(logger)
+
+        calls = []
+
+        def test_listener(value=None):
+            calls.append((threading.current_thread(), value))
+
+        # Each registration has a queue of its own, neither coalesces the events of the other
+        event_manager.add_listener('test', test_listener, background=True, policy='coalesce')
+        event_manager.add_listener('test', test_listener, background=True, policy='coalesce')
+        event_manager.fire('test', value='first')
+        event_manager.join_background()
+        assert [value for _, value in calls] == ['first', 'first']
+
+        # Removing one leaves the other in the background
+        event_manager.remove_listener('test', test_listener)
+        event_manager.fire('test', value='second')
+        event_manager.join_background()
+        assert [value for _, value in calls] == ['first', 'first', 'second']
+        assert threading.current_thread() not in [thread for thread, _ in calls]
+
+    def test_background_invalid_policy(self):
+        event_manager = EventManager(Mock())
+
+        with self.assertRaises(ValueError):
+            event_manager.add_listener('test', Mock(), background=True, policy='sometimes')
@@ -0,0 +1,60 @@
+import unittest
+
+import pytest
+
+from api.worldmap import PokeStop
+from pokemongo_bot import geo
+
+
+class GeoTest(unittest.TestCase):
+    def setUp(self):
+        self.accuracy = geo.get_accuracy()
+
+    def tearDown(self):
+        geo.set_accuracy(self.accuracy)
+
+    @staticmethod
+    def test_distance_tiers():
+        assert round(geo.distance(51.503056, -0.119500, 51.503635, -0.119337, geo.VINCENTY), 2) == 65.41
+        assert round(geo.distance(51.503056, -0.119500, 51.503635, -0.119337, geo.HAVERSINE), 2) == 65.36
+        assert round(geo.distance(51.503056, -0.119500, 51.503635, -0.119337, geo.EQUIRECTANGULAR), 2) == 65.36
+
+    @staticmethod
+    def test_set_accuracy():
+        geo.set_accuracy(geo.VINCENTY)
+
+        assert geo.get_accuracy() == geo.VINCENTY
+        assert round(geo.distance(51.503056, -0.119500, 51.503635, -0.119337), 2) == 65.41
+
+    @staticmethod
+    def test_set_accuracy_invalid():
+        with pytest.raises(ValueError):
+            geo.set_accuracy('flat')
+
+    @staticmethod
+    def test_distances_matches_distance():
+        lats = [51.50204, 51.503342, 51.504250, 51.503602]
+        lngs = [-0.11955, -0.119668, -0.117458, -0.118756]
+
+        for accuracy in geo.ACCURACY_TIERS:
+            batch = geo.distances(51.503056, -0.119500, lats, lngs, accuracy)
+
+            assert len(batch) == 4
+            for i in range(4):
+                assert abs(batch[i] - geo.distance(51.503056, -0.119500, lats[i], lngs[i], accuracy)) < 1e-6
+
+    @staticmethod
+    def test_distances_empty():
+        assert len(geo.distances(51.503056, -0.119500, [], [])) == 0
+
+    @staticmethod
+    def test_sort_by_distance():
+        forts = [
+            PokeStop({"id": "far", "latitude": 51.504250, "longitude": -0.117458}),
+            PokeStop({"id": "near", "latitude": 51.503342, "longitude": -0.119668}),
+            PokeStop({"id": "middle", "latitude": 51.50204, "longitude": -0.11955})
+        ]
+
+        sorted_forts = geo.sort_by_distance(51.503056, -0.119500, forts)
+
+        assert [fort.fort_id for fort in sorted_forts] == ["near", "middle", "far"]
@@ -1,14 +1,16 @@
-import os
-import json
 import unittest
 
 from googlemaps import Client
 from googlemaps.exceptions import ApiError
 from mock import Mock
 from mock import call
+from mock import patch
+from pgoapi.utilities import get_cell_ids
+from s2sphere import CellId, LatLng  # type: ignore
 
 from pokemongo_bot.mapper import Mapper
-from pokemongo_bot.tests import create_core_test_config, create_mock_api_wrapper, test_account_name
+from pokemongo_bot.tests import create_core_test_config, create_mock_api_wrapper, test_account_name, \
+    get_test_cell_ids, PGoApiRequestMock
 
 
 class MapperTest(unittest.TestCase):
@@ -55,22 +57,10 @@ class MapperTest(unittest.TestCase):
             ]
         })
 
-        # Clean up any old location logs
-        if os.path.isfile('data/last-location-'+account+'.json'):
-            os.unlink('data/last-location-'+account+'.json')
-
         cells = mapper.get_cells(51.5044524, -0.0752479)
 
         assert len(cells) == 5
 
-        assert bool(os.path.isfile('data/last-location-'+account+'.json')) is True
-        with open('data/last-location-'+account+'.json') as data_file:
-            data = json.load(data_file)
-            assert data["lat"] == 51.5044524
-            assert data["lng"] == -0.0752479
-
-        os.unlink('data/last-location-'+account+'.json')
-
     @staticmethod
     def test_get_cells_no_response():
         account = test_account_name()
@@ -94,13 +84,227 @@ class MapperTest(unittest.TestCase):
         pgo.set_response("get_map_objects", {})
         api_wrapper.call = Mock(return_value=None)
 
-        # Clean up any old location logs
-        if os.path.isfile('data/last-location-'+account+'.json'):
-            os.unlink('data/last-location-'+account+'.json')
-
         cells = mapper.get_cells(51.5044524, -0.0752479)
 
         assert len(cells) == 0
+        assert mapper.failed is True
+
+    @staticmethod
+    def test_get_cells_merges_world_map():
+        account = test_account_name()
+        config = create_core_test_config({
+            "login": {
+                "username": account
+            },
+            "mapping": {
+                "cell_radius": 500
+            }
+        })
+        api_wrapper = create_mock_api_wrapper(config)
+        google_maps = Mock(spec=Client)
+        logger = Mock()
+        logger.log = Mock(return_value=None)
+        mapper = Mapper(config, api_wrapper, google_maps, logger)
+
+        api_wrapper.set_position(51.5044524, -0.0752479, 10)
+
+        pgo = api_wrapper.get_api()
+        pgo.set_response("get_map_objects", {
+            "map_cells": [
+                {
+                    "s2_cell_id": 1,
+                    "current_timestamp_ms": 1000,
+                    "forts": [
+                        {"id": "fort_a", "latitude": 51.5043872, "longitude": -0.0741802, "type": 1},
+                        {"id": "fort_b", "latitude": 51.5060435, "longitude": -0.073983, "type": 1}
+                    ]
+                }
+            ]
+        })
+        cells = mapper.get_cells(51.5044524, -0.0752479)
+        pokestop = cells[0].pokestops[0]
+
+        # The second response only carries the fort that changed
+        pgo.set_response("get_map_objects", {
+            "map_cells": [
+                {
+                    "s2_cell_id": 1,
+                    "current_timestamp_ms": 2000,
+                    "forts": [
+                        {"id": "fort_a", "latitude": 51.5043872, "longitude": -0.0741802, "type": 1,
+                         "cooldown_complete_timestamp_ms": 5000}
+                    ]
+                }
+            ]
+        })
+        cells = mapper.get_cells(51.5044524, -0.0752479)
+
+        assert len(cells) == 1
+        assert len(cells[0].pokestops) == 2
+        assert cells[0].pokestops[0] is pokestop
+        assert pokestop.cooldown_timestamp_ms == 5000
+
+        world_map = api_wrapper.state.get_state()["worldmap"]
+        assert world_map.get_cell_timestamps([1, 2]) == [2000, 0]
+
+    @staticmethod
+    @patch('pokemongo_bot.service.map_prefetcher.get_cell_ids', side_effect=get_test_cell_ids)
+    @patch('pokemongo_bot.mapper.get_cell_ids', side_effect=get_test_cell_ids)
+    def test_get_cells_with_prefetched_cells(*_):
+        config = create_core_test_config({
+            "mapping": {
+                "cell_radius": 500
+            },
+            "map_prefetch": {
+                "radius": 70,
+                "max_cells": 5
+            }
+        })
+        api_wrapper = create_mock_api_wrapper(config)
+        mapper = Mapper(config, api_wrapper, Mock(spec=Client), Mock())
+
+        api_wrapper.set_position(51.5, -0.1, 10)
+        cell_ids = get_test_cell_ids(51.5, -0.1, 500)
+
+        # About a kilometre to the north
+        mapper.map_prefetcher.plan([(51.5 + step * 0.0001, -0.1, 0) for step in range(100)])
+        # The cells around the player are asked for anyway
+        prefetched = list(range(51502, 51507))
+
+        pgo = api_wrapper.get_api()
+        requests = []
+
+        def create_request():
+            request = PGoApiRequestMock(pgo)
+            requests.append(request)
+            return request
+
+        pgo.create_request = Mock(side_effect=create_request)
+        pgo.set_response("get_map_objects", {
+            "map_cells": [{"s2_cell_id": cell_ids[0]}, {"s2_cell_id": prefetched[0]}]
+        })
+
+        cells = mapper.get_cells(51.5, -0.1)
+
+        # The prefetched cells went out with the map request of the step
+        assert len(requests) == 1
+        assert [call_name for call_name, _, _ in requests[0].calls] == ["GET_MAP_OBJECTS"]
+        _, _, kwargs = requests[0].calls[0]
+        assert kwargs["cell_id"] == cell_ids + prefetched
+        assert len(kwargs["since_timestamp_ms"]) == len(cell_ids) + len(prefetched)
+        assert mapper.map_prefetcher.prefetched == 5
+
+        # They are only kept in the world map
+        assert [cell.cell_id for cell in cells] == [cell_ids[0]]
+        assert mapper.get_world_map().get_cell(prefetched[0]) is not None
+
+        # Without a response the next cells are asked for again with the next request
+        api_wrapper.call = Mock(return_value=None)
+        assert mapper.get_cells(51.5, -0.1) == []
+        assert mapper.map_prefetcher.prefetched == 5
+        assert mapper.map_prefetcher.take(cell_ids) == list(range(51507, 51511))
+
+    @staticmethod
+    def test_cell_id_cache():
+        config = create_core_test_config({
+            "mapping": {
+                "cell_radius": 500,
+                "cell_cache_size": 2
+            }
+        })
+        api_wrapper = create_mock_api_wrapper(config)
+        mapper = Mapper(config, api_wrapper, Mock(spec=Client), Mock())
+
+        with patch('pokemongo_bot.mapper.get_cell_ids', side_effect=get_cell_ids) as cell_ids:
+            api_wrapper.set_position(51.5044524, -0.0752479, 10)
+            cells = mapper._get_cell_id_from_latlong(500)  # pylint: disable=protected-access
+            assert cells == get_cell_ids(51.5044524, -0.0752479, 500)
+
+            # Standing still
+            assert mapper._get_cell_id_from_latlong(500) == cells  # pylint: disable=protected-access
+            assert cell_ids.call_count == 1
+
+            mapper._get_cell_id_from_latlong(100)  # pylint: disable=protected-access
+            api_wrapper.set_position(51.52, -0.0752479, 10)
+            mapper._get_cell_id_from_latlong(500)  # pylint: disable=protected-access
+            assert cell_ids.call_count == 3
+
+            # The least recently used entry was evicted
+            api_wrapper.set_position(51.5044524, -0.0752479, 10)
+            assert mapper._get_cell_id_from_latlong(500) == cells  # pylint: disable=protected-access
+            assert cell_ids.call_count == 4
+
+    @staticmethod
+    def test_cell_id_cache_within_level_15_cell():
+        config = create_core_test_config({
+            "mapping": {
+                "cell_radius": 500
+            }
+        })
+        api_wrapper = create_mock_api_wrapper(config)
+        mapper = Mapper(config, api_wrapper, Mock(spec=Client), Mock())
+
+        # About 30 metres apart, in the same level 15 cell
+        positions = [(51.5041524, -0.0752479), (51.5044224, -0.0752479)]
+        assert len(set(CellId.from_lat_lng(LatLng.from_degrees(lat, lng)).parent(15) for lat, lng in positions)) == 1
+
+        # Every position gets the cells around itself, not the ones around the first step in its cell
+        for lat, lng in positions + positions:
+            api_wrapper.set_position(lat, lng, 10)
+            assert mapper._get_cell_id_from_latlong(500) == get_cell_ids(lat, lng, 500)  # pylint: disable=protected-access
+
+    @staticmethod
+    def test_get_world_map_queries():
+        account = test_account_name()
+        config = create_core_test_config({
+            "login": {
+                "username": account
+            },
+            "mapping": {
+                "cell_radius": 500
+            }
+        })
+        api_wrapper = create_mock_api_wrapper(config)
+        google_maps = Mock(spec=Client)
+        logger = Mock()
+        logger.log = Mock(return_value=None)
+        mapper = Mapper(config, api_wrapper, google_maps, logger)
+
+        assert mapper.get_world_map() is None
+
+        api_wrapper.set_position(51.5044524, -0.0752479, 10)
+
+        pgo = api_wrapper.get_api()
+        pgo.set_response("get_map_objects", {
+            "map_cells": [
+                {
+                    "s2_cell_id": 1,
+                    "spawn_points": [{"latitude": 51.5044, "longitude": -0.0752}],
+                    "forts": [
+                        {"id": "near", "latitude": 51.5045, "longitude": -0.0753, "type": 1},
+                        {"id": "cooldown", "latitude": 51.5046, "longitude": -0.0752, "type": 1,
+                         "cooldown_complete_timestamp_ms": 9999999999999},
+                        {"id": "far", "latitude": 51.5060435, "longitude": -0.073983, "type": 1},
+                        {"id": "gym", "latitude": 51.5044, "longitude": -0.0751, "type": 2}
+                    ]
+                }
+            ]
+        })
+        mapper.get_cells(51.5044524, -0.0752479)
+        world_map = mapper.get_world_map()
+
+        nearest = world_map.nearest_pokestops(51.5044524, -0.0752479, 2)
+        assert [pokestop.fort_id for pokestop, _ in nearest] == ["near", "cooldown"]
+
+        nearest = world_map.nearest_pokestops(51.5044524, -0.0752479, 2, skip_cooldown=True)
+        assert [pokestop.fort_id for pokestop, _ in nearest] == ["near", "far"]
+
+        within = world_map.pokestops_within(51.5044524, -0.0752479, 35)
+        assert [pokestop.fort_id for pokestop, _ in within] == ["near", "cooldown"]
+        assert len(world_map.pokestops_within(51.5044524, -0.0752479, 35, lured_only=True)) == 0
+
+        assert len(world_map.gyms_within(51.5044524, -0.0752479, 35)) == 1
+        assert world_map.spawn_points_within(51.5044524, -0.0752479, 35) == [(51.5044, -0.0752)]
 
     @staticmethod
     def test_find_location_with_coordinates():
@@ -118,6 +322,26 @@ class MapperTest(unittest.TestCase):
         assert lng == -0.0752479
         assert alt == 10.1
 
+    @staticmethod
+    def test_find_location_cached():
+        config = create_core_test_config()
+        api_wrapper = create_mock_api_wrapper(config)
+        google_maps = Mock(spec=Client)
+        google_maps.elevation = Mock(return_value=[{'elevation': 10.1}])
+        location = Mock()
+        location.latitude = 51.5044524
+        location.longitude = -0.0752479
+        location.altitude = 12.0
+        google_maps.geocode = Mock(return_value=location)
+        mapper = Mapper(config, api_wrapper, google_maps, Mock())
+
+        for _ in range(2):
+            assert mapper.find_location('51.5044524, -0.0752479') == (51.5044524, -0.0752479, 10.1)
+            assert mapper.find_location('Tower Bridge') == (51.5044524, -0.0752479, 12.0)
+
+        assert google_maps.elevation.call_count == 1
+        assert google_maps.geocode.call_count == 1
+
     @staticmethod
     def test_find_location_with_coordinates_google_error():
         config = create_core_test_config()
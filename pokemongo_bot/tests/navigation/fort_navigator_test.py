@@ -2,7 +2,7 @@ import unittest
 
 from mock import MagicMock
 
-from api.worldmap import Cell
+from api.worldmap import Cell, WorldMap
 from pokemongo_bot import FortNavigator
 from pokemongo_bot.navigation.destination import Destination
 from pokemongo_bot.tests import create_mock_api_wrapper, create_core_test_config
@@ -67,6 +67,27 @@ class FortNavigatorTest(unittest.TestCase):
         assert len(destinations) == 2
         assert pgoapi.call_stack_size() == 0
 
+    def test_navigate_pokestops_within_route_radius(self):
+        config = create_core_test_config({"movement": {"route_radius": 500}})
+        api_wrapper = create_mock_api_wrapper(config)
+        api_wrapper.call = MagicMock(return_value=None)
+        api_wrapper.set_position(51.5044524, -0.0752479, 10)
+        navigator = FortNavigator(config, api_wrapper)
+
+        world_map = WorldMap()
+        world_map.update_map_objects({"map_cells": [{
+            "s2_cell_id": 1,
+            "forts": [
+                self._create_pokestop("near", 51.5043872, -0.0741802),
+                self._create_pokestop("far", 51.52, -0.0741802)
+            ]
+        }]})
+        api_wrapper.state.get_state()["worldmap"] = world_map
+
+        destinations = list(navigator.navigate([]))
+
+        assert [destination.name for destination in destinations] == ["PokeStop \"fort_near\""]
+
     def _create_map_cells(self):
         return [
             Cell({
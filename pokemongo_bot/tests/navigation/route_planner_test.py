@@ -0,0 +1,75 @@
+import random
+import unittest
+
+from api.worldmap import PokeStop
+from pokemongo_bot.navigation.route_planner import RoutePlanner
+
+
+class RoutePlannerTest(unittest.TestCase):
+
+    def test_plan_empty(self):
+        planner = RoutePlanner()
+
+        assert planner.plan(51.5044524, -0.0752479, []) == []
+        assert planner.pop() is None
+
+    def test_plan_visits_line_in_order(self):
+        planner = RoutePlanner()
+        pokestops = [self._create_pokestop(i, 51.5044524 + i * 0.001, -0.0752479) for i in [3, 1, 4, 2]]
+
+        route = planner.plan(51.5044524, -0.0752479, pokestops, now=0)
+
+        assert [pokestop.fort_id for pokestop in route] == ["fort_1", "fort_2", "fort_3", "fort_4"]
+
+    def test_plan_defers_cooldown(self):
+        planner = RoutePlanner()
+        pokestops = [
+            self._create_pokestop(1, 51.5054524, -0.0752479),
+            self._create_pokestop(2, 51.5064524, -0.0752479, cooldown=3600),
+        ]
+
+        route = planner.plan(51.5044524, -0.0752479, pokestops, now=0)
+
+        assert [pokestop.fort_id for pokestop in route] == ["fort_1"]
+
+        # Deferred stops are not merged back in until the next plan
+        route = planner.update(51.5044524, -0.0752479, pokestops, now=0)
+        assert [pokestop.fort_id for pokestop in route] == ["fort_1"]
+
+    def test_plan_improves_nearest_neighbour(self):
+        rand = random.Random(1337)
+        pokestops = [self._create_pokestop(i, 51.5044524 + rand.uniform(-0.01, 0.01),
+                                           -0.0752479 + rand.uniform(-0.015, 0.015)) for i in range(200)]
+
+        nearest_neighbour = RoutePlanner(time_budget=0)
+        nearest_neighbour.plan(51.5044524, -0.0752479, pokestops, now=0)
+        improved = RoutePlanner(time_budget=5)
+        improved.plan(51.5044524, -0.0752479, pokestops, now=0)
+
+        assert len(improved.route) == 200
+        assert set(pokestop.fort_id for pokestop in improved.route) == set(pokestop.fort_id for pokestop in pokestops)
+        assert improved.route_length(51.5044524, -0.0752479) < nearest_neighbour.route_length(51.5044524, -0.0752479)
+        assert improved.spins_per_hour(51.5044524, -0.0752479) > nearest_neighbour.spins_per_hour(51.5044524, -0.0752479)
+
+    def test_update_inserts_new_stops(self):
+        planner = RoutePlanner()
+        pokestops = [self._create_pokestop(i, 51.5044524 + i * 0.001, -0.0752479) for i in [1, 2, 4]]
+        planner.plan(51.5044524, -0.0752479, pokestops, now=0)
+
+        assert planner.pop().fort_id == "fort_1"
+
+        pokestops.append(self._create_pokestop(3, 51.5074524, -0.0752479))
+        route = planner.update(51.5054524, -0.0752479, pokestops, now=0)
+
+        assert [pokestop.fort_id for pokestop in route] == ["fort_2", "fort_3", "fort_4"]
+
+    @staticmethod
+    def _create_pokestop(name, lat, lng, cooldown=0):
+        return PokeStop({
+            "id": "fort_" + str(name),
+            "latitude": lat,
+            "longitude": lng,
+            "enabled": 1,
+            "cooldown_complete_timestamp_ms": cooldown * 1000,
+            "type": 1
+        })
@@ -39,6 +39,29 @@ class WaypointNavigatorTest(unittest.TestCase):
 
         assert len(destinations) == 2
 
+    def test_navigate_waypoint_restored_state(self):
+        config = create_core_test_config({
+            "movement": {
+                "navigator_waypoints": [
+                    [51.5043872, -0.0741802],
+                    [51.5060435, -0.073983]
+                ]
+            }
+        })
+        api_wrapper = create_mock_api_wrapper(config)
+
+        navigator = WaypointNavigator(config, api_wrapper)
+        navigator.set_state({"pointer": 1})
+        assert navigator.get_state() == {"pointer": 1}
+
+        destinations = list(navigator.navigate(self._create_map_cells()))
+        assert len(destinations) == 1
+        assert destinations[0].target_lat == 51.5060435
+
+        # A route that got shorter in the meantime starts over
+        navigator.set_state({"pointer": 5})
+        assert navigator.get_state() == {"pointer": 0}
+
     def test_navigate_waypoint_add(self):
         config = create_core_test_config({
             "movement": {
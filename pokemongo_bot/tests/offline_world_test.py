@@ -0,0 +1,94 @@
+import unittest
+
+from s2sphere import CellId, LatLng
+
+from api.offline import OfflinePGoApi
+from api.offline.world import SyntheticWorld
+from pokemongo_bot.tests import VirtualClockMixin
+
+
+class OfflineWorldTest(VirtualClockMixin, unittest.TestCase):
+    clock_start = 1500000000
+
+    @staticmethod
+    def _get_cell_ids(lat, lng):
+        cell_id = CellId.from_lat_lng(LatLng.from_degrees(lat, lng)).parent(15)
+        return [cell_id.id()] + [neighbour.id() for neighbour in cell_id.get_all_neighbors(15)]
+
+    def _get_map_objects(self, world, lat, lng, since=0):
+        cell_ids = self._get_cell_ids(lat, lng)
+        return world.get_map_objects(latitude=lat, longitude=lng, cell_id=cell_ids,
+                                     since_timestamp_ms=[since] * len(cell_ids))
+
+    def _get_pokestop(self, world):
+        response = self._get_map_objects(world, 51.5043872, -0.0741802)
+        for cell in response["map_cells"]:
+            for fort in cell["forts"]:
+                if fort["type"] == 1:
+                    return fort
+        self.fail("No pokestop generated")
+
+    def test_same_seed_same_world(self):
+        first = self._get_map_objects(SyntheticWorld(seed=42), 51.5043872, -0.0741802)
+        second = self._get_map_objects(SyntheticWorld(seed=42), 51.5043872, -0.0741802)
+        other = self._get_map_objects(SyntheticWorld(seed=43), 51.5043872, -0.0741802)
+
+        assert first == second
+        assert first != other
+        assert len(first["map_cells"]) == 9
+
+    def test_fort_search_cooldown(self):
+        world = SyntheticWorld()
+        pokestop = self._get_pokestop(world)
+        world.move_to(pokestop["latitude"], pokestop["longitude"], 0)
+
+        response = world.fort_search(fort_id=pokestop["id"])
+        assert response["result"] == 1
+        assert len(response["items_awarded"]) > 0
+        assert world.fort_search(fort_id=pokestop["id"])["result"] == 3
+
+        # Only the changed fort comes back in a delta request
+        since = self.clock.time() * 1000 - 1
+        changed = [fort for cell in self._get_map_objects(world, pokestop["latitude"], pokestop["longitude"], since)[
+            "map_cells"] for fort in cell["forts"]]
+        assert [fort["id"] for fort in changed] == [pokestop["id"]]
+
+        self.clock.sleep(301)
+        assert world.fort_search(fort_id=pokestop["id"])["result"] == 1
+
+    def test_fort_search_out_of_range(self):
+        world = SyntheticWorld()
+        pokestop = self._get_pokestop(world)
+        world.move_to(pokestop["latitude"] + 0.01, pokestop["longitude"], 0)
+
+        assert world.fort_search(fort_id=pokestop["id"])["result"] == 2
+
+    def test_request(self):
+        pgoapi = OfflinePGoApi(SyntheticWorld())
+        pgoapi.set_position(51.5043872, -0.0741802, 10)
+
+        request = pgoapi.create_request()
+        request.get_player()
+        request.get_inventory()
+        request.check_awarded_badges()
+        response = request.call()
+
+        assert response["status_code"] == 1
+        assert sorted(response["responses"]) == ["GET_INVENTORY", "GET_PLAYER"]
+        assert response["responses"]["GET_PLAYER"]["player_data"]["max_pokemon_storage"] == 250
+        assert pgoapi.rpc_count == 1
+        assert pgoapi.method_counts["CHECK_AWARDED_BADGES"] == 1
+
+    def test_bag_full(self):
+        world = SyntheticWorld(max_pokemon_storage=0)
+
+        # Walk around until a pokemon shows up
+        for step in range(60):
+            lat, lng = 51.5043872 + 0.0005 * step, -0.0741802
+            world.move_to(lat, lng, 0)
+            for cell in self._get_map_objects(world, lat, lng)["map_cells"]:
+                for pokemon in cell["catchable_pokemons"]:
+                    assert world.encounter(encounter_id=pokemon["encounter_id"])["status"] == 7
+                    return
+            self.clock.sleep(60)
+        self.fail("No pokemon spawned")
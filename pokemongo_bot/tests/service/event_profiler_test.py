@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from mock import Mock
+
+from pokemongo_bot.event_manager import EventManager
+from pokemongo_bot.service.event_profiler import EventProfiler
+from pokemongo_bot.tests import create_core_test_config
+
+
+class EventProfilerTest(unittest.TestCase):
+
+    @staticmethod
+    def _create_profiler(enabled=True):
+        config = create_core_test_config({"profiling": {"events": enabled, "dump_signal": False}})
+        return EventProfiler(config, Mock())
+
+    def test_records_listeners(self):
+        profiler = self._create_profiler()
+        event_manager = EventManager(Mock(), profiler)
+
+        def test_filter(value=None):
+            return {'value': value + 1}
+
+        def test_cancel(value=None):
+            if value > 2:
+                return False
+            return None
+
+        event_manager.add_listener('test', test_filter, priority=-10)
+        event_manager.add_listener('test', test_cancel)
+
+        for value in range(4):
+            event_manager.fire('test', value=value)
+
+        stats = profiler.get_stats()["test"]
+        assert stats["test_filter"]["calls"] == 4
+        assert stats["test_filter"]["cancelled"] == 0
+        assert stats["test_cancel"]["calls"] == 4
+        assert stats["test_cancel"]["cancelled"] == 2
+        assert stats["test_cancel"]["max_ms"] >= stats["test_cancel"]["p50_ms"] >= 0
+
+        trace = profiler.get_chrome_trace()["traceEvents"]
+        assert len(trace) == 8
+        assert trace[0]["name"] == "test_filter"
+        assert trace[0]["cat"] == "test"
+        assert trace[0]["ph"] == "X"
+
+    def test_disabled(self):
+        profiler = self._create_profiler(enabled=False)
+        event_manager = EventManager(Mock(), profiler)
+
+        listener = Mock(return_value=None)
+
+        def test_listener():
+            listener()
+
+        event_manager.add_listener('test', test_listener)
+        event_manager.fire('test')
+
+        listener.assert_called_once_with()
+        assert profiler.get_stats() == {}
+
+        # Turning profiling on at runtime recompiles the events
+        event_manager.set_profiler(profiler)
+        event_manager.fire('test')
+        assert profiler.get_stats()["test"]["test_listener"]["calls"] == 1
+
+    def test_records_background_listeners(self):
+        profiler = self._create_profiler()
+        event_manager = EventManager(Mock(), profiler)
+
+        def test_background(value=None):  # pylint: disable=unused-argument
+            pass
+
+        event_manager.add_listener('test', test_background, background=True)
+        event_manager.fire('test', value=1)
+        event_manager.join_background()
+
+        assert profiler.get_stats()["test"]["test_background"]["calls"] == 1
+
+    def test_dump_signal_does_not_wait_for_the_lock(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            profiler = self._create_profiler()
+            profiler.profile_file = os.path.join(temp_dir, "profile.json")
+            profiler.trace_file = os.path.join(temp_dir, "trace.json")
+
+            # As if the signal came in while record() was running, the handler returns right away
+            with profiler._lock:  # pylint: disable=protected-access
+                profiler._on_dump_signal(None, None)  # pylint: disable=protected-access
+                assert not os.path.isfile(profiler.profile_file)
+
+            for thread in threading.enumerate():
+                if thread.name == 'EventProfilerDump':
+                    thread.join(5)
+            assert os.path.isfile(profiler.profile_file)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_dump(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            profiler = self._create_profiler()
+            # The working directory may have changed by the time of a dump
+            assert os.path.isabs(profiler.profile_file) and os.path.isabs(profiler.trace_file)
+            profiler.profile_file = os.path.join(temp_dir, "profile.json")
+            profiler.trace_file = os.path.join(temp_dir, "trace.json")
+            profiler.record("test", "test_listener", profiler._started, 0.002)  # pylint: disable=protected-access
+
+            profiler.dump()
+
+            with open(profiler.profile_file) as profile_file:
+                assert json.load(profile_file)["test"]["test_listener"]["calls"] == 1
+            with open(profiler.trace_file) as trace_file:
+                assert json.load(trace_file)["traceEvents"][0]["dur"] == 2000
+            assert sorted(os.listdir(temp_dir)) == ["profile.json", "trace.json"]
+        finally:
+            shutil.rmtree(temp_dir)
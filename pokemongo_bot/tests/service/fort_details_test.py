@@ -0,0 +1,151 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mock import MagicMock, patch
+
+from api.worldmap import PokeStop
+from pokemongo_bot.service.fort_details import FortDetails
+from pokemongo_bot.tests import create_core_test_config, create_mock_api_wrapper
+
+
+class FortDetailsTest(unittest.TestCase):
+
+    def test_get_cached(self):
+        config = create_core_test_config()
+        api_wrapper = create_mock_api_wrapper(config)
+        fort_details = FortDetails(config, api_wrapper)
+
+        pgo = api_wrapper.get_api()
+        pgo.set_response('fort_details', self._create_fort_details("Test Stop"))
+
+        pokestop = self._create_pokestop("stop1")
+        assert fort_details.get_name(pokestop) == "Test Stop"
+        assert pgo.call_stack_size() == 0
+
+        # Second lookup must not hit the API
+        api_wrapper.fort_details = MagicMock()
+        assert fort_details.get_name(pokestop) == "Test Stop"
+        assert fort_details.peek("fort_stop1")["name"] == "Test Stop"
+        api_wrapper.fort_details.assert_not_called()
+
+    def test_get_name_unknown(self):
+        config = create_core_test_config()
+        api_wrapper = create_mock_api_wrapper(config)
+        api_wrapper.call = MagicMock(return_value=None)
+        fort_details = FortDetails(config, api_wrapper)
+
+        assert fort_details.get_name(self._create_pokestop("stop1")) == "fort_stop1"
+        assert fort_details.peek("fort_stop1") is None
+
+    def test_ttl_expires(self):
+        config = create_core_test_config({"mapping": {"fort_details_ttl": 60}})
+        api_wrapper = create_mock_api_wrapper(config)
+        fort_details = FortDetails(config, api_wrapper)
+
+        pgo = api_wrapper.get_api()
+        pgo.set_response('fort_details', self._create_fort_details("Test Stop"))
+        pgo.set_response('fort_details', self._create_fort_details("Renamed Stop"))
+
+        pokestop = self._create_pokestop("stop1")
+        with patch('time.time', return_value=1000):
+            assert fort_details.get_name(pokestop) == "Test Stop"
+        with patch('time.time', return_value=1059):
+            assert fort_details.get_name(pokestop) == "Test Stop"
+        with patch('time.time', return_value=1061):
+            assert fort_details.peek("fort_stop1") is None
+            assert fort_details.get_name(pokestop) == "Renamed Stop"
+        assert pgo.call_stack_size() == 0
+
+    def test_lru_eviction(self):
+        config = create_core_test_config({"mapping": {"fort_details_cache_size": 2}})
+        api_wrapper = create_mock_api_wrapper(config)
+        fort_details = FortDetails(config, api_wrapper)
+
+        pgo = api_wrapper.get_api()
+        for name in ["Stop 1", "Stop 2", "Stop 3"]:
+            pgo.set_response('fort_details', self._create_fort_details(name))
+
+        fort_details.get(self._create_pokestop("stop1"))
+        fort_details.get(self._create_pokestop("stop2"))
+        # Touch stop1 so that stop2 is the least recently used
+        fort_details.peek("fort_stop1")
+        fort_details.get(self._create_pokestop("stop3"))
+
+        assert fort_details.peek("fort_stop1") is not None
+        assert fort_details.peek("fort_stop2") is None
+        assert fort_details.peek("fort_stop3") is not None
+
+    def test_persist(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            config = create_core_test_config()
+            api_wrapper = create_mock_api_wrapper(config)
+            fort_details = FortDetails(config, api_wrapper)
+            fort_details.cache_file = os.path.join(temp_dir, "fort-details.json")
+
+            pgo = api_wrapper.get_api()
+            pgo.set_response('fort_details', self._create_fort_details("Test Stop"))
+            fort_details.get(self._create_pokestop("stop1"))
+            fort_details.close()
+
+            restarted = FortDetails(config, api_wrapper)
+            restarted.cache_file = fort_details.cache_file
+            restarted.load()
+
+            assert restarted.peek("fort_stop1")["name"] == "Test Stop"
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_persist_in_background(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            config = create_core_test_config({"mapping": {"fort_details_persist": True,
+                                                          "fort_details_save_interval": 60}})
+            api_wrapper = create_mock_api_wrapper(config)
+            fort_details = FortDetails(config, api_wrapper)
+            fort_details.cache_file = os.path.join(temp_dir, "fort-details.json")
+            fort_details.save = MagicMock(wraps=fort_details.save)
+
+            pgo = api_wrapper.get_api()
+            pgo.set_response('fort_details', self._create_fort_details("Test Stop"))
+            pgo.set_response('fort_details', self._create_fort_details("Test Stop 2"))
+            # The first change is saved right away, the second one waits for the interval
+            fort_details.get(self._create_pokestop("stop1"))
+            for _ in range(50):
+                if fort_details.save.call_count:
+                    break
+                time.sleep(0.01)
+            fort_details.get(self._create_pokestop("stop2"))
+            time.sleep(0.1)
+            assert fort_details.save.call_count == 1
+
+            fort_details.close()
+            assert fort_details.save.call_count == 2
+            assert os.listdir(temp_dir) == ["fort-details.json"]
+            with open(fort_details.cache_file) as cache_file:
+                assert len(json.load(cache_file)) == 2
+        finally:
+            shutil.rmtree(temp_dir)
+
+    @staticmethod
+    def _create_pokestop(name):
+        return PokeStop({
+            "id": "fort_" + str(name),
+            "latitude": 51.5043872,
+            "longitude": -0.0741802,
+            "type": 1
+        })
+
+    @staticmethod
+    def _create_fort_details(name):
+        return {
+            "fort_id": "fort_" + str(name),
+            "name": str(name),
+            "latitude": 51.5043872,
+            "longitude": -0.0741802,
+            "type": 1
+        }
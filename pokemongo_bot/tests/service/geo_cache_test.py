@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+
+from googlemaps import Client
+from googlemaps.exceptions import ApiError
+from mock import Mock
+
+from api.offline import OfflineMaps
+from api.offline.world import SyntheticWorld
+from pokemongo_bot.logger import Logger
+from pokemongo_bot.service.geo_cache import GeoCache
+from pokemongo_bot.tests import VirtualClockMixin, create_core_test_config
+
+
+class GeoCacheTest(VirtualClockMixin, unittest.TestCase):
+    def setUp(self):
+        super(GeoCacheTest, self).setUp()
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def _create_cache(self, google_maps):
+        config = create_core_test_config({"mapping": {"geo_cache": self.path, "elevation_precision": 3,
+                                                        "elevation_retry_delay": 600}})
+        return GeoCache(config, google_maps, Logger())
+
+    @staticmethod
+    def _create_google_maps():
+        google_maps = Mock(spec=Client)
+        google_maps.elevation = Mock(side_effect=lambda locations: [{"elevation": lat} for lat, _ in locations])
+        return google_maps
+
+    def test_elevations_are_batched_and_cached(self):
+        google_maps = self._create_google_maps()
+        cache = self._create_cache(google_maps)
+
+        # The first two are in the same grid square
+        elevations = cache.get_elevations([(51.50441, -0.0752), (51.50442, -0.0752), (51.506, -0.0752)])
+        assert elevations == [51.50441, 51.50441, 51.506]
+        google_maps.elevation.assert_called_once_with([(51.50441, -0.0752), (51.506, -0.0752)])
+
+        assert cache.get_elevation(51.50439, -0.07521) == 51.50441
+        assert google_maps.elevation.call_count == 1
+
+        # Another bot, or the same one after a restart
+        cache = self._create_cache(google_maps)
+        assert cache.get_elevation(51.506, -0.0752, fetch=False) == 51.506
+        assert cache.get_elevation(51.6, -0.0752, fetch=False) is None
+        assert google_maps.elevation.call_count == 1
+
+    def test_elevation_errors_are_not_cached(self):
+        google_maps = self._create_google_maps()
+        google_maps.elevation.side_effect = ApiError(403)
+        cache = self._create_cache(google_maps)
+
+        assert cache.get_elevation(51.5044, -0.0752) is None
+
+        # Google is left alone for a while, not even new grid squares are asked for
+        google_maps.elevation.side_effect = None
+        google_maps.elevation.return_value = [{"elevation": 10.1}]
+        assert cache.get_elevation(51.5044, -0.0752) is None
+        assert cache.get_elevation(51.6, -0.0752) is None
+        assert google_maps.elevation.call_count == 1
+
+        self.clock.sleep(600)
+        assert cache.get_elevation(51.5044, -0.0752) == 10.1
+        assert google_maps.elevation.call_count == 2
+
+    def test_squares_without_elevation_are_not_asked_again(self):
+        google_maps = self._create_google_maps()
+        google_maps.elevation.side_effect = lambda locations: [{} if lat > 51.55 else {"elevation": lat}
+                                                                for lat, _ in locations]
+        cache = self._create_cache(google_maps)
+
+        assert cache.get_elevations([(51.5044, -0.0752), (51.6, -0.0752)]) == [51.5044, None]
+        assert cache.get_elevations([(51.6, -0.0752), (51.5, -0.0752)]) == [None, 51.5]
+        google_maps.elevation.assert_called_with([(51.5, -0.0752)])
+
+        self.clock.sleep(600)
+        assert cache.get_elevation(51.6, -0.0752) is None
+        assert google_maps.elevation.call_count == 3
+
+    def test_geocode(self):
+        google_maps = self._create_google_maps()
+        google_maps.geocode = Mock(return_value=[{"geometry": {"location": {"lat": 51.5044, "lng": -0.0752}}}])
+        cache = self._create_cache(google_maps)
+
+        assert cache.geocode('Tower Bridge, London') == (51.5044, -0.0752, 51.5044)
+        assert self._create_cache(google_maps).geocode('  tower bridge,   LONDON') == (51.5044, -0.0752, 51.5044)
+        assert google_maps.geocode.call_count == 1
+
+        google_maps.geocode.return_value = []
+        with self.assertRaises(ValueError):
+            cache.geocode('Nowhere')
+
+    def test_offline_maps(self):
+        world = SyntheticWorld(seed=1)
+        cache = self._create_cache(OfflineMaps(world))
+
+        elevations = cache.get_elevations([(51.5044, -0.0752), (51.51, -0.08)])
+        assert elevations == [world.elevation(51.5044, -0.0752), world.elevation(51.51, -0.08)]
+        assert cache.requests == 1
@@ -0,0 +1,112 @@
+import json
+import os
+import unittest
+
+from mock import Mock
+
+from pokemongo_bot.logger import Logger
+from pokemongo_bot.navigation.destination import Destination
+from pokemongo_bot.service.location_store import LocationStore
+from pokemongo_bot.tests import create_core_test_config, test_account_name
+
+
+class LocationStoreTest(unittest.TestCase):
+    def setUp(self):
+        config = create_core_test_config({
+            "login": {
+                "username": test_account_name()
+            },
+            "mapping": {
+                "location_save_interval": 60
+            }
+        })
+        self.store = LocationStore(config, Logger())
+
+    def tearDown(self):
+        self.store.close()
+        for path in (self.store.location_file, self.store.location_file + '.tmp'):
+            if os.path.isfile(path):
+                os.unlink(path)
+
+    def _read(self):
+        with open(self.store.location_file) as location_file:
+            return json.load(location_file)
+
+    def test_update_keeps_heading(self):
+        self.store.update(51.5, -0.1, 10)
+        assert 'heading' not in self.store.get()
+
+        # Due east
+        self.store.update(51.5, -0.099)
+        location = self.store.get()
+        assert location['alt'] == 10
+        assert round(location['heading']) == 90
+
+        # Due north
+        self.store.update(51.501, -0.099, 11)
+        assert round(self.store.get()['heading']) == 0
+
+    def test_flush_and_load(self):
+        self.store.update(51.5, -0.1, 10)
+        self.store.set_navigation('WaypointNavigator', {'pointer': 2}, Destination(51.51, -0.11, 12, name='Waypoint'))
+        self.store.flush()
+
+        assert not os.path.isfile(self.store.location_file + '.tmp')
+        assert self._read()['navigation'] == {
+            'navigator': 'WaypointNavigator',
+            'state': {'pointer': 2},
+            'destination': {'lat': 51.51, 'lng': -0.11, 'alt': 12, 'name': 'Waypoint'}
+        }
+
+        # Saved by an older version
+        with open(self.store.location_file, 'w') as location_file:
+            json.dump({'lat': 51.6, 'lng': -0.2}, location_file)
+        assert self.store.load() == {'lat': 51.6, 'lng': -0.2}
+        assert self.store.get() == {'lat': 51.6, 'lng': -0.2}
+
+    def test_load_missing_or_broken(self):
+        assert self.store.load() is None
+
+        with open(self.store.location_file, 'w') as location_file:
+            location_file.write('{"lat": 51.')
+        assert self.store.load() is None
+
+    def test_writes_in_background(self):
+        self.store.flush = Mock(wraps=self.store.flush)
+
+        # The first change is written right away, the next ones wait for the interval
+        self.store.update(51.5, -0.1, 10)
+        self.store._writer.join(0.5)  # pylint: disable=protected-access
+        assert self._read()['lat'] == 51.5
+
+        self.store.update(51.501, -0.1, 10)
+        self.store.update(51.502, -0.1, 10)
+        self.store._writer.join(0.2)  # pylint: disable=protected-access
+        assert self._read()['lat'] == 51.5
+        assert self.store.flush.call_count == 1
+
+    def test_close(self):
+        assert os.path.isabs(self.store.location_file)
+
+        self.store.update(51.5, -0.1, 10)
+        self.store.update(51.501, -0.1, 10)
+        writer = self.store._writer  # pylint: disable=protected-access
+        self.store.close()
+
+        # Written without waiting for the interval
+        assert not writer.is_alive()
+        assert self._read()['lat'] == 51.501
+
+        # Nothing is written after that, not even at exit
+        self.store.update(51.502, -0.1, 10)
+        self.store._write_at_exit()  # pylint: disable=protected-access
+        assert self._read()['lat'] == 51.501
+
+    def test_write_errors_are_logged(self):
+        self.store.logger = Mock()
+        self.store.location_file = 'data/missing/last-location.json'
+        self.store.update(51.5, -0.1, 10)
+
+        self.store._write()  # pylint: disable=protected-access
+
+        assert self.store.logger.error.call_count >= 1
@@ -0,0 +1,71 @@
+import unittest
+
+from mock import patch
+
+from pokemongo_bot.logger import Logger
+from pokemongo_bot.service.map_prefetcher import MapPrefetcher
+from pokemongo_bot.tests import create_core_test_config, create_mock_api_wrapper, get_test_cell_ids
+
+
+@patch('pokemongo_bot.service.map_prefetcher.get_cell_ids', side_effect=get_test_cell_ids)
+class MapPrefetcherTest(unittest.TestCase):
+    @staticmethod
+    def _create_route(steps=100):
+        # About 11 metres a step, heading north
+        return [(51.5 + step * 0.0001, -0.1, 0) for step in range(steps)]
+
+    def test_plan(self, cell_ids):
+        config = create_core_test_config({"map_prefetch": {"radius": 70, "max_cells": 5}})
+        api_wrapper = create_mock_api_wrapper(config)
+        api_wrapper.state.update_with_response("GET_MAP_OBJECTS", {
+            "map_cells": [{"s2_cell_id": cell_id} for cell_id in get_test_cell_ids(51.5, -0.1, 70)]
+        })
+        prefetcher = MapPrefetcher(config, api_wrapper, Logger())
+
+        prefetcher.plan(self._create_route())
+
+        # The cells around where the route starts are already known, the others come in the order they are walked
+        assert prefetcher._pending == list(range(51502, 51511))  # pylint: disable=protected-access
+        # One point every radius metres, in metres as well
+        for args, _ in cell_ids.call_args_list:
+            assert args[2] == 70
+        assert cell_ids.call_count < 20
+
+    def test_take(self, _):
+        config = create_core_test_config({"map_prefetch": {"radius": 70, "max_cells": 5}})
+        api_wrapper = create_mock_api_wrapper(config)
+        prefetcher = MapPrefetcher(config, api_wrapper, Logger())
+        prefetcher.plan(self._create_route())
+        planned = list(prefetcher._pending)  # pylint: disable=protected-access
+        assert planned == list(range(51499, 51511))
+
+        # Cells the map request asks for anyway are not handed out
+        assert prefetcher.take(planned[:2]) == planned[2:7]
+        assert prefetcher.prefetched == 5
+
+        # Neither are the cells that are known by now
+        api_wrapper.state.update_with_response("GET_MAP_OBJECTS", {
+            "map_cells": [{"s2_cell_id": planned[7]}]
+        })
+        assert prefetcher.take([]) == planned[8:12]
+        assert prefetcher.prefetched == 9
+        assert prefetcher._pending == []  # pylint: disable=protected-access
+
+    def test_give_back(self, _):
+        config = create_core_test_config({"map_prefetch": {"radius": 70, "max_cells": 5}})
+        prefetcher = MapPrefetcher(config, create_mock_api_wrapper(config), Logger())
+        prefetcher.plan(self._create_route())
+        planned = list(prefetcher._pending)  # pylint: disable=protected-access
+
+        # The request they went out with failed, they are asked for again first
+        prefetcher.give_back(prefetcher.take([]))
+        assert prefetcher.prefetched == 0
+        assert prefetcher._pending == planned  # pylint: disable=protected-access
+
+    def test_disabled(self, _):
+        config = create_core_test_config({"map_prefetch": {"enabled": False}})
+        prefetcher = MapPrefetcher(config, create_mock_api_wrapper(config), Logger())
+
+        prefetcher.plan(self._create_route())
+        assert prefetcher.take([]) == []
+        assert prefetcher.prefetched == 0
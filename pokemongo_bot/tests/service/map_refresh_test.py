@@ -0,0 +1,91 @@
+import unittest
+
+from mock import DEFAULT, Mock
+
+from api.state_manager import StateManager
+from api.worldmap import Cell
+from pokemongo_bot.logger import Logger
+from pokemongo_bot.service.map_refresh import MapRefreshPolicy
+from pokemongo_bot.tests import VirtualClockMixin, create_core_test_config
+
+
+class MapRefreshPolicyTest(VirtualClockMixin, unittest.TestCase):
+    @staticmethod
+    def _create_policy(cells):
+        config = create_core_test_config({"mapping": {"cell_radius": 500}, "map_refresh": {"distance": 0.1,
+                                                                                          "interval": 15}})
+        mapper = Mock()
+        mapper.api_wrapper.state = StateManager()
+
+        # Like the Mapper, the world map comes in with the response to a map request from the api position
+        def get_cells(lat, lng):
+            mapper.api_wrapper.state.set_position(lat, lng)
+            if not mapper.failed:
+                mapper.api_wrapper.state.update_with_response("GET_MAP_OBJECTS", {"map_cells": []})
+            return DEFAULT
+
+        mapper.get_cells = Mock(return_value=cells, side_effect=get_cells)
+        mapper.failed = False
+        return MapRefreshPolicy(config, mapper, Logger()), mapper
+
+    def test_distance_and_interval(self):
+        policy, mapper = self._create_policy([Cell({})])
+        assert mapper.api_wrapper.state.state_policies["worldmap"] == {"max_age": 15, "max_distance": 50}
+
+        assert policy.get_cells(51.5, -0.1) == mapper.get_cells.return_value
+        assert policy.refreshed is True
+
+        # About 11 metres away, a few seconds later
+        self.clock.sleep(5)
+        mapper.api_wrapper.state.set_position(51.5001, -0.1)
+        policy.get_cells(51.5001, -0.1)
+        assert policy.refreshed is False
+        assert mapper.get_cells.call_count == 1
+
+        # 55 metres away from where the map was requested
+        mapper.api_wrapper.state.set_position(51.5005, -0.1)
+        assert policy.get_refresh_reason() == "distance"
+        policy.get_cells(51.5005, -0.1)
+        assert policy.refreshed is True
+        assert mapper.get_cells.call_count == 2
+
+        self.clock.sleep(16)
+        assert policy.get_refresh_reason() == "interval"
+
+    def test_expiry(self):
+        pokestop = {"id": "fort", "type": 1, "latitude": 51.5, "longitude": -0.1,
+                    "cooldown_complete_timestamp_ms": 1005000}
+        policy, mapper = self._create_policy([Cell({"forts": [pokestop]})])
+
+        policy.get_cells(51.5, -0.1)
+        self.clock.sleep(4)
+        assert policy.get_refresh_reason() is None
+
+        # The pokestop can be spun again
+        self.clock.sleep(1)
+        assert policy.get_refresh_reason() == "expiry"
+
+        policy.invalidate()
+        policy.get_cells(51.5, -0.1)
+        assert mapper.get_cells.call_count == 2
+
+    def test_failed_request(self):
+        cells = [Cell({})]
+        policy, mapper = self._create_policy(cells)
+        policy.get_cells(51.5, -0.1)
+
+        # No response, the previous cells are served and the map is asked for again on the next step
+        self.clock.sleep(16)
+        mapper.get_cells.return_value = []
+        mapper.failed = True
+        assert policy.get_cells(51.5, -0.1) == cells
+        assert policy.refreshed is False
+        assert policy.refreshes == 1
+        assert policy.get_refresh_reason() == "interval"
+
+        mapper.get_cells.return_value = [Cell({}), Cell({})]
+        mapper.failed = False
+        assert len(policy.get_cells(51.5, -0.1)) == 2
+        assert policy.refreshed is True
+        assert policy.get_refresh_reason() is None
+        assert mapper.get_cells.call_count == 3
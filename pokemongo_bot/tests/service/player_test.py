@@ -199,6 +199,85 @@ class PlayerTest(unittest.TestCase):
 
         assert pgo.call_stack_size() == 0
 
+    def test_get_pokeballs_cached(self):
+        config = create_core_test_config()
+        api_wrapper = create_mock_api_wrapper(config)
+        event_manager = Mock()
+        logger = Logger()
+        player_service = Player(api_wrapper, event_manager, logger)
+
+        pgo = api_wrapper.get_api()
+        pgo.set_response('get_player', self._create_generic_player_response())
+        pgo.set_response('get_inventory', self._create_generic_inventory_response())
+
+        with patch('pokemongo_bot.service.player.sleep') as sleep:
+            player_service.get_pokeballs()
+            pokeballs = player_service.get_pokeballs()
+
+            # The second read is served from memory, without waiting
+            assert sleep.call_count == 1
+            assert pokeballs[Item.ITEM_POKE_BALL.value] == 11
+            assert pgo.call_stack_size() == 0
+
+    def test_view_books_changes(self):
+        config = create_core_test_config()
+        api_wrapper = create_mock_api_wrapper(config)
+        event_manager = Mock()
+        logger = Logger()
+        player_service = Player(api_wrapper, event_manager, logger)
+
+        pgo = api_wrapper.get_api()
+        pgo.set_response('get_player', self._create_generic_player_response())
+        pgo.set_response('get_inventory', self._create_generic_inventory_response())
+
+        with patch('pokemongo_bot.service.player.sleep'):
+            player_service.get_pokemon()
+
+            # The thrown ball is booked locally, no request needed to read the stock
+            pgo.set_response('catch_pokemon', {'status': 1})
+            api_wrapper.catch_pokemon(encounter_id=1, pokeball=Item.ITEM_POKE_BALL.value).call()
+            assert player_service.get_pokeballs()[Item.ITEM_POKE_BALL.value] == 10
+            assert player_service.get_inventory()['count'] == 35
+            assert pgo.call_stack_size() == 0
+
+            # Booked into the view only, the state still holds what the server said
+            inventory = api_wrapper.state.get_state()['inventory']
+            assert inventory[Item.ITEM_POKE_BALL.value] == 11
+            assert inventory['count'] == 36
+
+            # The caught pokemon is only known to the server
+            pgo.set_response('get_player', self._create_generic_player_response())
+            pgo.set_response('get_inventory', self._create_generic_inventory_response())
+            player_service.get_pokemon()
+            assert pgo.call_stack_size() == 0
+            assert player_service.get_pokeballs()[Item.ITEM_POKE_BALL.value] == 11
+
+            pgo.set_response('get_player', self._create_generic_player_response())
+            pgo.set_response('get_inventory', self._create_generic_inventory_response())
+            assert player_service.refresh() is True
+            assert pgo.call_stack_size() == 0
+
+    def test_view_does_not_book_returned_inventory(self):
+        config = create_core_test_config()
+        api_wrapper = create_mock_api_wrapper(config)
+        player_service = Player(api_wrapper, Mock(), Logger())
+
+        pgo = api_wrapper.get_api()
+        pgo.set_response('get_player', self._create_generic_player_response())
+        pgo.set_response('get_inventory', self._create_generic_inventory_response())
+
+        with patch('pokemongo_bot.service.player.sleep'):
+            player_service.get_pokemon()
+
+            # The inventory sent along with the catch already counts the thrown ball
+            pgo.set_response('catch_pokemon', {'status': 1})
+            pgo.set_response('get_inventory', self._create_generic_inventory_response())
+            api_wrapper.catch_pokemon(encounter_id=1, pokeball=Item.ITEM_POKE_BALL.value).get_inventory().call()
+
+            assert player_service.get_pokeballs()[Item.ITEM_POKE_BALL.value] == 11
+            assert player_service.get_inventory()['count'] == 36
+            assert pgo.call_stack_size() == 0
+
     def test_print_stats(self):
         config = create_core_test_config()
         api_wrapper = create_mock_api_wrapper(config)
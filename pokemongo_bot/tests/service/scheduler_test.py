@@ -0,0 +1,47 @@
+import unittest
+
+from mock import Mock
+
+from pokemongo_bot.logger import Logger
+from pokemongo_bot.service.scheduler import Scheduler
+from pokemongo_bot.tests import VirtualClockMixin, create_core_test_config
+
+
+class SchedulerTest(VirtualClockMixin, unittest.TestCase):
+    def test_interval(self):
+        scheduler = Scheduler(create_core_test_config(), Logger())
+        task = Mock()
+        scheduler.add_task('heartbeat', task, interval=60)
+
+        # Runs on the first tick, then once a minute
+        for _ in range(10):
+            scheduler.tick(51.5, -0.1)
+            self.clock.sleep(10)
+        assert task.call_count == 2
+
+        scheduler.trigger('heartbeat')
+        scheduler.tick(51.5, -0.1)
+        assert task.call_count == 3
+        assert scheduler.get_metrics()['heartbeat']['runs'] == 3
+
+    def test_distance(self):
+        scheduler = Scheduler(create_core_test_config(), Logger())
+        task = Mock()
+        scheduler.add_task('hatched_eggs', task, interval=600, distance=100)
+
+        scheduler.tick(51.5, -0.1)
+        # About 11 metres a step
+        for step in range(1, 11):
+            scheduler.tick(51.5 + step * 0.0001, -0.1)
+        assert task.call_count == 2
+
+    def test_config(self):
+        config = create_core_test_config({'scheduling': {'heartbeat': {'interval': 0, 'distance': 0}}})
+        scheduler = Scheduler(config, Logger())
+        task = Mock()
+        scheduler.add_task('heartbeat', task, interval=60)
+
+        for _ in range(3):
+            scheduler.tick(51.5, -0.1)
+            self.clock.sleep(120)
+        assert task.call_count == 1
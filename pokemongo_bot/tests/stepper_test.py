@@ -147,6 +147,28 @@ class StepperTest(unittest.TestCase):
         for step in steps:
             assert len(step) == 3
 
+    @staticmethod
+    def test_get_route_between_elevations():
+        config = create_core_test_config({
+            "movement": {
+                "walk_speed": 5,
+            }
+        })
+        api_wrapper = create_mock_api_wrapper(config)
+        path_finder = DirectPathFinder(config)
+        geo_cache = Mock()
+        geo_cache.get_elevations = Mock(side_effect=lambda points: [None] + [12.5] * (len(points) - 1))
+        stepper = Stepper(config, api_wrapper, path_finder, Mock(), geo_cache=geo_cache)
+        stepper.start(51.5044524, -0.0752479, 10)
+
+        steps = stepper.get_route_between(51.5044524, -0.0752479, 51.5062939, -0.0750065, 10)
+
+        # One lookup for the whole route, steps google knows nothing about keep the destination altitude
+        assert geo_cache.get_elevations.call_count == 1
+        assert len(geo_cache.get_elevations.call_args[0][0]) == 69
+        assert steps[0][2] == 10
+        assert all(step[2] == 12.5 for step in steps[1:])
+
     @staticmethod
     def test_snap_to():
         config = create_core_test_config({
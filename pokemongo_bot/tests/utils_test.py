@@ -15,7 +15,8 @@ class UtilsTest(unittest.TestCase):
     def test_distance():
         dist = distance(51.503056, -0.119500, 51.503635, -0.119337)
 
-        assert round(dist, 2) == 65.41
+        # haversine is the default accuracy tier
+        assert round(dist, 2) == 65.36
 
     def test_filtered_forts(self):
 
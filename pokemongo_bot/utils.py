@@ -3,24 +3,47 @@
 from __future__ import print_function
 # pylint: disable=redefined-builtin
 from builtins import bytes, str, int
+import json
+import os
 import struct
 import time
 
 from six import integer_types
 from api.worldmap import PokeStop
 from colorama import init               # type: ignore
-from geopy.distance import vincenty     # type: ignore
+
+from pokemongo_bot import geo
 
 # Uncomment to enable type annotations for Python 3
-# from typing import List
+# from typing import Any, List
 # from api.worldmap import Fort
 
 init()
 
 
+def save_json(path, data, **kwargs):
+    # type: (str, Any, **Any) -> None
+    """
+        Writes data as JSON to a temporary file and then replaces path with it, so a crash never leaves a half
+        written file behind. Keyword arguments go to json.dump.
+    """
+    temp_file = path + '.tmp'
+    with open(temp_file, 'w') as outfile:
+        json.dump(data, outfile, **kwargs)
+
+    replace = getattr(os, 'replace', None)
+    if replace is not None:
+        replace(temp_file, path)
+        return
+    # Python 2 can not rename over an existing file on Windows
+    if os.name == 'nt' and os.path.isfile(path):
+        os.remove(path)
+    os.rename(temp_file, path)
+
+
 def distance(lat1, lon1, lat2, lon2):
     # type: (float, float, float, float) -> float
-    return vincenty((lat1, lon1), (lat2, lon2)).meters
+    return geo.distance(lat1, lon1, lat2, lon2)
 
 
 def filtered_forts(lat, lng, forts):
@@ -32,8 +55,7 @@ def filtered_forts(lat, lng, forts):
                 not fort.is_in_cooldown() and\
                 fort.latitude is not None and fort.longitude is not None
 
-    filtered_list = [(fort, distance(lat, lng, fort.latitude, fort.longitude)) for fort in forts if should_keep(fort)]
-    return [x[0] for x in sorted(filtered_list, key=lambda y: y[1])]
+    return geo.sort_by_distance(lat, lng, [fort for fort in forts if should_keep(fort)])
 
 
 def convert(original_distance, from_unit, to_unit):  # Converts units